@@ -0,0 +1,32 @@
+"""
+Process a folder with the library API (in a fresh interpreter, so that the
+peak memory usage can be measured), and print the elapsed time as JSON.
+
+Usage: python -m benchmarks._library_worker FOLDER
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+
+from markdown_toc_creator.create_toc import createToc
+from markdown_toc_creator.walker import iterMarkdownFiles
+
+
+def main(folder: str) -> None:
+    """Create the ToCs of all the files in the folder, and time it"""
+    start = time.perf_counter()
+    numOfFiles = 0
+    for filename in iterMarkdownFiles(Path(folder)):
+        createToc(filename, quiet=True)
+        numOfFiles += 1
+
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'numOfFiles': numOfFiles}))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
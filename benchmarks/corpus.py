@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+WORDS: tuple[str, ...] = (
+    'alpha', 'beta', 'gamma', 'delta', 'install', 'usage', 'config',
+    'option', 'example', 'release', 'notes', 'api', 'reference', 'guide',
+    'setup', 'testing', 'overview', 'details', 'faq', 'migration',
+)  # fmt: skip
+
+# Headers with HTML tags, entities, emojis, backticks, links, and emphasis
+FANCY_HEADER_PARTS: tuple[str, ...] = (
+    '<code>flag</code>',
+    '<a href="#x">link</a>',
+    '<span style="color: red">red</span>',
+    'AT&amp;T',
+    '`inline code`',
+    '[link](https://example.com)',
+    '_emphasis_',
+    '**bold**',
+    '🚀',
+    '👍🏽',
+    'café',
+    '<br/>',
+    '&lt;tag&gt;',
+)
+
+# Only a few distinct headers, so that most anchors need deduplicating
+DUPLICATED_HEADERS: tuple[str, ...] = (
+    'Example',
+    'Usage',
+    'Notes',
+    'Parameters',
+    'Returns',
+)
+
+
+@dataclass(frozen=True)
+class CategoryInfo:
+    """What was generated for one corpus category"""
+
+    name: str
+    numOfFiles: int
+    numOfHeadings: int  # excluding the skipped first line of each file
+    numOfBytes: int
+
+
+def generateCorpus(
+        outputDir: Path,
+        *,
+        scale: float = 1.0,
+        seed: int = 0,
+) -> list[CategoryInfo]:
+    """
+    Generate a deterministic corpus of markdown files (one sub-folder per
+    category) under `outputDir`. The same `scale` and `seed` always produce
+    byte-identical files.
+    """
+    categories: list[tuple[str, int, Callable[[random.Random], str]]] = [
+        ('many_small', _scaled(1000, scale), _smallFile),
+        ('huge', _scaled(2, scale, minimum=1), _hugeFile),
+        ('heading_dense', _scaled(50, scale), _headingDenseFile),
+        ('code_fences', _scaled(200, scale), _codeFenceFile),
+        ('fancy_headings', _scaled(200, scale), _fancyHeadingsFile),
+        ('duplicate_anchors', _scaled(100, scale), _duplicateAnchorsFile),
+    ]
+
+    infos: list[CategoryInfo] = []
+    for name, numOfFiles, makeFile in categories:
+        rng = random.Random(f'{seed}-{name}')  # noqa: S311
+        categoryDir = outputDir / name
+        categoryDir.mkdir(parents=True, exist_ok=True)
+        numOfHeadings = 0
+        numOfBytes = 0
+        for i in range(numOfFiles):
+            content = makeFile(rng)
+            data = content.encode('utf-8')
+            (categoryDir / f'{i:05d}.md').write_bytes(data)
+            numOfHeadings += _countHeadings(content)
+            numOfBytes += len(data)
+
+        infos.append(CategoryInfo(name, numOfFiles, numOfHeadings, numOfBytes))
+
+    return infos
+
+
+def _scaled(count: int, scale: float, *, minimum: int = 1) -> int:
+    return max(minimum, round(count * scale))
+
+
+def _countHeadings(content: str) -> int:
+    count = 0
+    inCodeBlock = False
+    for line in content.split('\n')[1:]:
+        if line.startswith('```'):
+            inCodeBlock = not inCodeBlock
+        elif line.startswith('#') and not inCodeBlock:
+            count += 1
+
+    return count
+
+
+def _words(rng: random.Random, low: int, high: int) -> str:
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def _paragraph(rng: random.Random) -> str:
+    sentences = [_words(rng, 6, 14).capitalize() + '.' for _ in range(3)]
+    return ' '.join(sentences)
+
+
+def _levels(rng: random.Random, count: int) -> list[int]:
+    """Header levels that never skip levels downwards (starting at 2)"""
+    levels: list[int] = []
+    level = 2
+    for _ in range(count):
+        levels.append(level)
+        level = rng.randint(2, min(level + 1, 6))
+
+    return levels
+
+
+def _document(
+        rng: random.Random,
+        headers: list[str],
+        *,
+        makeBody: Callable[[random.Random], str],
+) -> str:
+    # Half of the files have placeholders; the rest rely on proactive mode
+    parts: list[str] = [f'# {_words(rng, 2, 4).title()}', '']
+    if rng.random() < 0.5:  # noqa: PLR2004
+        parts += ['<!--TOC-->', '<!--TOC-->', '']
+
+    for level, header in zip(_levels(rng, len(headers)), headers, strict=True):
+        parts += ['#' * level + ' ' + header, '', makeBody(rng), '']
+
+    return '\n'.join(parts)
+
+
+def _smallFile(rng: random.Random) -> str:
+    headers = [_words(rng, 1, 4).title() for _ in range(rng.randint(3, 12))]
+    return _document(rng, headers, makeBody=_paragraph)
+
+
+def _hugeFile(rng: random.Random) -> str:
+    headers = [_words(rng, 1, 5).title() for _ in range(5000)]
+    return _document(
+        rng,
+        headers,
+        makeBody=lambda rng: '\n\n'.join(_paragraph(rng) for _ in range(5)),
+    )
+
+
+def _headingDenseFile(rng: random.Random) -> str:
+    headers = [_words(rng, 1, 6).title() for _ in range(2000)]
+    return _document(rng, headers, makeBody=lambda _: '')
+
+
+def _codeBlock(rng: random.Random) -> str:
+    lines = [
+        f'# {_words(rng, 2, 5)}' if rng.random() < 0.3 else _words(rng, 3, 8)  # noqa: PLR2004
+        for _ in range(rng.randint(5, 30))
+    ]
+    return '\n'.join(['```python', *lines, '```'])
+
+
+def _codeFenceFile(rng: random.Random) -> str:
+    headers = [_words(rng, 1, 4).title() for _ in range(rng.randint(5, 20))]
+    return _document(
+        rng,
+        headers,
+        makeBody=lambda rng: '\n\n'.join(
+            _codeBlock(rng) for _ in range(rng.randint(1, 4))
+        ),
+    )
+
+
+def _fancyHeadingsFile(rng: random.Random) -> str:
+    # Each header starts with a plain word, so that its anchor is never empty
+    headers = [
+        ' '.join([
+            rng.choice(WORDS),
+            *(
+                rng.choice(FANCY_HEADER_PARTS) if rng.random() < 0.5 else word  # noqa: PLR2004
+                for word in _words(rng, 1, 5).split()
+            ),
+        ])
+        for _ in range(rng.randint(10, 40))
+    ]
+    return _document(rng, headers, makeBody=_paragraph)
+
+
+def _duplicateAnchorsFile(rng: random.Random) -> str:
+    headers = [rng.choice(DUPLICATED_HEADERS) for _ in range(500)]
+    return _document(rng, headers, makeBody=lambda _: '')
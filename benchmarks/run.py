@@ -0,0 +1,393 @@
+"""
+Benchmark the CLI and the library on a synthetic markdown corpus, and compare
+the results with a stored baseline.
+
+Usage: python -m benchmarks.run [OPTIONS]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import shutil
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import click
+
+from benchmarks.corpus import CategoryInfo, generateCorpus
+from benchmarks.scanners import measureScannerEngines
+from benchmarks.writes import measureWriteStrategies
+
+DEFAULT_BASELINE: Path = Path(__file__).parent / 'baseline.json'
+
+# The metrics of each scenario, and whether higher values are better
+METRICS: dict[str, bool] = {
+    'filesPerSec': True,
+    'headingsPerSec': True,
+    'peakRssMiB': False,
+    'importMs': False,
+}
+
+IMPORTED_MODULES: dict[str, str] = {
+    'cli': 'markdown_toc_creator.main',
+    'library': 'markdown_toc_creator.create_toc',
+}
+
+
+@dataclass(frozen=True)
+class Thresholds:
+    """How much worse than the baseline each kind of metric may get"""
+
+    maxThroughputDrop: float = 0.25
+    maxRssGrowth: float = 0.25
+    maxImportTimeGrowth: float = 0.5
+
+    def allowedChange(self, metric: str) -> float:
+        """Get the allowed relative change of a metric (for the worse)"""
+        if metric == 'peakRssMiB':
+            return self.maxRssGrowth
+
+        if metric == 'importMs':
+            return self.maxImportTimeGrowth
+
+        return self.maxThroughputDrop
+
+
+def runBenchmarks(
+        *,
+        scale: float,
+        seed: int,
+        repeat: int,
+        categories: tuple[str, ...] = (),
+) -> dict[str, Any]:
+    """
+    Generate the corpus, and measure each (mode, category) scenario, each
+    scanner engine, each way of writing files, and the import time of each
+    mode. Each scenario keeps its best time (and its highest peak memory
+    usage) across `repeat` runs.
+    """
+    scenarios: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix='toc-benchmark-') as tempDir:
+        corpusDir = Path(tempDir) / 'corpus'
+        infos = generateCorpus(corpusDir, scale=scale, seed=seed)
+        for info in infos:
+            if categories and info.name not in categories:
+                continue
+
+            for mode in ('cli', 'library'):
+                scenarios[f'{mode}/{info.name}'] = _measureScenario(
+                    corpusDir / info.name,
+                    Path(tempDir) / 'work',
+                    info=info,
+                    mode=mode,
+                    repeat=repeat,
+                )
+
+        scenarios.update(
+            measureScannerEngines(
+                corpusDir,
+                [_ for _ in infos if not categories or _.name in categories],
+                repeat=repeat,
+            )
+        )
+
+        # The write paths are compared on the many small files, where the
+        # per-file costs (such as flushing to disk) dominate
+        if not categories or 'many_small' in categories:
+            scenarios.update(
+                measureWriteStrategies(
+                    corpusDir / 'many_small',
+                    Path(tempDir) / 'work',
+                    repeat=repeat,
+                )
+            )
+
+    for mode, module in IMPORTED_MODULES.items():
+        scenarios[f'import/{mode}'] = {
+            'importMs': measureImportTime(module, repeat=repeat)
+        }
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'seed': seed,
+        },
+        'scenarios': scenarios,
+    }
+
+
+def measureImportTime(module: str, *, repeat: int) -> float:
+    """
+    Measure the best cumulative import time (in ms) of a module in a fresh
+    interpreter, according to `python -X importtime`
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        proc = subprocess.run(  # noqa: S603
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for line in proc.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module:  # noqa: PLR2004
+                best = min(best, int(fields[1]) / 1000)
+
+    return best
+
+
+def compareWithBaseline(
+        results: dict[str, Any],
+        baseline: dict[str, Any],
+        thresholds: Thresholds,
+) -> list[str]:
+    """Return a message for each metric that regressed beyond its threshold"""
+    regressions: list[str] = []
+    for name, metrics in results['scenarios'].items():
+        baselineMetrics = baseline['scenarios'].get(name, {})
+        for metric, value in metrics.items():
+            reference = baselineMetrics.get(metric)
+            if metric not in METRICS or not reference:
+                continue
+
+            higherIsBetter = METRICS[metric]
+            change = (value - reference) / reference
+            worseBy = -change if higherIsBetter else change
+            allowed = thresholds.allowedChange(metric)
+            if worseBy > allowed:
+                regressions.append(
+                    f'{name}: {metric} is {value:.1f} (baseline:'
+                    f' {reference:.1f}, {worseBy:.0%} worse; allowed:'
+                    f' {allowed:.0%})'
+                )
+
+    return regressions
+
+
+def formatResults(results: dict[str, Any]) -> str:
+    """Format the results as a table"""
+    header = f'{"scenario":<36}' + ''.join(f'{_:>16}' for _ in METRICS)
+    lines = [header, '-' * len(header)]
+    for name, metrics in results['scenarios'].items():
+        cells = ''.join(
+            f'{metrics[_]:>16.1f}' if _ in metrics else f'{"":>16}'
+            for _ in METRICS
+        )
+        lines.append(f'{name:<36}{cells}')
+
+    return '\n'.join(lines)
+
+
+def _measureScenario(
+        sourceDir: Path,
+        workDir: Path,
+        *,
+        info: CategoryInfo,
+        mode: str,
+        repeat: int,
+) -> dict[str, float]:
+    bestSeconds = float('inf')
+    peakRssMiB = 0.0
+    for i in range(repeat):
+        # Each run gets a fresh copy, because the files are rewritten
+        target = workDir / f'{mode}-{info.name}-{i}'
+        shutil.copytree(sourceDir, target)
+        if mode == 'cli':
+            args = ['-m', 'markdown_toc_creator.main', '-q', '--no-cache']
+        else:
+            args = ['-m', 'benchmarks._library_worker']
+
+        wallSeconds, rssMiB, output = _runPython([*args, str(target)])
+        seconds = (
+            wallSeconds if mode == 'cli' else json.loads(output)['seconds']
+        )
+        bestSeconds = min(bestSeconds, seconds)
+        peakRssMiB = max(peakRssMiB, rssMiB)
+        shutil.rmtree(target)
+
+    return {
+        'filesPerSec': info.numOfFiles / bestSeconds,
+        'headingsPerSec': info.numOfHeadings / bestSeconds,
+        'peakRssMiB': peakRssMiB,
+    }
+
+
+def _runPython(args: list[str]) -> tuple[float, float, str]:
+    """
+    Run a Python subprocess, and return its wall time, its peak memory usage
+    (in MiB; 0 if it cannot be measured on this platform), and its stdout
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(  # noqa: S603
+        [sys.executable, *args],
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+    )
+    rssMiB = 0.0
+    if hasattr(os, 'wait4'):
+        # Unlike `proc.wait()`, `wait4()` reports the resource usage of this
+        # particular child process
+        assert proc.stdout is not None
+        with proc.stdout:
+            output = proc.stdout.read()
+
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # `ru_maxrss` is in bytes on macOS, and in KiB elsewhere
+        unit = 1 if sys.platform == 'darwin' else 1024
+        rssMiB = usage.ru_maxrss * unit / 1024 / 1024
+    else:
+        output = proc.communicate()[0]
+
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise click.ClickException(
+            f'Benchmark subprocess failed: {" ".join(args)}'
+        )
+
+    return elapsed, rssMiB, output
+
+
+@click.command(
+    context_settings={'help_option_names': ['-h', '--help']},
+    help='Benchmark markdown-toc-creator on a synthetic corpus',
+)
+@click.option(
+    '--scale',
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help='Multiply the number of files of each category by this factor.',
+)
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option(
+    '--repeat',
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help='How many times to run each scenario (the best run is kept).',
+)
+@click.option(
+    '--category',
+    'categories',
+    multiple=True,
+    help='Only run these corpus categories (can be repeated).',
+)
+@click.option(
+    '--baseline',
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=DEFAULT_BASELINE,
+    show_default=True,
+    help='The baseline results to compare with.',
+)
+@click.option(
+    '--save-baseline',
+    is_flag=True,
+    default=False,
+    help='Save the results as the new baseline instead of comparing.',
+)
+@click.option(
+    '--output',
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help='Also write the results to this JSON file.',
+)
+@click.option(
+    '--max-throughput-drop',
+    type=float,
+    default=Thresholds.maxThroughputDrop,
+    show_default=True,
+    help='Allowed relative drop of files/sec and headings/sec.',
+)
+@click.option(
+    '--max-rss-growth',
+    type=float,
+    default=Thresholds.maxRssGrowth,
+    show_default=True,
+    help='Allowed relative growth of the peak memory usage.',
+)
+@click.option(
+    '--max-import-time-growth',
+    type=float,
+    default=Thresholds.maxImportTimeGrowth,
+    show_default=True,
+    help='Allowed relative growth of the import time.',
+)
+def main(
+        *,
+        scale: float,
+        seed: int,
+        repeat: int,
+        categories: tuple[str, ...],
+        baseline: Path,
+        save_baseline: bool,
+        output: Path | None,
+        max_throughput_drop: float,
+        max_rss_growth: float,
+        max_import_time_growth: float,
+) -> None:
+    """Command-line entry point"""
+    results = runBenchmarks(
+        scale=scale, seed=seed, repeat=repeat, categories=categories
+    )
+    click.echo(formatResults(results))
+
+    if output is not None:
+        output.write_text(
+            json.dumps(results, indent=2) + '\n', encoding='utf-8'
+        )
+
+    if save_baseline:
+        baseline.write_text(
+            json.dumps(results, indent=2) + '\n', encoding='utf-8'
+        )
+        click.echo(f'\nSaved the baseline to {baseline}')
+        return
+
+    if not baseline.exists():
+        click.echo(f'\nNo baseline at {baseline}; use --save-baseline')
+        return
+
+    baselineResults = json.loads(baseline.read_text(encoding='utf-8'))
+    if baselineResults['environment'] != results['environment']:
+        click.echo(
+            click.style(
+                '\nWarning: the baseline was recorded in a different'
+                f' environment: {baselineResults["environment"]}',
+                fg='yellow',
+            )
+        )
+
+    regressions = compareWithBaseline(
+        results,
+        baselineResults,
+        Thresholds(
+            maxThroughputDrop=max_throughput_drop,
+            maxRssGrowth=max_rss_growth,
+            maxImportTimeGrowth=max_import_time_growth,
+        ),
+    )
+    if regressions:
+        click.echo(click.style('\nRegressions:', fg='red', bold=True))
+        for message in regressions:
+            click.echo(click.style(f'  {message}', fg='red'))
+
+        sys.exit(1)
+
+    click.echo(click.style('\nNo regressions', fg='green'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Measure the throughput of the scanner engines (the simple one, and the
+CommonMark block scanner of `--engine commonmark`) on the files of each
+category of the corpus, read into memory beforehand so that only the
+scanning is timed.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+from markdown_toc_creator.scanner import SCANNER_ENGINES, scanMarkdown
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from benchmarks.corpus import CategoryInfo
+
+
+def measureScannerEngines(
+        corpusDir: Path,
+        infos: list[CategoryInfo],
+        *,
+        repeat: int,
+) -> dict[str, dict[str, float]]:
+    """
+    Scan the files of each category with each engine, and return the best
+    files/sec and headings/sec of each (across `repeat` runs)
+    """
+    scenarios: dict[str, dict[str, float]] = {}
+    for info in infos:
+        texts: list[str] = [
+            _.read_text(encoding='utf-8')
+            for _ in sorted((corpusDir / info.name).iterdir())
+        ]
+        for engine in SCANNER_ENGINES:
+            bestSeconds = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for text in texts:
+                    scanMarkdown(text, engine=engine)
+
+                bestSeconds = min(bestSeconds, time.perf_counter() - start)
+
+            scenarios[f'scan/{engine}/{info.name}'] = {
+                'filesPerSec': info.numOfFiles / bestSeconds,
+                'headingsPerSec': info.numOfHeadings / bestSeconds,
+            }
+
+    return scenarios
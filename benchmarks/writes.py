@@ -0,0 +1,84 @@
+"""
+Measure the throughput of the ways of rewriting markdown files: truncating
+them in place (the original write path), replacing them atomically, and
+flushing them to disk one by one or in one batch (as with `--fsync`).
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from typing import TYPE_CHECKING
+
+from markdown_toc_creator.writer import FsyncBatch, writeAtomically
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+
+def _truncateInPlace(filenames: list[Path], data: list[bytes]) -> None:
+    for filename, content in zip(filenames, data, strict=True):
+        filename.write_bytes(content)
+
+
+def _atomic(filenames: list[Path], data: list[bytes]) -> None:
+    for filename, content in zip(filenames, data, strict=True):
+        writeAtomically(filename, [content])
+
+
+def _atomicFsyncEach(filenames: list[Path], data: list[bytes]) -> None:
+    for filename, content in zip(filenames, data, strict=True):
+        writeAtomically(filename, [content], fsync=True)
+
+
+def _atomicFsyncBatch(filenames: list[Path], data: list[bytes]) -> None:
+    batch = FsyncBatch()
+    for filename, content in zip(filenames, data, strict=True):
+        writeAtomically(filename, [content])
+        batch.add(filename)
+
+    batch.sync()
+
+
+WRITE_STRATEGIES: dict[str, Callable[[list[Path], list[bytes]], None]] = {
+    'truncate': _truncateInPlace,
+    'atomic': _atomic,
+    'atomic+fsyncEach': _atomicFsyncEach,
+    'atomic+fsyncBatch': _atomicFsyncBatch,
+}
+
+
+def measureWriteStrategies(
+        sourceDir: Path,
+        workDir: Path,
+        *,
+        repeat: int,
+) -> dict[str, dict[str, float]]:
+    """
+    Rewrite a copy of the files of `sourceDir` with each strategy, and return
+    the best files/sec of each (across `repeat` runs)
+    """
+    scenarios: dict[str, dict[str, float]] = {}
+    for name, strategy in WRITE_STRATEGIES.items():
+        bestSeconds = float('inf')
+        for i in range(repeat):
+            target = workDir / f'write-{name}-{i}'
+            shutil.copytree(sourceDir, target)
+            filenames = sorted(target.iterdir())
+            # (Rewritten with one more line, as when a ToC is updated)
+            data = [_.read_bytes() + b'\n' for _ in filenames]
+            if hasattr(os, 'sync'):  # (so that the copies aren't flushed too)
+                os.sync()
+
+            start = time.perf_counter()
+            strategy(filenames, data)
+            bestSeconds = min(bestSeconds, time.perf_counter() - start)
+            shutil.rmtree(target)
+
+        scenarios[f'write/{name}'] = {
+            'filesPerSec': len(filenames) / bestSeconds
+        }
+
+    return scenarios
@@ -1,3 +1,9 @@
-import importlib.metadata
+def __getattr__(name: str) -> str:
+    # `importlib.metadata` is slow to import, so the version is only looked
+    # up when it's actually used (rather than on every CLI startup)
+    if name == '__version__':
+        import importlib.metadata  # noqa: PLC0415
 
-__version__ = importlib.metadata.version('markdown_toc_creator')
+        return importlib.metadata.version('markdown_toc_creator')
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,311 @@
+"""
+Create tables of contents with asyncio, so that the reads and the writes of
+many files are in flight at once (which pays off on slow file systems, such
+as network shares), while the headings of the files already read are
+processed. The blocking file calls run in threads; the parsing and the
+slugifying run on the event loop (except for the large memory-mapped files,
+which are processed entirely in a thread).
+
+    tocLines = await acreateToc(Path('README.md'))
+    results = await acreateTocs(filenames, concurrency=16, quiet=True)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import io
+import sys
+from collections import deque
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from markdown_toc_creator.cache import CacheRecord, TocCache
+from markdown_toc_creator.create_toc import (
+    DEFAULT_HORIZONTAL_RULE_STYLE,
+    DEFAULT_MMAP_THRESHOLD,
+    TocLines,
+    _createTocInMappedFile,
+    _createTocOfContent,
+    _printFileHeader,
+    _readMarkdown,
+    _toTocLines,
+    _writeMarkdown,
+)
+from markdown_toc_creator.exceptions import (
+    HeaderLevelNotContinuousError,
+    HeaderLevelOutOfBoundError,
+)
+from markdown_toc_creator.outline import OutlineEntry, buildOutline
+from markdown_toc_creator.parallel import FileResult, _cachedFileResult
+from markdown_toc_creator.scanner import DEFAULT_ENGINE
+from markdown_toc_creator.stats import (
+    collectStats,
+    timePhase,
+    trackFile,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import TextIO
+
+# The default number of files that `acreateTocs()` reads or writes at once
+DEFAULT_IO_CONCURRENCY: int = 32
+
+
+async def acreateToc(
+        filename: Path,
+        *,
+        skip_first_n_lines: int = 1,
+        quiet: bool = False,
+        in_place: bool = True,
+        proactive: bool = True,
+        add_toc_title: bool = True,
+        add_horizontal_rules: bool = True,
+        toc_title: str = 'Table of Contents',
+        style: str = 'github',
+        horizontal_rule_style: str = DEFAULT_HORIZONTAL_RULE_STYLE,
+        engine: str = DEFAULT_ENGINE,
+        mmap_threshold: int | None = DEFAULT_MMAP_THRESHOLD,
+        diff: bool = False,
+) -> TocLines:
+    """
+    Create table of content, like `createToc()`, without blocking the event
+    loop: the file is read and written in a thread (of the loop's default
+    executor), and so are the files of at least `mmap_threshold` bytes, which
+    are memory-mapped and processed entirely in the thread. The printed lines
+    of each file stay together, even when files are processed concurrently.
+    """
+    return await _acreateToc(
+        filename,
+        output=None,
+        skip_first_n_lines=skip_first_n_lines,
+        quiet=quiet,
+        in_place=in_place,
+        proactive=proactive,
+        add_toc_title=add_toc_title,
+        add_horizontal_rules=add_horizontal_rules,
+        toc_title=toc_title,
+        style=style,
+        horizontal_rule_style=horizontal_rule_style,
+        engine=engine,
+        mmap_threshold=mmap_threshold,
+        diff=diff,
+    )
+
+
+async def acreateTocs(
+        filenames: Iterable[Path],
+        *,
+        concurrency: int = DEFAULT_IO_CONCURRENCY,
+        **options: Any,
+) -> list[TocLines]:
+    """
+    Create the tables of contents of several files concurrently, with at most
+    `concurrency` files in progress at once. `options` are those of
+    `acreateToc()`. The results are in the same order as `filenames`. If a
+    file fails, the exception is raised and the remaining files are
+    cancelled.
+    """
+    if concurrency < 1:
+        raise ValueError('The concurrency must be at least 1')
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def createOne(filename: Path) -> TocLines:
+        async with semaphore:
+            return await acreateToc(filename, **options)
+
+    tasks = [asyncio.ensure_future(createOne(_)) for _ in filenames]
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def processFilesConcurrently(
+        filenames: Iterable[Path],
+        *,
+        concurrency: int,
+        options: dict[str, Any],
+        cache: TocCache | None = None,
+        withOutline: bool = False,
+        withStats: bool = False,
+) -> Iterator[tuple[Path, FileResult]]:
+    """
+    Process files like `processFile()` (with the output captured), with up to
+    `concurrency` files in progress at once, on an event loop of its own.
+    The results are yielded in the same order as `filenames`, which are only
+    consumed as the window of files in progress moves on (so folders can be
+    walked lazily). The cache is looked up and updated in the threads, off
+    the event loop, so the results have no `cacheRecord` to store.
+    """
+    # (Imported here, because only this pipeline needs a thread pool)
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    pending: deque[tuple[Path, asyncio.Task[FileResult]]] = deque()
+    try:
+        for filename in filenames:
+            task = loop.create_task(
+                _aprocessFile(
+                    filename,
+                    options,
+                    cache=cache,
+                    withOutline=withOutline,
+                    withStats=withStats,
+                )
+            )
+            pending.append((filename, task))
+            if len(pending) >= concurrency:
+                oldest, oldestTask = pending.popleft()
+                yield oldest, loop.run_until_complete(oldestTask)
+
+        while pending:
+            oldest, oldestTask = pending.popleft()
+            yield oldest, loop.run_until_complete(oldestTask)
+    finally:
+        loop.run_until_complete(_cancel([task for _, task in pending]))
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+
+async def _cancel(tasks: list[asyncio.Task[FileResult]]) -> None:
+    for task in tasks:
+        task.cancel()
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _acreateToc(
+        filename: Path,
+        *,
+        output: TextIO | None,
+        quiet: bool,
+        in_place: bool,
+        mmap_threshold: int | None,
+        diff: bool,
+        **options: Any,
+) -> TocLines:
+    """
+    Create the ToC of a file (see `acreateToc()`), and print to `output`
+    instead of stdout if it's not None. All the printing of a file happens
+    between two awaits, so that it's not interleaved with other files'.
+    """
+    redirect = (
+        contextlib.redirect_stdout(output)
+        if output is not None
+        else contextlib.nullcontext()
+    )
+    with trackFile(Path(filename)):
+        content: str | None = await asyncio.to_thread(
+            _readMarkdown, filename, mmap_threshold
+        )
+        if content is None:
+            # (Its output is printed with the file header afterwards, since
+            # stdout cannot be redirected for a thread alone)
+            mappedOutput = io.StringIO()
+            try:
+                return await asyncio.to_thread(
+                    functools.partial(
+                        _createTocInMappedFile,
+                        filename,
+                        quiet=quiet,
+                        in_place=in_place,
+                        diff=diff,
+                        output=mappedOutput,
+                        **options,
+                    )
+                )
+            finally:
+                with redirect:
+                    if not quiet:
+                        _printFileHeader(filename)
+
+                    sys.stdout.write(mappedOutput.getvalue())
+
+        with redirect:
+            if not quiet:
+                _printFileHeader(filename)
+
+            result = _createTocOfContent(
+                content, filename=filename, quiet=quiet, diff=diff, **options
+            )
+
+        written: bool = result.changed and in_place
+        if written:
+            await asyncio.to_thread(_writeMarkdown, filename, result.text)
+
+        return _toTocLines(result, written=written)
+
+
+async def _aprocessFile(
+        filename: Path,
+        options: dict[str, Any],
+        *,
+        cache: TocCache | None,
+        withOutline: bool,
+        withStats: bool,
+) -> FileResult:
+    """Process one file like `processFile()`, with the output captured"""
+    if withStats:
+        with collectStats() as stats:
+            result = await _aprocessFile(
+                filename,
+                options,
+                cache=cache,
+                withOutline=withOutline,
+                withStats=False,
+            )
+
+        return replace(result, stats=stats)
+
+    with trackFile(filename):
+        # (Unless the file is written, its ToC is only up to date if unchanged)
+        inPlace: bool = options.get('in_place', True)
+        if cache is not None:
+            record = await asyncio.to_thread(_lookUpCache, cache, filename)
+            if record is not None:
+                # (The lookup already counts as a use of the record)
+                return _cachedFileResult(filename, None, options)
+
+        buffer = io.StringIO()
+        error: str | None = None
+        changed: bool = False
+        outline: list[OutlineEntry] | None = None
+        try:
+            tocLines = await _acreateToc(filename, output=buffer, **options)
+            changed = tocLines.changed
+            if withOutline:
+                outline = buildOutline(tocLines.headings, tocLines.tocEntries)
+        except (
+            HeaderLevelNotContinuousError,
+            HeaderLevelOutOfBoundError,
+        ) as err:
+            error = str(err)
+
+        if cache is not None and error is None and (inPlace or not changed):
+            await asyncio.to_thread(_storeInCache, cache, filename)
+
+        return FileResult(
+            output=buffer.getvalue(),
+            error=error,
+            changed=changed,
+            outline=outline,
+        )
+
+
+# (The cache is timed in the threads, so that waiting for other files isn't
+# counted)
+def _lookUpCache(cache: TocCache, filename: Path) -> CacheRecord | None:
+    with timePhase('cache'):
+        return cache.lookup(filename)
+
+
+def _storeInCache(cache: TocCache, filename: Path) -> None:
+    with timePhase('cache'):
+        cache.store(CacheRecord.fromFile(filename))
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import markdown_toc_creator
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DEFAULT_CACHE_DIR: str = '.markdown_toc_creator_cache'
+DEFAULT_MAX_ENTRIES: int = 100_000
+CACHE_DB_NAME: str = 'cache.sqlite3'
+
+# Pending updates (new records, and the last use of the records that were
+# looked up) are written to the database in batches, because each write
+# transaction is much more expensive than a single lookup
+FLUSH_EVERY_N_UPDATES: int = 500
+
+# The version of the generated ToCs, which is part of the fingerprint of the
+# options. Bump it whenever the ToC of a markdown file may change (such as
+# the anchor links, or which lines are headers), so that the records of the
+# files that were up to date before are no longer trusted.
+_CACHE_FORMAT_VERSION: int = 1
+
+# Options that don't affect the ToC that the markdown files should have
+_OPTIONS_NOT_IN_FINGERPRINT: frozenset[str] = frozenset({
+    'quiet',
+    'in_place',
+    'diff',
+})
+
+
+def fingerprintOptions(options: dict[str, Any]) -> str:
+    """
+    Compute a fingerprint of the options that affect the generated ToC (and
+    of the versions of this tool and of the ToC format, since the ToCs may
+    change between versions).
+    """
+    relevant = {
+        key: value
+        for key, value in options.items()
+        if key not in _OPTIONS_NOT_IN_FINGERPRINT
+    }
+    payload = json.dumps(
+        [markdown_toc_creator.__version__, _CACHE_FORMAT_VERSION, relevant],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def hashContent(content: bytes) -> str:
+    """Hash the content of a file"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class CacheRecord(NamedTuple):
+    """The cached state of a file whose ToC is up to date"""
+
+    key: str
+    digest: str
+    mtimeNs: int
+    size: int
+
+    @classmethod
+    def fromFile(cls, filename: Path) -> CacheRecord:
+        """Build the record from the current state of the file"""
+        stat = filename.stat()
+        return cls(
+            key=_cacheKey(filename),
+            digest=hashContent(filename.read_bytes()),
+            mtimeNs=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+
+
+class TocCache:
+    """
+    An on-disk record of the markdown files whose ToCs are already up to
+    date, keyed by the file path, its content hash, and the fingerprint of the
+    options.
+
+    The records live in an SQLite database, which makes it safe for several
+    processes (such as parallel workers, or concurrent runs of this tool) to
+    share the same cache directory. When there are more than `maxEntries`
+    records, the least recently used ones are evicted. A cache can be used
+    from several threads at once (such as the `--io-concurrency` threads).
+
+    A `readOnly` cache (such as a `--jobs` worker's) opens an existing
+    database without ever writing to it: its lookups don't count as uses,
+    so the records that it finds are to be stored again by the process that
+    owns the cache.
+    """
+
+    def __init__(
+            self,
+            cacheDir: Path,
+            fingerprint: str,
+            *,
+            maxEntries: int = DEFAULT_MAX_ENTRIES,
+            readOnly: bool = False,
+    ) -> None:
+        self.cacheDir = cacheDir
+        self.fingerprint = fingerprint
+        self.maxEntries = maxEntries
+        self.readOnly = readOnly
+        self._pending: list[tuple[str, str, str, int, int, float]] = []
+        # The (time, path, fingerprint) of the records that were looked up
+        self._touched: list[tuple[float, str, str]] = []
+        # Guards the connection and the pending updates (files are read and
+        # hashed outside of it)
+        self._lock = threading.Lock()
+
+        # (`sqlite3` is imported here, as the cache is optional)
+        import sqlite3  # noqa: PLC0415
+
+        if readOnly:
+            databaseUri = (self.cacheDir / CACHE_DB_NAME).resolve().as_uri()
+            self._conn = sqlite3.connect(
+                f'{databaseUri}?mode=ro',
+                uri=True,
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,  # serialized by `self._lock`
+            )
+            return
+
+        self.cacheDir.mkdir(parents=True, exist_ok=True)
+        gitignore = self.cacheDir / '.gitignore'
+        if not gitignore.exists():
+            gitignore.write_text('*\n', encoding='utf-8')
+
+        self._conn = sqlite3.connect(
+            self.cacheDir / CACHE_DB_NAME,
+            timeout=30,
+            isolation_level=None,  # we manage transactions ourselves
+            check_same_thread=False,  # serialized by `self._lock`
+        )
+        # Losing the last few records in a crash only costs a re-check
+        self._conn.execute('PRAGMA synchronous=OFF')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' path TEXT NOT NULL,'
+            ' fingerprint TEXT NOT NULL,'
+            ' digest TEXT NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_used REAL NOT NULL,'
+            ' PRIMARY KEY (path, fingerprint)'
+            ')'
+        )
+
+    def lookup(self, filename: Path) -> CacheRecord | None:
+        """
+        Look up the file, and return its (refreshed) record if its ToC is
+        known to be up to date. A matching size and modification time is
+        trusted without reading the file; otherwise, the content hash is
+        compared. Unless the cache is read-only, a hit counts as a use of the
+        record (for the eviction).
+        """
+        key = _cacheKey(filename)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT digest, mtime_ns, size FROM entries'
+                ' WHERE path = ? AND fingerprint = ?',
+                (key, self.fingerprint),
+            ).fetchone()
+        if row is None:
+            return None
+
+        digest, mtimeNs, size = row
+        stat = filename.stat()
+        if (
+            stat.st_mtime_ns != mtimeNs or stat.st_size != size
+        ) and hashContent(filename.read_bytes()) != digest:
+            return None
+
+        if not self.readOnly:
+            with self._lock:
+                self._touched.append((time.time(), key, self.fingerprint))
+                if len(self._touched) >= FLUSH_EVERY_N_UPDATES:
+                    self._flush()
+
+        return CacheRecord(key, digest, stat.st_mtime_ns, stat.st_size)
+
+    def store(self, record: CacheRecord) -> None:
+        """
+        Record that the ToC of a file is up to date. Records are written to
+        the database in batches.
+        """
+        with self._lock:
+            self._pending.append((
+                record.key,
+                self.fingerprint,
+                record.digest,
+                record.mtimeNs,
+                record.size,
+                time.time(),
+            ))
+            if len(self._pending) >= FLUSH_EVERY_N_UPDATES:
+                self._flush()
+
+    def flush(self) -> None:
+        """
+        Write the pending records, and the last use of the records that were
+        looked up, into the database
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending and not self._touched:
+            return
+
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany(
+                'UPDATE entries SET last_used = MAX(last_used, ?)'
+                ' WHERE path = ? AND fingerprint = ?',
+                self._touched,
+            )
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO entries'
+                ' (path, fingerprint, digest, mtime_ns, size, last_used)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                self._pending,
+            )
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+        self._conn.execute('COMMIT')
+        self._pending.clear()
+        self._touched.clear()
+
+    def evict(self) -> None:
+        """Remove the least recently used records beyond `maxEntries`"""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM entries WHERE rowid IN ('
+                ' SELECT rowid FROM entries'
+                ' ORDER BY last_used DESC, rowid DESC'
+                ' LIMIT -1 OFFSET ?'
+                ')',
+                (self.maxEntries,),
+            )
+
+    def close(self) -> None:
+        """
+        Flush the pending records, evict the least recently used ones, and
+        close the database
+        """
+        try:
+            if not self.readOnly:
+                self.flush()
+                self.evict()
+        finally:
+            self._conn.close()
+
+
+def _cacheKey(filename: Path) -> str:
+    return filename.resolve().as_posix()
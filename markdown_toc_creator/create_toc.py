@@ -1,14 +1,41 @@
 from __future__ import annotations
 
+import mmap
+import os
+import sys
+from dataclasses import dataclass, field, replace
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 from markdown_toc_creator.exceptions import (
     HeaderLevelNotContinuousError,
     HeaderLevelOutOfBoundError,
 )
-from markdown_toc_creator.toc_entry import TocEntry, deduplicateAnchorLinkText
+from markdown_toc_creator.scanner import (
+    DEFAULT_ENGINE,
+    TOC_TAG,
+    Heading,
+    ScanResult,
+    findFirstNonEmptyLine,
+    scanMarkdown,
+    scanMarkdownBytes,
+)
+from markdown_toc_creator.stats import currentStats, timePhase, trackFile
+from markdown_toc_creator.toc_entry import (
+    TocEntry,
+    deduplicateAnchorLinkText,
+    getMemoCacheStats,
+)
+from markdown_toc_creator.writer import (
+    replaceFile,
+    writeAtomically,
+    writeTempFile,
+)
 
-TOC_TAG = '<!--TOC-->'
+if TYPE_CHECKING:
+    from typing import TextIO
+
+    from markdown_toc_creator.incremental import HeadingIndex
 
 DEFAULT_HORIZONTAL_RULE_STYLE: str = 'mdformat'
 HORIZONTAL_RULE_STYLES: dict[str, str] = {
@@ -19,133 +46,211 @@ HORIZONTAL_RULE_STYLES: dict[str, str] = {
     'prettier': '---',
 }
 
-
-def createToc(  # noqa: C901, PLR0915
-        filename: Path,
+# Files at least this large are memory-mapped rather than read into memory
+DEFAULT_MMAP_THRESHOLD: int = 32 * 1024 * 1024
+
+# The file name shown in the error messages about in-memory markdown texts
+STRING_FILENAME: str = '<string>'
+
+
+# Subclassing `list` (rather than `UserList`) keeps `createToc()`'s return
+# value a genuine list, as it used to be
+class TocLines(list[str]):  # noqa: FURB189
+    """
+    The rendered ToC entries of a file. It is a regular list of strings, with
+    an additional `changed` attribute telling whether the markdown file was
+    rewritten (or, if not in place, whether it would be rewritten), and the
+    `tocEntries` and `headings` that the lines were rendered from. The line
+    numbers of the `headings` are the ones in the file as it is on disk.
+    """
+
+    changed: bool
+    tocEntries: list[TocEntry]
+    headings: list[Heading]
+
+    def __init__(
+            self,
+            lines: list[str] | None = None,
+            *,
+            changed: bool = False,
+            tocEntries: list[TocEntry] | None = None,
+            headings: list[Heading] | None = None,
+    ) -> None:
+        super().__init__(lines or [])
+        self.changed = changed
+        self.tocEntries = tocEntries or []
+        self.headings = headings or []
+
+
+@dataclass(frozen=True)
+class TocResult:
+    """The outcome of creating the table of contents of a markdown text"""
+
+    # The new markdown text (the same as the original if nothing changed)
+    text: str
+    tocEntries: list[TocEntry]
+    changed: bool
+    # The headings of the new markdown text
+    headings: list[Heading] = field(default_factory=list)
+    # The headings of the original markdown text (the same as `headings` if
+    # nothing changed)
+    originalHeadings: list[Heading] = field(default_factory=list)
+
+    @property
+    def tocLines(self) -> list[str]:
+        """The rendered ToC entries"""
+        return [_.render() for _ in self.tocEntries]
+
+    @property
+    def lines(self) -> list[str]:
+        """The lines of the new markdown text (with their line breaks)"""
+        return self.text.splitlines(keepends=True)
+
+
+def createTocFromString(
+        text: str,
         *,
+        filename: Path | None = None,
         skip_first_n_lines: int = 1,
-        quiet: bool = False,
-        in_place: bool = True,
         proactive: bool = True,
         add_toc_title: bool = True,
         add_horizontal_rules: bool = True,
         toc_title: str = 'Table of Contents',
         style: str = 'github',
         horizontal_rule_style: str = DEFAULT_HORIZONTAL_RULE_STYLE,
-) -> list[str]:
-    """Create table of content"""
-    if not quiet:
-        print('----------------------')
-        print(filename)
-        print()
-
-    lines: list[str]
-    with Path(filename).open(encoding='utf-8') as fp:
-        lines = fp.readlines()
-
-    lines = [_[:-1] for _ in lines]  # remove '\n' at the end of each line
-
-    hasInsertionPoint = hasTocInsertionPoint(lines)
-    if not hasInsertionPoint and not proactive:
-        return []
-
-    prevLevel = -1  # just a placeholder
-    initialLevel = -1  # just a placeholder
-
-    isInitialHeader: bool = True
-    tocEntries: list[TocEntry] = []
-    inCodeBlock: bool = False
-    errMsg: str
-
-    for i, line in enumerate(lines):
-        if line.strip().startswith('```'):
-            inCodeBlock = not inCodeBlock
-
-        if i + 1 <= skip_first_n_lines:
-            continue
-
-        if line.strip().startswith('#') and not inCodeBlock:
-            thisLevel: int = _countNumOfPoundSigns(line)
-            if isInitialHeader:
-                isInitialHeader = False
-                initialLevel = thisLevel
-                prevLevel = thisLevel
-
-            if thisLevel < initialLevel:
-                errMsg = (
-                    f'{filename.as_posix()}:{i + 1}:'
-                    f'\n    Header level of Line {i + 1} ("{line}") is'
-                    f' {thisLevel},'
-                    ' higher than the initial header level of the document'
-                    f' body (which is {initialLevel}). A table of contents'
-                    " can't be correctly generated in this case. You may want"
-                    ' to reduce the `--skip-first-n-lines` config option to'
-                    ' skip fewer lines at the beginning of this file. Or you'
-                    f' can adjust the header level at Line {i + 1}.'
-                )
-                raise HeaderLevelOutOfBoundError(errMsg)
-
-            if thisLevel - prevLevel > 1:
-                errMsg = (
-                    f'{filename.as_posix()}:{i + 1}:'
-                    f'\n    Header level of Line {i + 1} ("{line}") is'
-                    f' {thisLevel}, which is {thisLevel - prevLevel} lower'
-                    f' than the previous level (which is {prevLevel}). To'
-                    f' correctly create a table of contents, header levels'
-                    f' shall not skip several levels downwards (but it can'
-                    f' skip several levels upwards).'
-                )
-                raise HeaderLevelNotContinuousError(errMsg)
-
-            absoluteLevelDiff: int = thisLevel - initialLevel
-            indent = absoluteLevelDiff * '  '
-
-            tocEntries.append(TocEntry(line.strip(), indent, style=style))
-
-            prevLevel = thisLevel
-
-    if proactive and (not hasInsertionPoint) and not tocEntries:
-        # Proactive mode should not create ToCs without headings beyond the
-        # skipped lines
-        return []
-
-    deduplicateAnchorLinkText(tocEntries=tocEntries)
+        engine: str = DEFAULT_ENGINE,
+        headingIndex: HeadingIndex | None = None,
+) -> TocResult:
+    """
+    Create the table of contents of a markdown text, without reading or
+    writing any file and without printing. `filename` is only used in error
+    messages. With a `headingIndex` (see `IncrementalTocCreator`), the anchor
+    links of the headers unchanged since its previous run are reused.
+    """
+    with timePhase('scan'):
+        scan: ScanResult = scanMarkdown(
+            text, skip_first_n_lines=skip_first_n_lines, engine=engine
+        )
+
+    plan: _TocPlan | None = _planToc(
+        text,
+        scan,
+        filename=Path(STRING_FILENAME) if filename is None else filename,
+        proactive=proactive,
+        add_toc_title=add_toc_title,
+        add_horizontal_rules=add_horizontal_rules,
+        toc_title=toc_title,
+        style=style,
+        horizontal_rule_style=horizontal_rule_style,
+        headingIndex=headingIndex,
+    )
+    if plan is None:
+        return TocResult(
+            text,
+            [],
+            changed=False,
+            headings=scan.headings,
+            originalHeadings=scan.headings,
+        )
+
+    # Only the ToC region is compared (and the comparison stops at the first
+    # mismatch)
+    if text[plan.start : plan.end] == plan.replacement:
+        return TocResult(
+            text,
+            plan.tocEntries,
+            changed=False,
+            headings=scan.headings,
+            originalHeadings=scan.headings,
+        )
+
+    return TocResult(
+        text[: plan.start] + plan.replacement + text[plan.end :],
+        plan.tocEntries,
+        changed=True,
+        headings=_shiftHeadings(
+            scan.headings,
+            end=plan.end,
+            numOfNewLines=(
+                plan.replacement.count('\n')
+                - text.count('\n', plan.start, plan.end)
+            ),
+            numOfNewChars=len(plan.replacement) - (plan.end - plan.start),
+        ),
+        originalHeadings=scan.headings,
+    )
 
-    tocLines: list[str] = [_.render() for _ in tocEntries]
 
-    if not quiet:
-        for entry in tocEntries:
-            print(entry.render())
-
-    final: list[str]
-    if in_place:
-        horizontal_rule: str = _resolve_horizontal_rule(horizontal_rule_style)
-        if hasInsertionPoint:
-            start, end = findTocInsertionPoint(lines)
-            innerContent = _buildInnerTocContent(
-                tocLines=tocLines,
-                add_toc_title=add_toc_title,
-                add_horizontal_rules=add_horizontal_rules,
-                toc_title=toc_title,
-                horizontal_rule=horizontal_rule,
-            )
-            prefix: list[str] = lines[:start]
-            suffix: list[str] = lines[end + 1 :]
-            final = [*prefix, TOC_TAG, *innerContent, TOC_TAG, *suffix]
-        else:
-            final = _insertTocWithoutPlaceholder(
-                lines=lines,
-                tocLines=tocLines,
-                add_toc_title=add_toc_title,
-                add_horizontal_rules=add_horizontal_rules,
-                toc_title=toc_title,
-                horizontal_rule=horizontal_rule,
-            )
+def createTocFromLines(
+        lines: list[str],
+        *,
+        filename: Path | None = None,
+        skip_first_n_lines: int = 1,
+        proactive: bool = True,
+        add_toc_title: bool = True,
+        add_horizontal_rules: bool = True,
+        toc_title: str = 'Table of Contents',
+        style: str = 'github',
+        horizontal_rule_style: str = DEFAULT_HORIZONTAL_RULE_STYLE,
+        engine: str = DEFAULT_ENGINE,
+) -> TocResult:
+    """
+    Create the table of contents of markdown lines, such as the ones from
+    `readlines()` or `splitlines(keepends=True)`. Like `createTocFromString()`,
+    this does no I/O.
+    """
+    return createTocFromString(
+        ''.join(lines),
+        filename=filename,
+        skip_first_n_lines=skip_first_n_lines,
+        proactive=proactive,
+        add_toc_title=add_toc_title,
+        add_horizontal_rules=add_horizontal_rules,
+        toc_title=toc_title,
+        style=style,
+        horizontal_rule_style=horizontal_rule_style,
+        engine=engine,
+    )
 
-        with Path(filename).open('w', encoding='utf-8') as fp:
-            fp.writelines([_ + '\n' for _ in final])
 
-    return tocLines
+def createToc(
+        filename: Path,
+        *,
+        skip_first_n_lines: int = 1,
+        quiet: bool = False,
+        in_place: bool = True,
+        proactive: bool = True,
+        add_toc_title: bool = True,
+        add_horizontal_rules: bool = True,
+        toc_title: str = 'Table of Contents',
+        style: str = 'github',
+        horizontal_rule_style: str = DEFAULT_HORIZONTAL_RULE_STYLE,
+        engine: str = DEFAULT_ENGINE,
+        mmap_threshold: int | None = DEFAULT_MMAP_THRESHOLD,
+        diff: bool = False,
+) -> TocLines:
+    """
+    Create table of content. Files of at least `mmap_threshold` bytes are
+    memory-mapped instead of being read into memory (`None` to disable). If
+    `diff` is True, a unified diff of the changes is printed. The headers are
+    found by one of the `SCANNER_ENGINES`.
+    """
+    with trackFile(Path(filename)):
+        return _createToc(
+            filename,
+            skip_first_n_lines=skip_first_n_lines,
+            quiet=quiet,
+            in_place=in_place,
+            proactive=proactive,
+            add_toc_title=add_toc_title,
+            add_horizontal_rules=add_horizontal_rules,
+            toc_title=toc_title,
+            style=style,
+            horizontal_rule_style=horizontal_rule_style,
+            engine=engine,
+            mmap_threshold=mmap_threshold,
+            diff=diff,
+        )
 
 
 def hasTocInsertionPoint(textLines: list[str]) -> bool:
@@ -177,23 +282,408 @@ def findTocInsertionPoint(textLine: list[str]) -> tuple[int, int]:
     return first, second
 
 
-def _countNumOfPoundSigns(string: str) -> int:
-    numOfPoundSigns: int = 0
-    for char in string:
-        if char == '#':
-            numOfPoundSigns += 1
-        else:
-            break
+def _createTocInMappedFile(
+        filename: Path,
+        *,
+        skip_first_n_lines: int,
+        quiet: bool,
+        in_place: bool,
+        proactive: bool,
+        add_toc_title: bool,
+        add_horizontal_rules: bool,
+        toc_title: str,
+        style: str,
+        horizontal_rule_style: str,
+        engine: str,
+        diff: bool,
+        output: TextIO | None = None,
+) -> TocLines:
+    """
+    Create the ToC of a (large) memory-mapped file. Only the header lines are
+    decoded, and the new file is written by splicing the ToC block between the
+    untouched byte ranges before and after the placeholders. The ToC lines
+    (and the diff) are printed to `output`, or to stdout if it's None.
+    """
+    tempFile: Path
+    with (
+        Path(filename).open('rb') as fp,
+        mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+    ):
+        with timePhase('scan'):
+            scan: ScanResult = scanMarkdownBytes(
+                buffer, skip_first_n_lines=skip_first_n_lines, engine=engine
+            )
+
+        stats = currentStats()
+        if stats is not None:
+            stats.numOfBytesRead += len(buffer)
+
+        plan: _TocPlan | None = _planToc(
+            buffer,
+            scan,
+            filename=filename,
+            proactive=proactive,
+            add_toc_title=add_toc_title,
+            add_horizontal_rules=add_horizontal_rules,
+            toc_title=toc_title,
+            style=style,
+            horizontal_rule_style=horizontal_rule_style,
+        )
+        if plan is None:
+            return TocLines(headings=scan.headings)
+
+        tocLines: list[str] = [_.render() for _ in plan.tocEntries]
+        if not quiet:
+            _printTocLines(tocLines, output=output)
+
+        # Keep the line breaks of the file (which is not the case when the
+        # file is read as text)
+        lineBreak: str = _detectLineBreak(buffer)
+        replacement: bytes = plan.replacement.replace('\n', lineBreak).encode(
+            'utf-8'
+        )
+        if buffer[plan.start : plan.end] == replacement:
+            return TocLines(
+                tocLines,
+                changed=False,
+                tocEntries=plan.tocEntries,
+                headings=scan.headings,
+            )
+
+        if diff:
+            _printDiff(
+                filename,
+                buffer[:].decode('utf-8'),
+                (
+                    buffer[: plan.start] + replacement + buffer[plan.end :]
+                ).decode('utf-8'),
+                output=output,
+            )
 
-    return numOfPoundSigns
+        if stats is not None:
+            stats.numOfChangedFiles += 1
 
+        if not in_place:
+            return TocLines(
+                tocLines,
+                changed=True,
+                tocEntries=plan.tocEntries,
+                headings=scan.headings,
+            )
+
+        # (The headings' line numbers are the ones in the file on disk, which
+        # only change once it's written)
+        newHeadings: list[Heading] = _shiftHeadings(
+            scan.headings,
+            end=plan.end,
+            numOfNewLines=(
+                replacement.count(b'\n')
+                - buffer[plan.start : plan.end].count(b'\n')
+            ),
+            numOfNewChars=len(replacement) - (plan.end - plan.start),
+        )
+
+        with timePhase('write'), memoryview(buffer) as view:
+            # (Without copying the buffer)
+            tempFile = writeTempFile(
+                filename,
+                [view[: plan.start], replacement, view[plan.end :]],
+            )
+
+        if stats is not None:
+            stats.numOfBytesWritten += (
+                len(buffer) - (plan.end - plan.start) + len(replacement)
+            )
 
-def _findFirstNonEmptyLine(lines: list[str]) -> int | None:
-    for index, line in enumerate(lines):
-        if line.strip():
-            return index
+    # The mapped file must be closed before it's replaced (on Windows)
+    with timePhase('write'):
+        replaceFile(tempFile, filename)
 
-    return None
+    return TocLines(
+        tocLines,
+        changed=True,
+        tocEntries=plan.tocEntries,
+        headings=newHeadings,
+    )
+
+
+def _createToc(
+        filename: Path,
+        *,
+        skip_first_n_lines: int,
+        quiet: bool,
+        in_place: bool,
+        proactive: bool,
+        add_toc_title: bool,
+        add_horizontal_rules: bool,
+        toc_title: str,
+        style: str,
+        horizontal_rule_style: str,
+        engine: str,
+        mmap_threshold: int | None,
+        diff: bool,
+) -> TocLines:
+    if not quiet:
+        _printFileHeader(filename)
+
+    content: str | None = _readMarkdown(filename, mmap_threshold)
+    if content is None:
+        return _createTocInMappedFile(
+            filename,
+            skip_first_n_lines=skip_first_n_lines,
+            quiet=quiet,
+            in_place=in_place,
+            proactive=proactive,
+            add_toc_title=add_toc_title,
+            add_horizontal_rules=add_horizontal_rules,
+            toc_title=toc_title,
+            style=style,
+            horizontal_rule_style=horizontal_rule_style,
+            engine=engine,
+            diff=diff,
+        )
+
+    result: TocResult = _createTocOfContent(
+        content,
+        filename=filename,
+        skip_first_n_lines=skip_first_n_lines,
+        quiet=quiet,
+        proactive=proactive,
+        add_toc_title=add_toc_title,
+        add_horizontal_rules=add_horizontal_rules,
+        toc_title=toc_title,
+        style=style,
+        horizontal_rule_style=horizontal_rule_style,
+        engine=engine,
+        diff=diff,
+    )
+    # Unchanged files are not written, so that their modification times are
+    # not bumped (which would confuse build tools and file watchers)
+    written: bool = result.changed and in_place
+    if written:
+        _writeMarkdown(filename, result.text)
+
+    return _toTocLines(result, written=written)
+
+
+def _printFileHeader(filename: Path) -> None:
+    print('----------------------')
+    print(filename)
+    print()
+
+
+def _readMarkdown(filename: Path, mmapThreshold: int | None) -> str | None:
+    """
+    Read a markdown file, or return None if it's large enough (at least
+    `mmapThreshold` bytes) to be memory-mapped instead
+    """
+    with timePhase('read'):
+        size: int = Path(filename).stat().st_size
+        if mmapThreshold is not None and size >= max(mmapThreshold, 1):
+            return None
+
+        content: str = Path(filename).read_text(encoding='utf-8')
+
+    stats = currentStats()
+    if stats is not None:
+        stats.numOfBytesRead += size
+
+    return content
+
+
+def _createTocOfContent(
+        content: str,
+        *,
+        filename: Path,
+        quiet: bool,
+        diff: bool,
+        **options: Any,
+) -> TocResult:
+    """
+    Create the ToC of a markdown file's content, and print the ToC lines (and
+    the diff), but don't write the file
+    """
+    result: TocResult = createTocFromString(
+        content, filename=filename, **options
+    )
+    if not quiet:
+        _printTocLines(result.tocLines)
+
+    if result.changed:
+        if diff:
+            _printDiff(filename, content, result.text)
+
+        stats = currentStats()
+        if stats is not None:
+            stats.numOfChangedFiles += 1
+
+    return result
+
+
+def _writeMarkdown(filename: Path, text: str) -> None:
+    # (Like `Path.write_text()`, which writes the platform's line breaks)
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+
+    data: bytes = text.encode('utf-8')
+    with timePhase('write'):
+        writeAtomically(filename, [data])
+
+    stats = currentStats()
+    if stats is not None:
+        stats.numOfBytesWritten += len(data)
+
+
+def _toTocLines(result: TocResult, *, written: bool) -> TocLines:
+    # (The line numbers of the headings are the ones in the file on disk)
+    return TocLines(
+        result.tocLines,
+        changed=result.changed,
+        tocEntries=result.tocEntries,
+        headings=result.headings if written else result.originalHeadings,
+    )
+
+
+class _TocPlan(NamedTuple):
+    tocEntries: list[TocEntry]
+    # The content at [start, end) is to be replaced with `replacement`
+    start: int
+    end: int
+    replacement: str
+
+
+def _planToc(
+        content: str | mmap.mmap,
+        scan: ScanResult,
+        *,
+        filename: Path,
+        proactive: bool,
+        add_toc_title: bool,
+        add_horizontal_rules: bool,
+        toc_title: str,
+        style: str,
+        horizontal_rule_style: str,
+        headingIndex: HeadingIndex | None = None,
+) -> _TocPlan | None:
+    """
+    Build the ToC entries from the scanned headings, and find where the ToC
+    block goes. Returns None if no ToC should be created.
+    """
+    stats = currentStats()
+    if stats is not None:
+        stats.numOfHeadings += len(scan.headings)
+
+    if not scan.hasInsertionPoint and not proactive:
+        return None
+
+    with timePhase('anchorLinks'):
+        before = getMemoCacheStats()['convertToAnchorLink']
+        tocEntries: list[TocEntry] = _buildTocEntries(
+            scan.headings,
+            filename=filename,
+            style=style,
+            headingIndex=headingIndex,
+        )
+
+    if stats is not None:
+        # (Counted around this synchronous step, rather than per file, because
+        # the files processed concurrently share the memoized anchor links)
+        after = getMemoCacheStats()['convertToAnchorLink']
+        stats.numOfAnchorLinkHits += after.hits - before.hits
+        stats.numOfAnchorLinkMisses += after.misses - before.misses
+
+    if proactive and (not scan.hasInsertionPoint) and not tocEntries:
+        # Proactive mode should not create ToCs without headings beyond the
+        # skipped lines
+        return None
+
+    if headingIndex is None:  # (otherwise, already de-duplicated)
+        with timePhase('deduplicate'):
+            deduplicateAnchorLinkText(tocEntries=tocEntries)
+
+    with timePhase('render'):
+        tocBlock: str = _buildTocBlock(
+            tocLines=[_.render() for _ in tocEntries],
+            add_toc_title=add_toc_title,
+            add_horizontal_rules=add_horizontal_rules,
+            toc_title=toc_title,
+            horizontal_rule=_resolve_horizontal_rule(horizontal_rule_style),
+        )
+        start, end, numOfLineBreaks = _locateTocBlock(content, scan)
+
+    return _TocPlan(tocEntries, start, end, '\n' * numOfLineBreaks + tocBlock)
+
+
+def _printTocLines(
+        tocLines: list[str], *, output: TextIO | None = None
+) -> None:
+    for line in tocLines:
+        print(line, file=output)
+
+
+def _buildTocEntries(
+        headings: list[Heading],
+        *,
+        filename: Path,
+        style: str,
+        headingIndex: HeadingIndex | None = None,
+) -> list[TocEntry]:
+    """
+    Check the header levels, and create ToC entries from the headings. With
+    a `headingIndex`, the entries are also de-duplicated.
+    """
+    prevLevel = -1  # just a placeholder
+    initialLevel = -1  # just a placeholder
+
+    depths: list[int] = []
+    errMsg: str
+
+    for heading in headings:
+        thisLevel: int = heading.level
+        lineNum: int = heading.lineNumber
+        line: str = heading.line
+        if not depths:
+            initialLevel = thisLevel
+            prevLevel = thisLevel
+
+        if thisLevel < initialLevel:
+            errMsg = (
+                f'{filename.as_posix()}:{lineNum}:'
+                f'\n    Header level of Line {lineNum} ("{line}") is'
+                f' {thisLevel},'
+                ' higher than the initial header level of the document'
+                f' body (which is {initialLevel}). A table of contents'
+                " can't be correctly generated in this case. You may want"
+                ' to reduce the `--skip-first-n-lines` config option to'
+                ' skip fewer lines at the beginning of this file. Or you'
+                f' can adjust the header level at Line {lineNum}.'
+            )
+            raise HeaderLevelOutOfBoundError(errMsg)
+
+        if thisLevel - prevLevel > 1:
+            errMsg = (
+                f'{filename.as_posix()}:{lineNum}:'
+                f'\n    Header level of Line {lineNum} ("{line}") is'
+                f' {thisLevel}, which is {thisLevel - prevLevel} lower'
+                f' than the previous level (which is {prevLevel}). To'
+                f' correctly create a table of contents, header levels'
+                f' shall not skip several levels downwards (but it can'
+                f' skip several levels upwards).'
+            )
+            raise HeaderLevelNotContinuousError(errMsg)
+
+        depths.append(thisLevel - initialLevel)
+
+        prevLevel = thisLevel
+
+    displayTexts: list[str] = [_.line.strip() for _ in headings]
+    if headingIndex is not None:
+        return headingIndex.buildTocEntries(displayTexts, depths)
+
+    return [
+        TocEntry(text, depth, style=style)
+        for text, depth in zip(displayTexts, depths, strict=True)
+    ]
 
 
 def _buildInnerTocContent(
@@ -224,14 +714,15 @@ def _buildInnerTocContent(
     return content
 
 
-def _buildProactiveBlock(
+def _buildTocBlock(
         *,
         tocLines: list[str],
         add_toc_title: bool,
         add_horizontal_rules: bool,
         toc_title: str,
         horizontal_rule: str,
-) -> list[str]:
+) -> str:
+    """Build the ToC (including both placeholders and the final line break)"""
     innerContent = _buildInnerTocContent(
         tocLines=tocLines,
         add_toc_title=add_toc_title,
@@ -239,37 +730,99 @@ def _buildProactiveBlock(
         toc_title=toc_title,
         horizontal_rule=horizontal_rule,
     )
-    return [TOC_TAG, *innerContent, TOC_TAG]
-
-
-def _insertTocWithoutPlaceholder(
+    return '\n'.join([TOC_TAG, *innerContent, TOC_TAG]) + '\n'
+
+
+def _locateTocBlock(
+        content: str | mmap.mmap,
+        scan: ScanResult,
+) -> tuple[int, int, int]:
+    """
+    Find where the ToC block goes. Returns the (start, end) offsets of the
+    content to replace with the ToC block, and how many line breaks should
+    precede the ToC block. Everything outside of this range stays as is.
+    """
+    if scan.hasInsertionPoint:
+        start = scan.placeholderSpans[0][0]
+        end = scan.placeholderSpans[1][1]
+        return start, end, 0
+
+    # Without placeholders, the ToC goes after the header on the first line
+    # (or lines, for a setext header), or otherwise at the very beginning,
+    # after an empty line
+    firstNonEmptyLine = findFirstNonEmptyLine(content)
+    if firstNonEmptyLine is None:
+        return 0, len(content), 1
+
+    titleEnd: int | None = scan.titleEnd
+    if titleEnd is None:  # (not known to the "simple" engine)
+        lineStart, lineEnd = firstNonEmptyLine
+        isHeader: bool = content[lineStart:lineEnd].lstrip()[:1] in {'#', b'#'}
+        titleEnd = lineEnd if isHeader else 0
+
+    if titleEnd:
+        endsWithLineBreak = content[titleEnd - 1 : titleEnd] in {'\n', b'\n'}
+        return titleEnd, titleEnd, 1 if endsWithLineBreak else 2
+
+    return 0, 0, 1
+
+
+def _shiftHeadings(
+        headings: list[Heading],
         *,
-        lines: list[str],
-        tocLines: list[str],
-        add_toc_title: bool,
-        add_horizontal_rules: bool,
-        toc_title: str,
-        horizontal_rule: str,
-) -> list[str]:
-    tocSection = _buildProactiveBlock(
-        tocLines=tocLines,
-        add_toc_title=add_toc_title,
-        add_horizontal_rules=add_horizontal_rules,
-        toc_title=toc_title,
-        horizontal_rule=horizontal_rule,
+        end: int,
+        numOfNewLines: int,
+        numOfNewChars: int,
+) -> list[Heading]:
+    """
+    Get the headings of the new content, after the ToC block ending at `end`
+    has grown by `numOfNewLines` lines and `numOfNewChars` chars (or bytes)
+    """
+    return [
+        replace(
+            _,
+            lineNumber=_.lineNumber + numOfNewLines,
+            offset=_.offset + numOfNewChars,
+        )
+        if _.offset >= end
+        else _
+        for _ in headings
+    ]
+
+
+def _detectLineBreak(buffer: mmap.mmap) -> str:
+    firstLineBreak = buffer.find(b'\n')
+    if firstLineBreak > 0 and buffer[firstLineBreak - 1] == ord('\r'):
+        return '\r\n'
+
+    return '\n'
+
+
+def _printDiff(
+        filename: Path,
+        oldText: str,
+        newText: str,
+        *,
+        output: TextIO | None = None,
+) -> None:
+    """
+    Print the unified diff between the old and the new text (to `output`, or
+    to stdout if it's None)
+    """
+    import difflib  # noqa: PLC0415
+
+    stream: TextIO = sys.stdout if output is None else output
+
+    diffLines = difflib.unified_diff(
+        oldText.splitlines(keepends=True),
+        newText.splitlines(keepends=True),
+        fromfile=str(filename),
+        tofile=str(filename),
     )
-    blockWithSpacing = ['', *tocSection]
-
-    firstNonEmptyIndex = _findFirstNonEmptyLine(lines)
-    if firstNonEmptyIndex is None:
-        return blockWithSpacing
-
-    firstLine = lines[firstNonEmptyIndex]
-    if firstLine.lstrip().startswith('#'):
-        insertPos = firstNonEmptyIndex + 1
-        return lines[:insertPos] + blockWithSpacing + lines[insertPos:]
-
-    return blockWithSpacing + lines
+    for line in diffLines:
+        stream.write(line)
+        if not line.endswith('\n'):
+            stream.write('\n\\ No newline at end of file\n')
 
 
 def _resolve_horizontal_rule(style: str) -> str:
@@ -0,0 +1,220 @@
+"""
+Select the markdown files that changed according to git (since a commit, or
+in the staging area), so that CI runs only process the files of a PR rather
+than the whole tree. Git is called once (or a few times) per repository, not
+once per file.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from markdown_toc_creator.walker import (
+    MARKDOWN_EXTENSIONS,
+    isIgnoredByGitignore,
+)
+
+if TYPE_CHECKING:
+    import re
+    from collections.abc import Iterable
+
+
+class GitError(Exception):
+    """A git command that failed (such as with an unknown commit)"""
+
+
+class ChangedFiles(NamedTuple):
+    """The outcome of `selectChangedFiles()`"""
+
+    # The changed files among the paths (in the order of the walker)
+    filenames: list[Path]
+    # The paths that are not in a git repository (or all of them, if git is
+    # not installed), which should be processed in full instead
+    outsideGit: list[Path]
+
+
+def selectChangedFiles(
+        paths: Iterable[str | Path],
+        *,
+        since: str | None = None,
+        staged: bool = False,
+        excludePattern: re.Pattern[str],
+        respectGitignore: bool = False,
+) -> ChangedFiles:
+    """
+    Select the files that `iterMarkdownPaths()` would yield for `paths`, but
+    only those that changed according to git: since the merge base of the
+    commit `since` and HEAD (up to the working tree, new untracked files
+    included, or to the staging area if `staged` is True), or in the staging
+    area (if only `staged` is True). Deleted files are left out.
+    """
+    repoRoots: dict[Path, Path | None] = {}
+    changedByRepo: dict[Path, frozenset[Path] | None] = {}
+    filenames: list[Path] = []
+    outsideGit: list[Path] = []
+    for path_ in paths:
+        path = Path(path_)
+        if not path.exists():
+            continue
+
+        resolved = path.resolve()
+        repoRoot = _findRepoRoot(
+            resolved if path.is_dir() else resolved.parent, repoRoots
+        )
+        changed: frozenset[Path] | None = None
+        if repoRoot is not None:
+            if repoRoot not in changedByRepo:
+                changedByRepo[repoRoot] = _listChangedFiles(
+                    repoRoot, since=since, staged=staged
+                )
+
+            changed = changedByRepo[repoRoot]
+
+        if changed is None:
+            outsideGit.append(path)
+        elif path.is_file():
+            if resolved in changed and not excludePattern.search(
+                path.as_posix()
+            ):
+                filenames.append(path)
+        else:
+            filenames.extend(
+                _selectInFolder(
+                    path,
+                    resolved,
+                    changed,
+                    excludePattern=excludePattern,
+                    respectGitignore=respectGitignore,
+                )
+            )
+
+    return ChangedFiles(filenames, outsideGit)
+
+
+def _selectInFolder(
+        folder: Path,
+        resolvedFolder: Path,
+        changed: frozenset[Path],
+        *,
+        excludePattern: re.Pattern[str],
+        respectGitignore: bool,
+) -> list[Path]:
+    selected: list[Path] = []
+    for changedFile in changed:
+        if not changedFile.name.endswith(
+            MARKDOWN_EXTENSIONS
+        ) or not changedFile.is_relative_to(resolvedFolder):
+            continue
+
+        # (Like the walker, which checks the folders on the way down too)
+        parts = changedFile.relative_to(resolvedFolder).parts
+        if any(
+            excludePattern.search(folder.joinpath(*parts[:i]).as_posix())
+            for i in range(len(parts) + 1)
+        ):
+            continue
+
+        filename = folder.joinpath(*parts)
+        if filename.is_file() and not (
+            respectGitignore and isIgnoredByGitignore(filename)
+        ):
+            selected.append(filename)
+
+    # (The same order as the walker's)
+    return sorted(
+        selected, key=lambda _: [os.path.normcase(part) for part in _.parts]
+    )
+
+
+def _findRepoRoot(
+        folder: Path, repoRoots: dict[Path, Path | None]
+) -> Path | None:
+    """Find the root of the git repository that contains the folder"""
+    if folder not in repoRoots:
+        if (folder / '.git').exists():  # (a folder, or a file for worktrees)
+            repoRoots[folder] = folder
+        elif folder.parent == folder:
+            repoRoots[folder] = None
+        else:
+            repoRoots[folder] = _findRepoRoot(folder.parent, repoRoots)
+
+    return repoRoots[folder]
+
+
+def _listChangedFiles(
+        repoRoot: Path,
+        *,
+        since: str | None,
+        staged: bool,
+) -> frozenset[Path] | None:
+    """
+    List the (absolute paths of the) changed files of a repository. Returns
+    None if git is not installed.
+
+    With `since`, the changes are the ones made since the merge base of
+    `since` and HEAD (like in `git diff since...HEAD`, so that the commits
+    made on `since` in the meantime are not taken for changes), up to the
+    working tree or to the staging area. Up to the working tree, the new
+    untracked files (except for the ignored ones) are changed files too.
+    """
+    diff: list[str] = [
+        'diff',
+        '--name-only',
+        '-z',
+        '--diff-filter=d',  # (not the deleted files)
+    ]
+    if staged:
+        diff.append('--cached')
+
+    if since is not None:
+        if since.startswith('-'):  # (it would be taken for an option)
+            raise GitError(f'Invalid git revision: {since}')
+
+        mergeBase = _runGit(repoRoot, 'merge-base', since, 'HEAD')
+        if mergeBase is None:
+            return None
+
+        diff.append(mergeBase.decode('ascii').strip())
+
+    diff.append('--')  # (so that the revision cannot be taken for a path)
+    output = _runGit(repoRoot, *diff)
+    if output is None:
+        return None
+
+    if since is not None and not staged:
+        untracked = _runGit(
+            repoRoot, 'ls-files', '--others', '--exclude-standard', '-z'
+        )
+        output += b'\0' + (untracked or b'')
+
+    # (The paths are relative to the root of the repository)
+    return frozenset(
+        repoRoot / os.fsdecode(_) for _ in output.split(b'\0') if _
+    )
+
+
+def _runGit(repoRoot: Path, *args: str) -> bytes | None:
+    """
+    Run a git command in the repository, and get its output. Returns None if
+    git is not installed.
+    """
+    # (Imported here, because only this option runs subprocesses)
+    import subprocess  # noqa: PLC0415, S404
+
+    command: list[str] = ['git', '-C', str(repoRoot), *args]
+    try:
+        proc = subprocess.run(  # noqa: S603
+            command, capture_output=True, check=False
+        )
+    except FileNotFoundError:
+        return None
+
+    if proc.returncode != 0:
+        raise GitError(
+            proc.stderr.decode('utf-8', errors='replace').strip()
+            or f'"{" ".join(command)}" failed'
+        )
+
+    return proc.stdout
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+from markdown_toc_creator.toc_entry import ASCII_SPACES
+
+_REPLACEMENT_CHARACTER: str = '\ufffd'
+_MAX_CODE_POINT: int = 0x10FFFF
+_SURROGATES: range = range(0xD800, 0xDFFF + 1)
+_C1_CONTROLS: range = range(0x80, 0x9F + 1)
+_DECIMAL_REFERENCE = re.compile(r'([0-9]+)(.*)', flags=re.DOTALL)
+_HEX_REFERENCE = re.compile(r'([0-9a-f]+)(.*)', flags=re.DOTALL)
+
+
+class HtmlTextExtractor(HTMLParser):
+    """
+    Collect the text of an HTML snippet. To stay compatible with the anchor
+    links generated with BeautifulSoup, this follows BeautifulSoup's rules:
+    the content of `<script>`, `<style>`, and `<template>` is dropped, and a
+    whitespace-only piece of text between two tags collapses into one space
+    (or one newline), unless it is inside `<pre>` or `<textarea>`. Character
+    references are decoded like BeautifulSoup does, too: an unknown named
+    one (like `&bogus;`) is kept without its semicolon, and an unterminated
+    one at the end of the text (like a trailing `&amp`) is kept as is.
+    """
+
+    NON_TEXT_TAGS: frozenset[str] = frozenset({'script', 'style', 'template'})
+    WHITESPACE_PRESERVING_TAGS: frozenset[str] = frozenset({
+        'pre',
+        'textarea',
+    })
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self._texts: list[str] = []
+        self._pendingData: list[str] = []
+        self._openTags: list[str] = []
+
+    def getText(self) -> str:
+        """Get the text collected so far"""
+        return ''.join(self._texts)
+
+    def handle_starttag(
+            self,
+            tag: str,
+            attrs: list[tuple[str, str | None]],  # noqa: ARG002
+    ) -> None:
+        """Start collecting the content of a tag"""
+        self._flushData()
+        self._openTags.append(tag)
+
+    def handle_startendtag(
+            self,
+            tag: str,  # noqa: ARG002
+            attrs: list[tuple[str, str | None]],  # noqa: ARG002
+    ) -> None:
+        """Handle a self-closing tag (which has no content)"""
+        self._flushData()
+
+    def handle_endtag(self, tag: str) -> None:
+        """Stop collecting the content of a tag"""
+        self._flushData()
+        if tag in self._openTags:
+            # Also close the unclosed tags nested in this one
+            lastIndex = len(self._openTags) - self._openTags[::-1].index(tag)
+            del self._openTags[lastIndex - 1 :]
+
+    def handle_data(self, data: str) -> None:
+        """Collect a piece of text"""
+        self._pendingData.append(data)
+
+    def handle_entityref(self, name: str) -> None:
+        """Decode a named character reference (like `&amp;`)"""
+        self._pendingData.append(html5.get(f'{name};', f'&{name}'))
+
+    def handle_charref(self, name: str) -> None:
+        """Decode a numeric character reference (like `&#38;` or `&#x26;`)"""
+        base, digits, pattern = 10, name, _DECIMAL_REFERENCE
+        if name[:1] in {'x', 'X'}:
+            base, digits, pattern = 16, name[1:], _HEX_REFERENCE
+
+        extraData: str = ''
+        try:
+            codePoint = int(digits, base)
+        except ValueError:
+            # Only the leading digits are part of the reference
+            match = pattern.match(digits)
+            if match is None:
+                self._pendingData.append(name)
+                return
+
+            digits, extraData = match.groups()
+            codePoint = int(digits, base)
+
+        self._pendingData.append(_decodeCodePoint(codePoint))
+        self._pendingData.append(extraData)
+
+    def handle_comment(self, data: str) -> None:  # noqa: ARG002
+        """Skip a comment"""
+        self._flushData()
+
+    def handle_decl(self, decl: str) -> None:  # noqa: ARG002
+        """Skip a declaration (such as `<!DOCTYPE html>`)"""
+        self._flushData()
+
+    def handle_pi(self, data: str) -> None:  # noqa: ARG002
+        """Skip a processing instruction"""
+        self._flushData()
+
+    def unknown_decl(self, data: str) -> None:
+        """Keep the text of CDATA sections"""
+        self._flushData()
+        if data.startswith('CDATA['):
+            self._texts.append(data.removeprefix('CDATA['))
+
+    def close(self) -> None:
+        """Process the remaining data"""
+        super().close()
+        self._flushData()
+
+    def _flushData(self) -> None:
+        if not self._pendingData:
+            return
+
+        text = ''.join(self._pendingData)
+        self._pendingData.clear()
+
+        if self.NON_TEXT_TAGS.intersection(self._openTags):
+            return
+
+        if not text.strip(
+            ASCII_SPACES
+        ) and not self.WHITESPACE_PRESERVING_TAGS.intersection(self._openTags):
+            text = '\n' if '\n' in text else ' '
+
+        self._texts.append(text)
+
+
+def _decodeCodePoint(codePoint: int) -> str:
+    # (Like the HTML spec, and BeautifulSoup: invalid code points become
+    # U+FFFD, and C1 controls are taken as Windows-1252 characters)
+    if codePoint == 0 or codePoint > _MAX_CODE_POINT:
+        return _REPLACEMENT_CHARACTER
+
+    if codePoint in _SURROGATES:
+        return _REPLACEMENT_CHARACTER
+
+    if codePoint in _C1_CONTROLS:
+        try:
+            return bytes([codePoint]).decode('cp1252')
+        except UnicodeDecodeError:
+            pass  # (unassigned in Windows-1252, so kept as is)
+
+    return chr(codePoint)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+from markdown_toc_creator.create_toc import (
+    DEFAULT_HORIZONTAL_RULE_STYLE,
+    STRING_FILENAME,
+    TocResult,
+    createTocFromString,
+)
+from markdown_toc_creator.scanner import DEFAULT_ENGINE
+from markdown_toc_creator.toc_entry import AnchorLinkDeduplicator, TocEntry
+
+# The numbered suffixes of de-duplicated anchor links (such as "-1", or
+# "-1-2" for "#foo-1-2"). An anchor link can only collide with the ones that
+# have the same root: "#foo", "#foo 1" and "#foo-1-1" all may (as "#foo-1"
+# or "#foo-1-1"), but "#bar" never does.
+_NUMBERED_SUFFIXES = re.compile(r'(?:-[0-9]+)+$')
+
+
+class HeadingIndex:
+    """
+    The anchor links of one document's headers in the previous run. The next
+    run only computes the anchor links of new or changed headers, and only
+    de-duplicates again the anchor links of the groups that changed.
+    """
+
+    def __init__(self, style: str) -> None:
+        self.style = style
+        # Header text -> anchor link (before de-duplication)
+        self._anchorLinks: dict[str, str] = {}
+        # Root of anchor links (without numbered suffixes) -> the anchor links
+        # of its headers (in order), and their de-duplicated anchor links, for
+        # the roots of more than one header
+        self._groups: dict[str, tuple[list[str], list[str]]] = {}
+        self.numOfReusedAnchorLinks: int = 0
+        self.numOfComputedAnchorLinks: int = 0
+        # Anchor link -> its root (for the anchor links that end with a digit)
+        self._roots: dict[str, str] = {}
+        # (The anchor links of the groups that were de-duplicated again)
+        self.numOfDeduplicatedAnchorLinks: int = 0
+
+    def buildTocEntries(
+            self,
+            displayTexts: list[str],
+            depths: list[int],
+    ) -> list[TocEntry]:
+        """Create the de-duplicated ToC entries of the document's headers"""
+        anchorLinks: dict[str, str] = {}
+        tocEntries: list[TocEntry] = []
+        for text, depth in zip(displayTexts, depths, strict=True):
+            anchorLink = anchorLinks.get(text) or self._anchorLinks.get(text)
+            if anchorLink is None:
+                entry = TocEntry(text, depth, style=self.style)
+                self.numOfComputedAnchorLinks += 1
+            else:
+                entry = TocEntry(
+                    text, depth, style=self.style, anchorLinkText=anchorLink
+                )
+                self.numOfReusedAnchorLinks += 1
+
+            anchorLinks[text] = entry.anchorLinkText
+            tocEntries.append(entry)
+
+        # The headers that are gone are forgotten
+        self._anchorLinks = anchorLinks
+        self._deduplicate(tocEntries)
+        return tocEntries
+
+    def _deduplicate(self, tocEntries: list[TocEntry]) -> None:
+        """
+        De-duplicate the anchor links, like `deduplicateAnchorLinkText()`.
+        Anchor links only collide with the ones that have the same root, so
+        each group of anchor links with the same root is de-duplicated on its
+        own, and the groups whose anchor links are the same as in the previous
+        run (in the same order) keep their de-duplicated anchor links.
+        """
+        roots: dict[str, str] = {}
+        groups: dict[str, list[TocEntry]] = {}
+        for entry in tocEntries:
+            anchorLink: str = entry.anchorLinkText
+            root: str = anchorLink
+            if anchorLink[-1:].isdigit():
+                root = (
+                    roots.get(anchorLink)
+                    or self._roots.get(anchorLink)
+                    or _NUMBERED_SUFFIXES.sub('', anchorLink)
+                )
+                roots[anchorLink] = root
+
+            group = groups.get(root)
+            if group is None:
+                groups[root] = [entry]
+            else:
+                group.append(entry)
+
+        self._roots = roots
+        previousGroups = self._groups
+        self._groups = {}
+        for root, group in groups.items():
+            if len(group) == 1:  # (the first anchor link is kept as is)
+                continue
+
+            anchorLinks: list[str] = [_.anchorLinkText for _ in group]
+            if len(set(anchorLinks)) == len(anchorLinks):
+                continue  # (nothing is repeated, so nothing is numbered)
+            previous = previousGroups.get(root)
+            if previous is not None and previous[0] == anchorLinks:
+                uniqueAnchorLinks = previous[1]
+            else:
+                deduplicator = AnchorLinkDeduplicator(self.style)
+                uniqueAnchorLinks = [
+                    deduplicator.deduplicate(_) for _ in anchorLinks
+                ]
+                self.numOfDeduplicatedAnchorLinks += len(anchorLinks)
+
+            for entry, uniqueAnchorLink in zip(
+                group, uniqueAnchorLinks, strict=True
+            ):
+                entry.anchorLinkText = uniqueAnchorLink
+
+            self._groups[root] = (anchorLinks, uniqueAnchorLinks)
+
+
+class IncrementalTocCreator:
+    """
+    Create the tables of contents of documents that are edited repeatedly
+    (such as in an editor), keeping each document's `HeadingIndex` between
+    runs. The options are the same as `createTocFromString()`'s.
+    """
+
+    def __init__(
+            self,
+            *,
+            skip_first_n_lines: int = 1,
+            proactive: bool = True,
+            add_toc_title: bool = True,
+            add_horizontal_rules: bool = True,
+            toc_title: str = 'Table of Contents',
+            style: str = 'github',
+            horizontal_rule_style: str = DEFAULT_HORIZONTAL_RULE_STYLE,
+            engine: str = DEFAULT_ENGINE,
+    ) -> None:
+        self.skip_first_n_lines = skip_first_n_lines
+        self.proactive = proactive
+        self.add_toc_title = add_toc_title
+        self.add_horizontal_rules = add_horizontal_rules
+        self.toc_title = toc_title
+        self.style = style
+        self.horizontal_rule_style = horizontal_rule_style
+        self.engine = engine
+        self._indexes: dict[Path, HeadingIndex] = {}
+
+    def update(self, text: str, *, filename: Path | None = None) -> TocResult:
+        """
+        Create the ToC of the current text of a document. `filename`
+        identifies the document (and is used in error messages).
+        """
+        key = Path(STRING_FILENAME) if filename is None else Path(filename)
+        headingIndex = self._indexes.get(key)
+        if headingIndex is None:
+            headingIndex = self._indexes[key] = HeadingIndex(self.style)
+
+        return createTocFromString(
+            text,
+            filename=key,
+            skip_first_n_lines=self.skip_first_n_lines,
+            proactive=self.proactive,
+            add_toc_title=self.add_toc_title,
+            add_horizontal_rules=self.add_horizontal_rules,
+            toc_title=self.toc_title,
+            style=self.style,
+            horizontal_rule_style=self.horizontal_rule_style,
+            engine=self.engine,
+            headingIndex=headingIndex,
+        )
+
+    def getHeadingIndex(self, filename: Path | None = None) -> HeadingIndex:
+        """Get the heading index of a document"""
+        key = Path(STRING_FILENAME) if filename is None else Path(filename)
+        return self._indexes[key]
+
+    def forget(self, filename: Path | None = None) -> None:
+        """Forget a document (such as when it is closed)"""
+        key = Path(STRING_FILENAME) if filename is None else Path(filename)
+        self._indexes.pop(key, None)
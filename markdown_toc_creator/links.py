@@ -0,0 +1,293 @@
+"""
+Validate the relative links of markdown files (such as `other.md#usage`)
+against an index of the anchor links of each file's headers, which are
+computed (and de-duplicated) exactly like in the ToCs. Each file is read once,
+and each link is then checked with hash lookups.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+from urllib.parse import unquote
+
+from markdown_toc_creator.scanner import (
+    DEFAULT_ENGINE,
+    ScanResult,
+    scanMarkdown,
+)
+from markdown_toc_creator.stats import currentStats, timePhase, trackFile
+from markdown_toc_creator.toc_entry import AnchorLinkDeduplicator, TocEntry
+from markdown_toc_creator.walker import MARKDOWN_EXTENSIONS
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from collections.abc import Set as AbstractSet
+
+# Matches the targets of inline links and images ("[text](target)"), and of
+# link reference definitions ("[label]: target")
+_LINK_TARGET = re.compile(
+    r'\]\([ \t]*(?:<(?P<angled>[^>\n]*)>'
+    r'|(?P<inline>[^\s()]*(?:\([^\s()]*\)[^\s()]*)*))'
+    r'|^ {0,3}\[[^\]\n]+\]:[ \t]*(?:<(?P<refAngled>[^>\n]*)>|(?P<ref>\S+))',
+    flags=re.MULTILINE,
+)
+
+# Links with a scheme (such as "https:" or "mailto:") are not checked
+_URL_SCHEME = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+
+class BrokenLink(NamedTuple):
+    """A link whose target file, or whose `#fragment`, doesn't exist"""
+
+    filename: Path
+    lineNumber: int  # 1-based
+    target: str  # as written in the file
+    reason: str
+
+    def format(self) -> str:
+        """Format as a "file:line: message" diagnostic"""
+        return (
+            f'{self.filename.as_posix()}:{self.lineNumber}:'
+            f' "{self.target}": {self.reason}'
+        )
+
+
+def collectAnchorLinks(
+        text: str,
+        *,
+        style: str = 'github',
+        engine: str = DEFAULT_ENGINE,
+) -> set[str]:
+    """
+    Get the anchor links (such as "#usage") of all the headers of a markdown
+    text, de-duplicated in the order of the headers
+    """
+    return _collectAnchorLinks(
+        scanMarkdown(text, skip_first_n_lines=0, engine=engine), style=style
+    )
+
+
+def _collectAnchorLinks(scanResult: ScanResult, *, style: str) -> set[str]:
+    deduplicator = AnchorLinkDeduplicator(style)
+    headings = scanResult.headings
+    for heading in headings:
+        displayText: str = heading.line.strip()
+        if displayText.lstrip('#').strip():  # (not an empty header)
+            deduplicator.deduplicate(
+                TocEntry(displayText, 0, style).anchorLinkText
+            )
+
+    stats = currentStats()
+    if stats is not None:
+        stats.numOfHeadings += len(headings)
+
+    return set(deduplicator.anchorLinks)
+
+
+def extractLinks(
+        text: str,
+        *,
+        engine: str = DEFAULT_ENGINE,
+        scanResult: ScanResult | None = None,
+) -> list[tuple[int, str]]:
+    """
+    Find the (line number, target) of the links of a markdown text, except
+    the ones in code blocks and in code spans. The code blocks are the ones
+    that the scanner `engine` finds (or that `scanResult`, if given, already
+    found in the text).
+    """
+    if scanResult is None:
+        scanResult = scanMarkdown(text, skip_first_n_lines=0, engine=engine)
+
+    codeBlockStarts: list[int] = [
+        start for start, _ in scanResult.codeBlockSpans
+    ]
+    links: list[tuple[int, str]] = []
+    lineNumber: int = 1
+    lastOffset: int = 0
+    for match in _LINK_TARGET.finditer(text):
+        offset = match.start()
+        # (Inside a code block if the last code block before the link ends
+        # after it)
+        index = bisect.bisect_right(codeBlockStarts, offset) - 1
+        if index >= 0 and offset < scanResult.codeBlockSpans[index][1]:
+            continue
+
+        lineNumber += text.count('\n', lastOffset, offset)
+        lastOffset = offset
+        lineStart = text.rfind('\n', 0, offset) + 1
+        if text.count('`', lineStart, offset) % 2 == 1:  # (in a code span)
+            continue
+
+        target = next(_ for _ in match.groups() if _ is not None)
+        if target:
+            links.append((lineNumber, target))
+
+    return links
+
+
+class AnchorIndex:
+    """
+    The anchor links of markdown files, keyed by the files' absolute paths.
+    Files are either added with their content, or read the first time they
+    are looked up (such as files linked to from outside the checked paths).
+    """
+
+    def __init__(
+            self, style: str = 'github', engine: str = DEFAULT_ENGINE
+    ) -> None:
+        self.style = style
+        self.engine = engine
+        # Path -> the anchor links (or None if the file cannot be read)
+        self._anchorLinks: dict[str, AbstractSet[str] | None] = {}
+
+    def __len__(self) -> int:
+        return len(self._anchorLinks)
+
+    def add(
+            self,
+            filename: str | Path,
+            text: str,
+            *,
+            scanResult: ScanResult | None = None,
+    ) -> None:
+        """
+        Index the anchor links of a file's content (with its `scanResult`,
+        if the text was already scanned)
+        """
+        if scanResult is None:
+            scanResult = scanMarkdown(
+                text, skip_first_n_lines=0, engine=self.engine
+            )
+
+        self._anchorLinks[_absolutePath(filename)] = _collectAnchorLinks(
+            scanResult, style=self.style
+        )
+
+    def get(self, filename: str | Path) -> AbstractSet[str] | None:
+        """Get the anchor links of a file, or None if it cannot be read"""
+        # (The paths of the links are already absolute and normalized)
+        key: str = (
+            filename
+            if filename in self._anchorLinks
+            else _absolutePath(filename)
+        )
+        if key not in self._anchorLinks:
+            try:
+                text = Path(key).read_text(encoding='utf-8')
+            except (OSError, UnicodeDecodeError):
+                self._anchorLinks[key] = None
+            else:
+                self.add(key, text)
+
+        return self._anchorLinks[key]
+
+
+def findBrokenLinks(
+        filenames: Iterable[Path],
+        *,
+        style: str = 'github',
+        engine: str = DEFAULT_ENGINE,
+) -> list[BrokenLink]:
+    """
+    Check the relative links of the markdown files: their target files must
+    exist, and their `#fragment`s must be anchor links of the target files'
+    headers. Links with a scheme (such as "https:"), and absolute paths, are
+    not checked.
+
+    The files are read once (indexing their anchor links and collecting their
+    links), then the links are checked, so the run takes time proportional to
+    the number of headers and links. The linked files that are not among
+    `filenames` are read when they are first linked to.
+    """
+    index = AnchorIndex(style, engine)
+    linksOfFiles: list[tuple[Path, list[tuple[int, str]]]] = []
+    for filename in filenames:
+        with trackFile(Path(filename)):
+            with timePhase('read'):
+                text: str = Path(filename).read_text(encoding='utf-8')
+
+            stats = currentStats()
+            if stats is not None:
+                stats.numOfBytesRead += len(text.encode('utf-8'))
+
+            # (The same scan finds the headers and the code blocks)
+            with timePhase('scan'):
+                scanResult = scanMarkdown(
+                    text, skip_first_n_lines=0, engine=engine
+                )
+
+            with timePhase('anchorLinks'):
+                index.add(filename, text, scanResult=scanResult)
+
+            with timePhase('scan'):
+                links = extractLinks(text, scanResult=scanResult)
+                linksOfFiles.append((Path(filename), links))
+
+    checker = _LinkChecker(index)
+    brokenLinks: list[BrokenLink] = []
+    with timePhase('links'):
+        for filename, links in linksOfFiles:
+            absolutePath: str = _absolutePath(filename)
+            folder: str = str(Path(absolutePath).parent)
+            for lineNumber, target in links:
+                reason = checker.check(folder, absolutePath, target)
+                if reason is not None:
+                    brokenLinks.append(
+                        BrokenLink(filename, lineNumber, target, reason)
+                    )
+
+    return brokenLinks
+
+
+class _LinkChecker:
+    def __init__(self, index: AnchorIndex) -> None:
+        self._index = index
+        # Path -> whether it exists (for the links to other kinds of files)
+        self._exists: dict[str, bool] = {}
+        # (Folder, path of a link) -> the absolute path of the linked file
+        self._targetFiles: dict[tuple[str, str], str] = {}
+
+    def check(self, folder: str, absolutePath: str, target: str) -> str | None:
+        """
+        Check a link of a file (at `absolutePath`, in `folder`), and return
+        why it's broken (if it is)
+        """
+        if _URL_SCHEME.match(target) or target.startswith('/'):
+            return None
+
+        path, _, fragment = target.partition('#')
+        path = unquote(path.partition('?')[0])
+        targetFile: str = absolutePath
+        if path:
+            # (Many files link to the same files, so the paths are only
+            # joined and normalized once)
+            targetFile = self._targetFiles.get((folder, path), '')
+            if not targetFile:
+                targetFile = os.path.normpath(folder + os.sep + path)
+                self._targetFiles[folder, path] = targetFile
+
+        if not targetFile.endswith(MARKDOWN_EXTENSIONS):
+            if targetFile not in self._exists:
+                self._exists[targetFile] = Path(targetFile).exists()
+
+            return None if self._exists[targetFile] else 'file not found'
+
+        anchorLinks = self._index.get(targetFile)
+        if anchorLinks is None:
+            return 'file not found'
+
+        if fragment and '#' + unquote(fragment) not in anchorLinks:
+            where: str = f' of {path}' if path else ''
+            return f'no header{where} has the anchor link "#{fragment}"'
+
+        return None
+
+
+def _absolutePath(filename: str | Path) -> str:
+    # (Without resolving symlinks, which would cost a system call per link)
+    return os.path.normpath(Path(filename).absolute())
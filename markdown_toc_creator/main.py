@@ -1,20 +1,42 @@
 from __future__ import annotations
 
+import itertools
 import re
+import sys
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, ParamSpec, TypeVar
 
 import click
-from click_config_file_injection_utils import injectDefaultOptionsFromToml
+from click.core import ParameterSource
 
-from markdown_toc_creator import __version__
+from markdown_toc_creator.cache import (
+    DEFAULT_CACHE_DIR,
+    TocCache,
+    fingerprintOptions,
+)
 from markdown_toc_creator.create_toc import (
     DEFAULT_HORIZONTAL_RULE_STYLE,
-    createToc,
+    DEFAULT_MMAP_THRESHOLD,
+    createToc,  # noqa: F401 (re-exported for backward compatibility)
 )
-from markdown_toc_creator.exceptions import (
-    HeaderLevelNotContinuousError,
-    HeaderLevelOutOfBoundError,
+from markdown_toc_creator.outline import OUTPUT_FORMATS, OutlineWriter
+from markdown_toc_creator.parallel import (
+    FileResult,
+    processFile,
+    processFilesInParallel,
+    resolveNumOfJobs,
 )
+from markdown_toc_creator.scanner import DEFAULT_ENGINE, SCANNER_ENGINES
+from markdown_toc_creator.stats import RunStats, collectStats, iterTimed
+from markdown_toc_creator.walker import iterMarkdownPaths
+from markdown_toc_creator.writer import FsyncBatch
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+_P = ParamSpec('_P')
+_T = TypeVar('_T')
 
 # Due to a potential bug in Windows + pre-commit, non-ASCII
 # characters cannot be rendered correctly as stdout in the terminal.
@@ -22,6 +44,17 @@ from markdown_toc_creator.exceptions import (
 # (More details in https://github.com/jsh9/pydoclint/issues/20)
 echoAsError = True
 
+MIB: int = 1024 * 1024
+
+TOOL_SECTION_NAME: str = 'markdown_toc_creator'
+
+# Matches the tool's name used as a TOML key (such as in
+# `[tool.markdown_toc_creator]`, or `markdown_toc_creator = {...}` under
+# `[tool]`). False positives only cost a full parse of the config file.
+_TOOL_SECTION_KEY = re.compile(
+    re.escape(TOOL_SECTION_NAME).encode() + rb'["\']?[ \t]*[\].=]'
+)
+
 
 def validateStyleValue(
         context: click.Context,  # noqa: ARG001
@@ -38,6 +71,55 @@ def validateStyleValue(
     return value
 
 
+def validateJobsValue(
+        context: click.Context,  # noqa: ARG001
+        param: click.Parameter,  # noqa: ARG001
+        value: str,
+) -> int:
+    """Validate the value of the 'jobs' option, and convert it to an int"""
+    try:
+        return resolveNumOfJobs(value)
+    except ValueError as exc:
+        raise click.BadParameter(
+            '"--jobs" must be a positive integer or "auto"'
+        ) from exc
+
+
+def injectDefaultsFromConfigFile(
+        ctx: click.Context,
+        param: click.Parameter,
+        value: str | None,
+) -> str | None:
+    """
+    Load the defaults of the options from the [tool.markdown_toc_creator]
+    section of the TOML config file
+    """
+    # Most projects have no config for this tool, so the TOML parsing library
+    # is only imported if the default config file may contain the section
+    if (
+        value
+        and param.name is not None
+        and ctx.get_parameter_source(param.name) != ParameterSource.COMMANDLINE
+        and not _mayContainToolSection(Path(value))
+    ):
+        return value
+
+    from click_config_file_injection_utils import (  # noqa: PLC0415
+        injectDefaultOptionsFromToml,
+    )
+
+    return injectDefaultOptionsFromToml(
+        ctx, param, value, toolSectionName=TOOL_SECTION_NAME
+    )
+
+
+def _mayContainToolSection(configFile: Path) -> bool:
+    try:
+        return _TOOL_SECTION_KEY.search(configFile.read_bytes()) is not None
+    except OSError:
+        return False
+
+
 @click.command(
     context_settings={'help_option_names': ['-h', '--help']},
     help='Create table of contents for markdown files',
@@ -49,12 +131,7 @@ def validateStyleValue(
     show_default=True,
     expose_value=False,
     is_eager=True,
-    callback=lambda ctx, param, value: injectDefaultOptionsFromToml(
-        ctx,
-        param,
-        value,
-        toolSectionName='markdown_toc_creator',
-    ),
+    callback=injectDefaultsFromConfigFile,
     help=(
         'Load defaults from the [tool.markdown_toc_creator] section of a TOML'
         ' file.'
@@ -78,6 +155,36 @@ def validateStyleValue(
         ' command line.'
     ),
 )
+@click.option(
+    '--respect-gitignore',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, skip the files and folders ignored by .gitignore files when'
+        ' searching folders for markdown files.'
+    ),
+)
+@click.option(
+    '--changed-since',
+    metavar='REF',
+    type=str,
+    default=None,
+    help=(
+        'Only process the markdown files that changed (according to git)'
+        ' since this commit, branch, or tag (such as "origin/main") diverged'
+        ' from HEAD, new untracked files included. Paths outside git'
+        ' repositories are processed in full.'
+    ),
+)
+@click.option(
+    '--staged',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, only process the markdown files that are staged (according'
+        ' to git), or staged and changed since --changed-since.'
+    ),
+)
 @click.option(
     '--style',
     type=str,
@@ -93,6 +200,56 @@ def validateStyleValue(
     default=True,
     help='If True, change the markdown file in place',
 )
+@click.option(
+    '--check',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, do not write the files, and exit with 1 if any ToC is out'
+        ' of date.'
+    ),
+)
+@click.option(
+    '--diff',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, do not write the files, and print a unified diff of the'
+        ' changes to each ToC.'
+    ),
+)
+@click.option(
+    '--validate-links',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, do not create ToCs, but check the relative links of the'
+        ' markdown files (the linked files must exist, and their #fragments'
+        ' must be anchor links of their headers), and exit with 1 if any'
+        ' link is broken.'
+    ),
+)
+@click.option(
+    '--format',
+    'output_format',
+    type=click.Choice(OUTPUT_FORMATS, case_sensitive=False),
+    show_default=True,
+    default='text',
+    help=(
+        'Output format. "json" and "ndjson" print the ToC entries of each'
+        ' file (level, text, anchor, line number, and parent index) to stdout'
+        ' for other tools, instead of the human-readable output.'
+    ),
+)
+@click.option(
+    '--watch',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, keep running after processing the files, and process them'
+        ' again whenever they change (until Ctrl+C is pressed).'
+    ),
+)
 @click.option(
     '--add-toc-title',
     type=bool,
@@ -114,6 +271,18 @@ def validateStyleValue(
     default=DEFAULT_HORIZONTAL_RULE_STYLE,
     help='Choose the thematic break format when --add-horizontal-rules is on.',
 )
+@click.option(
+    '--engine',
+    type=click.Choice(SCANNER_ENGINES),
+    show_default=True,
+    default=DEFAULT_ENGINE,
+    help=(
+        'How headings are found: "simple" (ATX headings outside of ```'
+        ' fences), or "commonmark" (a CommonMark block scanner, which also'
+        ' knows about setext headings, ~~~ fences, indented code, HTML'
+        ' blocks, lists and block quotes).'
+    ),
+)
 @click.option(
     '--toc-title',
     type=str,
@@ -128,6 +297,104 @@ def validateStyleValue(
     default=1,
     help='How many lines from the top of the markdown to skip',
 )
+@click.option(
+    '-j',
+    '--jobs',
+    type=str,
+    show_default=True,
+    default='1',
+    callback=validateJobsValue,
+    help=(
+        'Number of worker processes to process files with, or "auto" to use'
+        ' all CPU cores.'
+    ),
+)
+@click.option(
+    '--io-concurrency',
+    type=click.IntRange(min=0),
+    show_default=True,
+    default=0,
+    help=(
+        'Number of files to read and write at once (with asyncio and a thread'
+        ' pool), which speeds up slow file systems such as network shares. 0'
+        ' means one file at a time. Cannot be used with --jobs.'
+    ),
+)
+@click.option(
+    '--cache-dir',
+    type=str,
+    show_default=True,
+    default=DEFAULT_CACHE_DIR,
+    help=(
+        'Directory of the cache that records which files already have'
+        ' up-to-date ToCs, so that they can be skipped in later runs.'
+    ),
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    default=False,
+    help='If True, do not read or write the cache.',
+)
+@click.option(
+    '--mmap-threshold',
+    type=click.IntRange(min=0),
+    show_default=True,
+    default=DEFAULT_MMAP_THRESHOLD // MIB,
+    help=(
+        'Size (in MiB) from which markdown files are memory-mapped instead of'
+        ' being read into memory. Their line breaks (such as CRLF) are'
+        ' preserved. 0 means never.'
+    ),
+)
+@click.option(
+    '--fsync',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, flush the rewritten files to disk at the end of the run (in'
+        ' one batch, syncing each folder once), so that they survive a power'
+        ' loss.'
+    ),
+)
+@click.option(
+    '--serve',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, run as a server that creates ToCs on request, speaking'
+        ' line-delimited JSON over stdin/stdout (or over --socket).'
+    ),
+)
+@click.option(
+    '--socket',
+    'socket_path',
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help='With --serve, listen on this Unix socket instead of stdin/stdout.',
+)
+@click.option(
+    '--stats',
+    'show_stats',
+    is_flag=True,
+    default=False,
+    help=(
+        'If True, print the number of files, headings, and bytes read and'
+        ' written, and the time spent in each phase (walking, reading,'
+        ' scanning, creating anchor links, writing, etc.).'
+    ),
+)
+@click.option(
+    '--profile',
+    'profile_path',
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help=(
+        'Profile the run with cProfile, and save the profile to this file'
+        ' (for `python -m pstats`, snakeviz, etc.). With --jobs, only the'
+        ' main process is profiled.'
+    ),
+)
 @click.option(
     '-q',
     '--quiet',
@@ -153,7 +420,7 @@ def validateStyleValue(
     ),
     is_eager=True,
 )
-@click.version_option(__version__)
+@click.version_option(package_name='markdown_toc_creator')
 @click.pass_context
 def main(
         ctx: click.Context,
@@ -170,10 +437,60 @@ def main(
         paths: tuple[str, ...],
         style: str,
         horizontal_rule_style: str,
+        engine: str,
+        jobs: int,
+        io_concurrency: int,
+        cache_dir: str,
+        no_cache: bool,
+        mmap_threshold: int,
+        fsync: bool,
+        check: bool,
+        diff: bool,
+        validate_links: bool,
+        respect_gitignore: bool,
+        changed_since: str | None,
+        staged: bool,
+        output_format: str,
+        watch: bool,
+        serve: bool,
+        socket_path: Path | None,
+        show_stats: bool,
+        profile_path: Path | None,
 ) -> None:
     """Command-line entry point"""
     ctx.ensure_object(dict)
 
+    if serve:
+        if paths or src is not None:
+            click.echo(
+                main.get_usage(ctx)
+                + "\n\n'--serve' cannot be used with 'paths' or 'src'.",
+                err=echoAsError,
+            )
+            ctx.exit(1)
+
+        _runProfiled(
+            profile_path,
+            _serve,
+            socket_path,
+            jobs=jobs,
+            tocOptions={
+                'skip_first_n_lines': skip_first_n_lines,
+                'in_place': in_place,
+                'proactive': proactive,
+                'add_toc_title': add_toc_title,
+                'add_horizontal_rules': add_horizontal_rules,
+                'toc_title': toc_title,
+                'style': style,
+                'horizontal_rule_style': horizontal_rule_style.lower(),
+                'engine': engine,
+                'mmap_threshold': mmap_threshold * MIB
+                if mmap_threshold
+                else None,
+            },
+        )
+        ctx.exit(0)
+
     if paths and src is not None:
         click.echo(
             main.get_usage(ctx)
@@ -189,7 +506,53 @@ def main(
         )
         ctx.exit(1)
 
-    exit_code = _checkPaths(
+    output_format = output_format.lower()
+    if diff and output_format != 'text':
+        click.echo(
+            main.get_usage(ctx)
+            + "\n\n'--diff' can only be used with '--format text'.",
+            err=echoAsError,
+        )
+        ctx.exit(1)
+
+    if watch and output_format == 'json':
+        click.echo(
+            main.get_usage(ctx)
+            + "\n\n'--watch' cannot be used with '--format json' (but it can"
+            " be used with '--format ndjson').",
+            err=echoAsError,
+        )
+        ctx.exit(1)
+
+    if watch and (changed_since is not None or staged):
+        click.echo(
+            main.get_usage(ctx)
+            + "\n\n'--changed-since' and '--staged' cannot be used with"
+            " '--watch'.",
+            err=echoAsError,
+        )
+        ctx.exit(1)
+
+    if validate_links and (watch or output_format != 'text'):
+        click.echo(
+            main.get_usage(ctx)
+            + "\n\n'--validate-links' cannot be used with '--watch' or with"
+            " '--format json|ndjson'.",
+            err=echoAsError,
+        )
+        ctx.exit(1)
+
+    if io_concurrency and jobs > 1:
+        click.echo(
+            main.get_usage(ctx)
+            + "\n\n'--io-concurrency' cannot be used with '--jobs'.",
+            err=echoAsError,
+        )
+        ctx.exit(1)
+
+    exit_code = _runProfiled(
+        profile_path,
+        _checkPaths,
         paths,
         exclude=exclude,
         skip_first_n_lines=skip_first_n_lines,
@@ -201,10 +564,45 @@ def main(
         toc_title=toc_title,
         style=style,
         horizontal_rule_style=horizontal_rule_style.lower(),
+        engine=engine,
+        jobs=jobs,
+        io_concurrency=io_concurrency,
+        cache_dir=None if no_cache else cache_dir,
+        mmap_threshold=mmap_threshold * MIB if mmap_threshold else None,
+        fsync=fsync,
+        check=check,
+        diff=diff,
+        validate_links=validate_links,
+        respect_gitignore=respect_gitignore,
+        changed_since=changed_since,
+        staged=staged,
+        output_format=output_format,
+        watch=watch,
+        stats=show_stats,
     )
     ctx.exit(exit_code)
 
 
+def _runProfiled(
+        profilePath: Path | None,
+        function: Callable[_P, _T],
+        *args: _P.args,
+        **kwargs: _P.kwargs,
+) -> _T:
+    """Call the function, profiling it with cProfile if `profilePath` is set"""
+    if profilePath is None:
+        return function(*args, **kwargs)
+
+    import cProfile  # noqa: PLC0415 (only imported with --profile)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(profilePath)
+        click.echo(f'Saved the profile to {profilePath}', err=echoAsError)
+
+
 def _checkPaths(
         paths: tuple[str, ...],
         *,
@@ -218,48 +616,294 @@ def _checkPaths(
         toc_title: str = 'Table of Contents',
         style: str = 'github',
         horizontal_rule_style: str = DEFAULT_HORIZONTAL_RULE_STYLE,
+        engine: str = DEFAULT_ENGINE,
+        jobs: int = 1,
+        io_concurrency: int = 0,
+        cache_dir: str | None = None,
+        mmap_threshold: int | None = DEFAULT_MMAP_THRESHOLD,
+        fsync: bool = False,
+        check: bool = False,
+        diff: bool = False,
+        validate_links: bool = False,
+        respect_gitignore: bool = False,
+        changed_since: str | None = None,
+        staged: bool = False,
+        output_format: str = 'text',
+        watch: bool = False,
+        stats: bool = False,
 ) -> int:
-    filenames: list[Path] = []
-
     if not quiet:
         skipMsg = f'Skipping files that match this pattern: {exclude}'
         click.echo(
             click.style(skipMsg, fg='yellow', bold=True), err=echoAsError
         )
 
-    excludePattern = re.compile(exclude)
+    startTime: float = time.perf_counter()
+    runStats: RunStats | None = RunStats() if stats else None
+    filenames: Iterator[Path] | None
+    if changed_since is not None or staged:
+        filenames = _selectChangedFiles(
+            paths,
+            since=changed_since,
+            staged=staged,
+            excludePattern=re.compile(exclude),
+            respectGitignore=respect_gitignore,
+            quiet=quiet,
+        )
+        if filenames is None:
+            return 1
+    else:
+        filenames = iterMarkdownPaths(
+            paths,
+            excludePattern=re.compile(exclude),
+            respectGitignore=respect_gitignore,
+        )
 
-    for path_ in paths:
-        path = Path(path_)
-        if path.is_file():
-            filenames.append(path)
-        elif path.is_dir():
-            filenames.extend(sorted(path.rglob('*.md')))
+    if runStats is not None:
+        filenames = iterTimed(filenames, runStats, 'walk')
 
-    errors: list[str] = []
+    if validate_links:
+        exitCode: int = _validateLinks(
+            filenames,
+            style=style,
+            engine=engine,
+            quiet=quiet,
+            runStats=runStats,
+        )
+        if runStats is not None:
+            click.echo(
+                runStats.format(time.perf_counter() - startTime),
+                err=echoAsError,
+            )
 
-    for filename in filenames:
-        if excludePattern.search(filename.as_posix()):
-            continue
+        return exitCode
 
-        try:
-            createToc(
-                filename,
-                skip_first_n_lines=skip_first_n_lines,
+    # In check/diff mode, only the stale files (or their diffs) are reported
+    reportOnly: bool = check or diff
+    # With a structured output format, stdout only contains the outlines
+    withOutline: bool = output_format != 'text'
+    tocOptions: dict[str, Any] = {
+        'skip_first_n_lines': skip_first_n_lines,
+        'quiet': quiet or reportOnly or withOutline,
+        'in_place': in_place and not reportOnly,
+        'proactive': proactive,
+        'add_toc_title': add_toc_title,
+        'add_horizontal_rules': add_horizontal_rules,
+        'toc_title': toc_title,
+        'style': style,
+        'horizontal_rule_style': horizontal_rule_style,
+        'engine': engine,
+        'mmap_threshold': mmap_threshold,
+        'diff': diff,
+    }
+
+    cache: TocCache | None = (
+        # Without writing the files, a ToC is never brought up to date (but
+        # the check mode still finds out which ToCs are up to date). The
+        # files skipped thanks to the cache would be missing from outlines.
+        _openCache(cache_dir, tocOptions)
+        if cache_dir and (in_place or check) and not withOutline
+        else None
+    )
+    outlineWriter: OutlineWriter | None = (
+        OutlineWriter(sys.stdout, output_format) if withOutline else None
+    )
+    fsyncBatch: FsyncBatch | None = (
+        FsyncBatch() if fsync and tocOptions['in_place'] else None
+    )
+
+    try:
+        exitCode = _processAndReport(
+            filenames,
+            jobs=jobs,
+            ioConcurrency=io_concurrency,
+            tocOptions=tocOptions,
+            cache=cache,
+            outlineWriter=outlineWriter,
+            fsyncBatch=fsyncBatch,
+            quiet=quiet,
+            check=check,
+            runStats=runStats,
+        )
+        if watch:
+            exitCode = _watchPaths(
+                paths,
+                excludePattern=re.compile(exclude),
+                respectGitignore=respect_gitignore,
+                jobs=jobs,
+                ioConcurrency=io_concurrency,
+                tocOptions=tocOptions,
+                cache=cache,
+                outlineWriter=outlineWriter,
+                fsyncBatch=fsyncBatch,
                 quiet=quiet,
-                in_place=in_place,
-                proactive=proactive,
-                add_toc_title=add_toc_title,
-                add_horizontal_rules=add_horizontal_rules,
-                toc_title=toc_title,
-                style=style,
-                horizontal_rule_style=horizontal_rule_style,
+                check=check,
+                runStats=runStats,
             )
-        except (
-            HeaderLevelNotContinuousError,
-            HeaderLevelOutOfBoundError,
-        ) as err:
-            errors.append(str(err))
+    finally:
+        if cache is not None:
+            cache.close()
+        if outlineWriter is not None:
+            outlineWriter.close()
+
+    if runStats is not None:
+        click.echo(
+            runStats.format(time.perf_counter() - startTime), err=echoAsError
+        )
+
+    return exitCode
+
+
+def _selectChangedFiles(
+        paths: tuple[str, ...],
+        *,
+        since: str | None,
+        staged: bool,
+        excludePattern: re.Pattern[str],
+        respectGitignore: bool,
+        quiet: bool,
+) -> Iterator[Path] | None:
+    """
+    Select the markdown files that changed according to git (and walk the
+    paths that are not in a git repository). Returns None if git failed.
+    """
+    # (Imported here, because only --changed-since and --staged need it)
+    from markdown_toc_creator.gitdiff import (  # noqa: PLC0415
+        GitError,
+        selectChangedFiles,
+    )
+
+    try:
+        changedFiles = selectChangedFiles(
+            paths,
+            since=since,
+            staged=staged,
+            excludePattern=excludePattern,
+            respectGitignore=respectGitignore,
+        )
+    except GitError as exc:
+        click.echo(
+            click.style(
+                f'Cannot list the changed files with git: {exc}', fg='red'
+            ),
+            err=echoAsError,
+        )
+        return None
+
+    if changedFiles.outsideGit and not quiet:
+        click.echo(
+            click.style(
+                'Not in a git repository (or git is not installed), so all'
+                ' the markdown files are processed: '
+                + ', '.join(str(_) for _ in changedFiles.outsideGit),
+                fg='yellow',
+            ),
+            err=echoAsError,
+        )
+
+    return itertools.chain(
+        changedFiles.filenames,
+        iterMarkdownPaths(
+            changedFiles.outsideGit,
+            excludePattern=excludePattern,
+            respectGitignore=respectGitignore,
+        ),
+    )
+
+
+def _validateLinks(
+        filenames: Iterator[Path],
+        *,
+        style: str,
+        engine: str,
+        quiet: bool,
+        runStats: RunStats | None,
+) -> int:
+    """Report the broken links of the files. Returns the exit code."""
+    # (Imported here, because only --validate-links needs it)
+    from markdown_toc_creator.links import findBrokenLinks  # noqa: PLC0415
+
+    with collectStats() as linkStats:
+        brokenLinks = findBrokenLinks(filenames, style=style, engine=engine)
+
+    if runStats is not None:
+        runStats.merge(linkStats)
+
+    for brokenLink in brokenLinks:
+        click.echo(click.style(brokenLink.format(), fg='red'), err=echoAsError)
+
+    if not quiet:
+        numOfFiles: int = len({_.filename for _ in brokenLinks})
+        click.echo(
+            f'{len(brokenLinks)} broken link(s) in {numOfFiles} file(s),'
+            f' {linkStats.numOfFiles} file(s) checked',
+            err=echoAsError,
+        )
+
+    return 1 if brokenLinks else 0
+
+
+def _processAndReport(
+        filenames: Iterator[Path],
+        *,
+        jobs: int,
+        ioConcurrency: int = 0,
+        tocOptions: dict[str, Any],
+        cache: TocCache | None,
+        outlineWriter: OutlineWriter | None,
+        fsyncBatch: FsyncBatch | None = None,
+        quiet: bool,
+        check: bool,
+        runStats: RunStats | None = None,
+) -> int:
+    errors: list[str] = []
+    changedFiles: list[Path] = []
+    numOfFiles: int = 0
+
+    for filename, result in _processFiles(
+        filenames,
+        jobs=jobs,
+        ioConcurrency=ioConcurrency,
+        options=tocOptions,
+        cache=cache,
+        withOutline=outlineWriter is not None,
+        withStats=runStats is not None,
+    ):
+        numOfFiles += 1
+        if runStats is not None and result.stats is not None:
+            runStats.merge(result.stats)
+
+        # In parallel mode, each worker's printed output is collected and
+        # echoed here, so that the output order is the same as in the serial
+        # mode
+        sys.stdout.write(result.output)
+        if result.changed:
+            changedFiles.append(filename)
+            if fsyncBatch is not None:
+                fsyncBatch.add(filename)
+        if result.error is not None:
+            errors.append(result.error)
+        if outlineWriter is not None and result.outline is not None:
+            outlineWriter.write(filename, result.outline)
+
+        if cache is not None and result.cacheRecord is not None:
+            cache.store(result.cacheRecord)
+
+    if fsyncBatch is not None:
+        # (The files are written by the workers, if any, but they can be
+        # flushed from any process)
+        startTime: float = time.perf_counter()
+        fsyncBatch.sync()
+        if runStats is not None:
+            runStats.addTime('fsync', time.perf_counter() - startTime)
+
+    if not quiet:
+        _reportChangedFiles(
+            changedFiles,
+            numOfFiles=numOfFiles,
+            in_place=tocOptions['in_place'],
+            check=check,
+        )
 
     if errors:
         click.echo(
@@ -275,7 +919,192 @@ def _checkPaths(
 
         return 1
 
-    return 0
+    return 1 if check and changedFiles else 0
+
+
+def _watchPaths(
+        paths: tuple[str, ...],
+        *,
+        excludePattern: re.Pattern[str],
+        respectGitignore: bool,
+        jobs: int,
+        ioConcurrency: int = 0,
+        tocOptions: dict[str, Any],
+        cache: TocCache | None,
+        outlineWriter: OutlineWriter | None,
+        fsyncBatch: FsyncBatch | None,
+        quiet: bool,
+        check: bool,
+        runStats: RunStats | None,
+) -> int:
+    """
+    Process the changed files whenever files change, until interrupted (with
+    Ctrl+C). The cache, the memoized anchor links, etc. stay warm in between.
+    Returns the exit code of the last batch.
+    """
+    # (Imported here, because only the watch mode needs it)
+    from markdown_toc_creator.watcher import Watcher  # noqa: PLC0415
+
+    watcher = Watcher(
+        paths, excludePattern=excludePattern, respectGitignore=respectGitignore
+    )
+    exitCode: int = 0
+    try:
+        if not quiet:
+            click.echo(
+                click.style(
+                    f'Watching {watcher.numOfWatchedFiles} file(s) for changes'
+                    f' (with {watcher.backend}). Press Ctrl+C to stop.',
+                    fg='yellow',
+                    bold=True,
+                ),
+                err=echoAsError,
+            )
+
+        for batch in watcher.iterChanges():
+            exitCode = _processAndReport(
+                iter(batch),
+                jobs=jobs,
+                ioConcurrency=ioConcurrency,
+                tocOptions=tocOptions,
+                cache=cache,
+                outlineWriter=outlineWriter,
+                fsyncBatch=fsyncBatch,
+                quiet=quiet,
+                check=check,
+                runStats=runStats,
+            )
+            if cache is not None:
+                cache.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    return exitCode
+
+
+def _processFiles(
+        filenames: Iterator[Path],
+        *,
+        jobs: int,
+        ioConcurrency: int = 0,
+        options: dict[str, Any],
+        cache: TocCache | None,
+        withOutline: bool,
+        withStats: bool,
+) -> Iterator[tuple[Path, FileResult]]:
+    if ioConcurrency > 0:
+        # (Imported here, because asyncio is slow to import)
+        from markdown_toc_creator.aio import (  # noqa: PLC0415
+            processFilesConcurrently,
+        )
+
+        yield from processFilesConcurrently(
+            filenames,
+            concurrency=ioConcurrency,
+            options=options,
+            cache=cache,
+            withOutline=withOutline,
+            withStats=withStats,
+        )
+        return
+
+    if jobs > 1:
+        # The worker pool needs the full list (to size the chunks)
+        filenameList: list[Path] = list(filenames)
+        if len(filenameList) > 1:
+            yield from zip(
+                filenameList,
+                processFilesInParallel(
+                    filenameList,
+                    jobs=jobs,
+                    options=options,
+                    cache=cache,
+                    withOutline=withOutline,
+                    withStats=withStats,
+                ),
+                strict=True,
+            )
+            return
+
+        filenames = iter(filenameList)
+
+    # In serial mode, the files are processed while the folders are walked
+    for filename in filenames:
+        yield (
+            filename,
+            processFile(
+                filename,
+                options,
+                cache=cache,
+                withOutline=withOutline,
+                withStats=withStats,
+            ),
+        )
+
+
+def _reportChangedFiles(
+        changedFiles: list[Path],
+        *,
+        numOfFiles: int,
+        in_place: bool,
+        check: bool,
+) -> None:
+    numOfUnchangedFiles = numOfFiles - len(changedFiles)
+    if check:
+        for filename in changedFiles:
+            click.echo(
+                click.style(f'Out-of-date ToC: {filename}', fg='red'),
+                err=echoAsError,
+            )
+
+        click.echo(
+            f'{len(changedFiles)} file(s) would change,'
+            f' {numOfUnchangedFiles} unchanged',
+            err=echoAsError,
+        )
+    elif in_place:
+        click.echo(
+            f'{len(changedFiles)} file(s) changed,'
+            f' {numOfUnchangedFiles} unchanged',
+            err=echoAsError,
+        )
+
+
+def _serve(
+        socketPath: Path | None,
+        *,
+        jobs: int,
+        tocOptions: dict[str, Any],
+) -> None:
+    # (Imported here, because only the server mode needs it)
+    from markdown_toc_creator.server import TocServer  # noqa: PLC0415
+
+    server = TocServer(tocOptions, jobs=jobs)
+    try:
+        if socketPath is None:
+            server.serveStream(sys.stdin, sys.stdout)
+        else:
+            click.echo(f'Listening on {socketPath}', err=echoAsError)
+            server.serveUnixSocket(socketPath)
+    except KeyboardInterrupt:
+        pass
+
+
+def _openCache(cacheDir: str, tocOptions: dict[str, Any]) -> TocCache | None:
+    import sqlite3  # noqa: PLC0415 (only imported when the cache is used)
+
+    try:
+        return TocCache(Path(cacheDir), fingerprintOptions(tocOptions))
+    except (OSError, sqlite3.Error) as exc:
+        click.echo(
+            click.style(
+                f'Cannot use the cache at "{cacheDir}": {exc}', fg='yellow'
+            ),
+            err=echoAsError,
+        )
+        return None
 
 
 if __name__ == '__main__':
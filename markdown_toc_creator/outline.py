@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import TextIO
+
+    from markdown_toc_creator.scanner import Heading
+    from markdown_toc_creator.toc_entry import TocEntry
+
+# The values of `--format`: "text" is the usual human-readable output, and the
+# others stream each file's outline (see `OutlineWriter`)
+OUTPUT_FORMATS: tuple[str, ...] = ('text', 'json', 'ndjson')
+
+
+class OutlineEntry(NamedTuple):
+    """One entry of a file's table of contents, for downstream tools"""
+
+    level: int  # the number of leading '#' characters of the header
+    text: str  # the text of the entry's link
+    anchor: str  # the de-duplicated anchor link (without the leading '#')
+    line: int  # 1-based
+    parent: int | None  # the index of the enclosing entry (None at the top)
+
+
+def buildOutline(
+        headings: list[Heading],
+        tocEntries: list[TocEntry],
+) -> list[OutlineEntry]:
+    """
+    Pair the headings of a file with the ToC entries created from them, and
+    find the parent of each entry (the closest previous entry of a lower
+    level).
+    """
+    if not tocEntries:  # no ToC is created for this file
+        return []
+
+    outline: list[OutlineEntry] = []
+    ancestors: list[int] = []  # the indices of the enclosing entries
+    for heading, entry in zip(headings, tocEntries, strict=True):
+        while ancestors and outline[ancestors[-1]].level >= heading.level:
+            ancestors.pop()
+
+        outline.append(
+            OutlineEntry(
+                level=heading.level,
+                text=entry.linkText,
+                anchor=entry.anchorLinkText.removeprefix('#'),
+                line=heading.lineNumber,
+                parent=ancestors[-1] if ancestors else None,
+            )
+        )
+        ancestors.append(len(outline) - 1)
+
+    return outline
+
+
+class OutlineWriter:
+    """
+    Write the outline of each file to a text stream as soon as it is known,
+    so that the output of large trees never sits in memory.
+
+    - "ndjson": one JSON object per line (and per file)
+    - "json": a JSON array of the same objects, written incrementally
+    """
+
+    def __init__(self, stream: TextIO, outputFormat: str) -> None:
+        import json  # noqa: PLC0415 (only imported for structured output)
+
+        if outputFormat not in OUTPUT_FORMATS[1:]:
+            raise ValueError(f'Unsupported output format: {outputFormat}')
+
+        self._dumps = json.dumps
+        self._stream = stream
+        self._isJsonArray: bool = outputFormat == 'json'
+        self._numOfRecords: int = 0
+
+    def write(self, filename: Path, outline: list[OutlineEntry]) -> None:
+        """Write the outline of one file"""
+        record: dict[str, Any] = {
+            'path': filename.as_posix(),
+            'headings': [_._asdict() for _ in outline],
+        }
+        if self._isJsonArray:
+            self._stream.write('[\n' if self._numOfRecords == 0 else ',\n')
+
+        self._stream.write(self._dumps(record))
+        if not self._isJsonArray:
+            self._stream.write('\n')
+
+        self._numOfRecords += 1
+
+    def close(self) -> None:
+        """Finish the output (i.e., close the JSON array)"""
+        if self._isJsonArray:
+            self._stream.write('[]\n' if self._numOfRecords == 0 else '\n]\n')
+
+        self._stream.flush()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any
+
+from markdown_toc_creator.cache import CacheRecord, TocCache
+from markdown_toc_creator.create_toc import _printFileHeader, createToc
+from markdown_toc_creator.exceptions import (
+    HeaderLevelNotContinuousError,
+    HeaderLevelOutOfBoundError,
+)
+from markdown_toc_creator.outline import OutlineEntry, buildOutline
+from markdown_toc_creator.stats import (
+    RunStats,
+    collectStats,
+    currentStats,
+    timePhase,
+    trackFile,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+# How many chunks each worker should receive (on average). More chunks
+# balance the load better; fewer chunks reduce inter-process overhead.
+CHUNKS_PER_WORKER: int = 4
+MAX_CHUNK_SIZE: int = 64
+
+# What is printed for a file that the cache knows to be up to date, instead of
+# its ToC (which isn't created again)
+CACHED_FILE_NOTE: str = '(Unchanged: the ToC is up to date, per the cache)'
+
+
+@dataclass(frozen=True)
+class FileResult:
+    """The outcome of processing one markdown file"""
+
+    output: str
+    error: str | None
+    changed: bool = False
+    # Not None if the file's ToC is (now) up to date and should be cached
+    cacheRecord: CacheRecord | None = None
+    # The entries of the file's ToC (only if requested)
+    outline: list[OutlineEntry] | None = None
+    # The counters and timers of processing the file (only if requested)
+    stats: RunStats | None = None
+
+
+@dataclass
+class _WorkerState:
+    options: dict[str, Any] = field(default_factory=dict)
+    cache: TocCache | None = None
+    withOutline: bool = False
+    withStats: bool = False
+
+
+# The state of the current worker process. It is sent once per worker (via
+# the pool initializer) rather than once per file.
+_workerState = _WorkerState()
+
+
+def resolveNumOfJobs(jobs: str) -> int:
+    """Convert the value of `--jobs` ("auto" or an integer) into an int"""
+    if jobs == 'auto':
+        return os.cpu_count() or 1
+
+    numOfJobs = int(jobs)
+    if numOfJobs < 1:
+        raise ValueError('The number of jobs must be at least 1')
+
+    return numOfJobs
+
+
+def processFile(
+        filename: Path,
+        options: dict[str, Any],
+        *,
+        cache: TocCache | None = None,
+        captureOutput: bool = False,
+        withOutline: bool = False,
+        withStats: bool = False,
+) -> FileResult:
+    """
+    Create the table of contents for one file, turning the expected header
+    level errors into an error message. Files that the cache knows to be up
+    to date are skipped. If `withOutline` (or `withStats`) is True, the result
+    also contains the outline of the file's ToC (or the file's stats).
+    """
+    if withStats:
+        with collectStats() as stats:
+            result = processFile(
+                filename,
+                options,
+                cache=cache,
+                captureOutput=captureOutput,
+                withOutline=withOutline,
+            )
+
+        return replace(result, stats=stats)
+
+    with trackFile(filename):
+        return _processFile(
+            filename,
+            options,
+            cache=cache,
+            captureOutput=captureOutput,
+            withOutline=withOutline,
+        )
+
+
+def _processFile(
+        filename: Path,
+        options: dict[str, Any],
+        *,
+        cache: TocCache | None,
+        captureOutput: bool,
+        withOutline: bool,
+) -> FileResult:
+    # (Unless the file is written, its ToC is only up to date if unchanged)
+    inPlace: bool = options.get('in_place', True)
+    if cache is not None:
+        with timePhase('cache'):
+            record = cache.lookup(filename)
+
+        if record is not None:
+            # (A read-only cache's hits are stored again by its owner, which
+            # counts them as uses)
+            return _cachedFileResult(
+                filename, record if cache.readOnly else None, options
+            )
+
+    buffer = io.StringIO()
+    error: str | None = None
+    changed: bool = False
+    outline: list[OutlineEntry] | None = None
+    redirect = (
+        contextlib.redirect_stdout(buffer)
+        if captureOutput
+        else contextlib.nullcontext()
+    )
+    with redirect:
+        try:
+            tocLines = createToc(filename, **options)
+            changed = tocLines.changed
+            if withOutline:
+                outline = buildOutline(tocLines.headings, tocLines.tocEntries)
+        except (
+            HeaderLevelNotContinuousError,
+            HeaderLevelOutOfBoundError,
+        ) as err:
+            error = str(err)
+
+    cacheRecord: CacheRecord | None = None
+    if cache is not None and error is None and (inPlace or not changed):
+        with timePhase('cache'):
+            cacheRecord = CacheRecord.fromFile(filename)
+
+    return FileResult(
+        output=buffer.getvalue(),
+        error=error,
+        changed=changed,
+        cacheRecord=cacheRecord,
+        outline=outline,
+    )
+
+
+def _cachedFileResult(
+        filename: Path,
+        cacheRecord: CacheRecord | None,
+        options: dict[str, Any],
+) -> FileResult:
+    """
+    Get the result of a file that the cache knows to be up to date, with the
+    `cacheRecord` to store (if any). Unless quiet, its output is the usual
+    file header, and `CACHED_FILE_NOTE`.
+    """
+    stats = currentStats()
+    if stats is not None:
+        stats.numOfCachedFiles += 1
+
+    output: str = ''
+    if not options.get('quiet'):
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            _printFileHeader(filename)
+            print(CACHED_FILE_NOTE)
+
+        output = buffer.getvalue()
+
+    return FileResult(output=output, error=None, cacheRecord=cacheRecord)
+
+
+def processFilesInParallel(
+        filenames: list[Path],
+        *,
+        jobs: int,
+        options: dict[str, Any],
+        cache: TocCache | None = None,
+        withOutline: bool = False,
+        withStats: bool = False,
+) -> Iterator[FileResult]:
+    """
+    Process files with a pool of worker processes. The results are yielded
+    in the same order as `filenames`. The workers' caches are read-only:
+    storing the returned cache records (of the files processed, and of the
+    cache hits, which counts them as uses) is up to the caller.
+    """
+    # (Imported here, because it's slow to import and only used with --jobs)
+    from concurrent.futures import ProcessPoolExecutor  # noqa: PLC0415
+
+    cacheSettings: tuple[Path, str] | None = (
+        None if cache is None else (cache.cacheDir, cache.fingerprint)
+    )
+    chunkSize = max(
+        1,
+        min(MAX_CHUNK_SIZE, len(filenames) // (jobs * CHUNKS_PER_WORKER)),
+    )
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_initWorker,
+        initargs=(options, cacheSettings, withOutline, withStats),
+    ) as executor:
+        yield from executor.map(
+            _processFileInWorker, filenames, chunksize=chunkSize
+        )
+
+
+def _initWorker(
+        options: dict[str, Any],
+        cacheSettings: tuple[Path, str] | None,
+        withOutline: bool,  # noqa: FBT001 (passed via `initargs`)
+        withStats: bool,  # noqa: FBT001
+) -> None:
+    _workerState.options = options
+    _workerState.withOutline = withOutline
+    _workerState.withStats = withStats
+    if cacheSettings is not None:
+        cacheDir, fingerprint = cacheSettings
+        _workerState.cache = TocCache(cacheDir, fingerprint, readOnly=True)
+
+
+def _processFileInWorker(filename: Path) -> FileResult:
+    return processFile(
+        filename,
+        _workerState.options,
+        cache=_workerState.cache,
+        captureOutput=True,
+        withOutline=_workerState.withOutline,
+        withStats=_workerState.withStats,
+    )
@@ -0,0 +1,1020 @@
+from __future__ import annotations
+
+import functools
+import mmap
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+TOC_TAG = '<!--TOC-->'
+
+# The engines that find the headers: "simple" takes the lines that start with
+# '#' for headers, and the lines that start with '```' for code fences (as this
+# tool always did), and "commonmark" follows the block structure of CommonMark
+# (see `_BlockScanner`)
+SCANNER_ENGINES: tuple[str, ...] = ('simple', 'commonmark')
+DEFAULT_ENGINE: str = 'simple'
+
+# The min number of ToC tags that qualify as an insertion point
+MIN_NUM_OF_TOC_TAGS: int = 2
+
+# Matches the start of the only lines that the scanner cares about: headers,
+# code fences, and ToC placeholders. All other lines are skipped by the regex
+# engine, without creating any Python objects for them.
+_INTERESTING_LINE = re.compile(
+    r'^[^\S\n]*(?:(?P<header>#)|(?P<fence>```))'
+    rf'|^(?P<tag>{re.escape(TOC_TAG)})$',
+    flags=re.MULTILINE,
+)
+
+# The same as above, for UTF-8 encoded bytes. Only ASCII whitespace can
+# precede headers and fences, and lines may end with '\r\n'.
+_INTERESTING_LINE_BYTES = re.compile(
+    rb'^[ \t\x0b\x0c\r\x1c-\x1f]*(?:(?P<header>#)|(?P<fence>```))'
+    rb'|^(?P<tag>' + re.escape(TOC_TAG.encode()) + rb')\r?$',
+    flags=re.MULTILINE,
+)
+
+# Line breaks in a memory-mapped file are counted chunk by chunk, because
+# `mmap` objects can only be counted through (copied) slices
+_COUNTING_CHUNK_SIZE: int = 1 << 20
+
+
+@dataclass(frozen=True)
+class Heading:
+    """A header line found by the scanner"""
+
+    lineNumber: int  # 1-based
+    line: str  # without the line break
+    level: int  # the number of leading '#' characters of the line
+    offset: int = 0  # where the line starts (in bytes, for a byte buffer)
+
+
+@dataclass
+class ScanResult:
+    """Everything that `createToc()` needs to know about a markdown text"""
+
+    headings: list[Heading] = field(default_factory=list)
+
+    # The (start, end) offsets of the first 2 ToC placeholder lines. The end
+    # offset is after the line break. (For a scanned byte buffer, these are
+    # byte offsets.)
+    placeholderSpans: list[tuple[int, int]] = field(default_factory=list)
+    numOfPlaceholders: int = 0
+
+    # Whether the text ends inside a code block (i.e., an unclosed fence)
+    endsInCodeBlock: bool = False
+
+    # The (start, end) offsets of the fenced code blocks, in order, from their
+    # opening fence to after their closing fence (or to the end of the text)
+    codeBlockSpans: list[tuple[int, int]] = field(default_factory=list)
+
+    # Where the header on the first non-empty line ends (after its line
+    # break), or 0 if that line is not a header. Only the "commonmark" engine
+    # sets it, because it knows about setext headers and "#hashtag" lines.
+    titleEnd: int | None = None
+
+    @property
+    def hasInsertionPoint(self) -> bool:
+        """Whether there is a pair of ToC placeholders"""
+        return self.numOfPlaceholders >= MIN_NUM_OF_TOC_TAGS
+
+
+def scanMarkdown(
+        text: str,
+        *,
+        skip_first_n_lines: int = 1,
+        engine: str = DEFAULT_ENGINE,
+) -> ScanResult:
+    """
+    Scan the markdown text in one pass, and find the headers (outside of
+    code blocks and below the skipped lines) and the ToC placeholders, with
+    one of the `SCANNER_ENGINES`.
+    """
+    if _checkEngine(engine) == 'commonmark':
+        return _BlockScanner(
+            text,
+            syntax=_blockSyntax(isBytes=False),
+            lineBreak='\n',
+            decodeLine=str,
+        ).scan(skip_first_n_lines=skip_first_n_lines)
+
+    return _scan(
+        text,
+        pattern=_INTERESTING_LINE,
+        lineBreak='\n',
+        decodeLine=str,
+        skip_first_n_lines=skip_first_n_lines,
+    )
+
+
+def scanMarkdownBytes(
+        buffer: bytes | mmap.mmap,
+        *,
+        skip_first_n_lines: int = 1,
+        engine: str = DEFAULT_ENGINE,
+) -> ScanResult:
+    """
+    Scan UTF-8 encoded markdown (such as a memory-mapped file) in one pass,
+    like `scanMarkdown()`. Only the header lines are decoded.
+    """
+    if _checkEngine(engine) == 'commonmark':
+        return _BlockScanner(
+            buffer,
+            syntax=_blockSyntax(isBytes=True),
+            lineBreak=b'\n',
+            decodeLine=_decodeLine,
+        ).scan(skip_first_n_lines=skip_first_n_lines)
+
+    return _scan(
+        buffer,
+        pattern=_INTERESTING_LINE_BYTES,
+        lineBreak=b'\n',
+        decodeLine=_decodeLine,
+        skip_first_n_lines=skip_first_n_lines,
+    )
+
+
+def findFirstNonEmptyLine(
+        text: str | bytes | mmap.mmap,
+) -> tuple[int, int] | None:
+    """
+    Find the (start, end) offsets of the first non-empty line. The end offset
+    is after the line break.
+    """
+    match: re.Match[str] | re.Match[bytes] | None
+    if isinstance(text, str):
+        match = re.search(r'\S', text)
+        lineBreak: str | bytes = '\n'
+    else:
+        match = re.search(rb'\S', text)
+        lineBreak = b'\n'
+
+    if match is None:
+        return None
+
+    start = text.rfind(lineBreak, 0, match.start()) + 1  # type: ignore[arg-type]
+    return start, _findNextLineStart(text, lineBreak, match.start())
+
+
+def _scan(
+        buffer: str | bytes | mmap.mmap,
+        *,
+        pattern: re.Pattern[str] | re.Pattern[bytes],
+        lineBreak: str | bytes,
+        decodeLine: Callable[..., str],
+        skip_first_n_lines: int,
+) -> ScanResult:
+    result = ScanResult()
+    inCodeBlock: bool = False
+    codeBlockStart: int = 0
+    lineNumber: int = 1
+    lastLineStart: int = 0
+
+    for match in pattern.finditer(buffer):  # type: ignore[arg-type]
+        lineStart = match.start()
+        lineNumber += _countLineBreaks(
+            buffer, lineBreak, lastLineStart, lineStart
+        )
+        lastLineStart = lineStart
+
+        if match.lastgroup == 'tag':
+            result.numOfPlaceholders += 1
+            if len(result.placeholderSpans) < MIN_NUM_OF_TOC_TAGS:
+                result.placeholderSpans.append((
+                    lineStart,
+                    _findNextLineStart(buffer, lineBreak, match.end()),
+                ))
+        elif match.lastgroup == 'fence':
+            if inCodeBlock:
+                result.codeBlockSpans.append((
+                    codeBlockStart,
+                    _findNextLineStart(buffer, lineBreak, match.end()),
+                ))
+            else:
+                codeBlockStart = lineStart
+
+            inCodeBlock = not inCodeBlock
+        elif lineNumber > skip_first_n_lines and not inCodeBlock:
+            lineEnd = buffer.find(lineBreak, lineStart)  # type: ignore[arg-type]
+            line = decodeLine(
+                buffer[lineStart:]
+                if lineEnd == -1
+                else buffer[lineStart:lineEnd]
+            )
+            result.headings.append(
+                Heading(
+                    lineNumber=lineNumber,
+                    line=line,
+                    level=len(line) - len(line.lstrip('#')),
+                    offset=lineStart,
+                )
+            )
+
+    if inCodeBlock:
+        result.codeBlockSpans.append((codeBlockStart, len(buffer)))
+
+    result.endsInCodeBlock = inCodeBlock
+    return result
+
+
+def _checkEngine(engine: str) -> str:
+    if engine not in SCANNER_ENGINES:
+        raise ValueError(f'"--engine" must be one of {list(SCANNER_ENGINES)}')
+
+    return engine
+
+
+def _decodeLine(line: bytes) -> str:
+    return line.decode('utf-8').removesuffix('\r')
+
+
+def _countLineBreaks(
+        buffer: str | bytes | mmap.mmap,
+        lineBreak: str | bytes,
+        start: int,
+        end: int,
+) -> int:
+    if not isinstance(buffer, mmap.mmap):
+        return buffer.count(lineBreak, start, end)  # type: ignore[arg-type]
+
+    count: int = 0
+    for chunkStart in range(start, end, _COUNTING_CHUNK_SIZE):
+        chunkEnd = min(chunkStart + _COUNTING_CHUNK_SIZE, end)
+        count += buffer[chunkStart:chunkEnd].count(lineBreak)  # type: ignore[arg-type]
+
+    return count
+
+
+def _findNextLineStart(
+        buffer: str | bytes | mmap.mmap,
+        lineBreak: str | bytes,
+        position: int,
+) -> int:
+    lineBreakPos = buffer.find(lineBreak, position)  # type: ignore[arg-type]
+    return len(buffer) if lineBreakPos == -1 else lineBreakPos + 1
+
+
+# The "commonmark" engine. Like the simple engine, it uses a regex to find the
+# only lines that matter (the lines that may start or end a block), so that
+# paragraph text is skipped without creating Python objects for it. The
+# content of code blocks and HTML blocks is skipped by searching for where
+# they end.
+_BLANK_LINES_SOURCE: str = r"""
+      | (?P<blank>[ \t]*\r?$(?:\n[ \t]*\r?$)*)
+"""
+
+
+def _blockStartSource(*, blankLines: bool, firstLine: bool = False) -> str:
+    """
+    Get the source of the regex that finds the lines that may start or end a
+    block. The matches start at the line break before the line (or at the
+    start of the text, for the `firstLine`), which lets the regex engine skip
+    from line break to line break, and end at the end of the line. Blank
+    lines only matter when a paragraph or a container is open.
+    """
+    before: str = r'\A' if firstLine else r'\n'
+    return rf"""
+    {before}(?P<line>)(?:
+        (?P<tag>{re.escape(TOC_TAG)})\r?$
+      | [ ]{{0,3}}(?:
+            (?P<atx>\#{{1,6}})(?=[ \t]|\r?$)
+          | (?P<fence>`{{3,}}(?=[^`\n]*$)|~{{3,}})
+          | (?P<setext>=+|-+)[ \t]*\r?$
+          | (?P<thematicBreak>
+                (?:\*[ \t]*){{3,}}|(?:-[ \t]*){{3,}}|(?:_[ \t]*){{3,}}
+            )\r?$
+          | (?P<html><)
+          | (?P<container>(?:[-+*]|[0-9]{{1,9}}[.)])(?=[ \t]|\r?$)|>)
+        )
+      {_BLANK_LINES_SOURCE if blankLines else ''}
+      | (?P<indented>[ ]{{0,3}}\t|[ ]{{4}})
+    )
+    [^\n]*
+    """
+
+
+# The HTML tags that start an HTML block (of type 6) of the CommonMark spec
+_HTML_BLOCK_TAG_NAMES: tuple[str, ...] = (
+    'address', 'article', 'aside', 'base', 'basefont', 'blockquote', 'body',
+    'caption', 'center', 'col', 'colgroup', 'dd', 'details', 'dialog', 'dir',
+    'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form',
+    'frame', 'frameset', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head',
+    'header', 'hr', 'html', 'iframe', 'legend', 'li', 'link', 'main', 'menu',
+    'menuitem', 'nav', 'noframes', 'ol', 'optgroup', 'option', 'p', 'param',
+    'search', 'section', 'summary', 'table', 'tbody', 'td', 'tfoot', 'th',
+    'thead', 'title', 'tr', 'track', 'ul',
+)  # fmt: skip
+
+_HTML_ATTRIBUTE: str = (
+    r"""[ \t]+[A-Za-z_:][A-Za-z0-9_.:-]*"""
+    r"""(?:[ \t]*=[ \t]*(?:[^ \t"'=<>`]+|'[^']*'|"[^"]*"))?"""
+)
+
+# The start of each type of HTML block (matched at the '<')
+_HTML_BLOCK_START_SOURCE: str = rf"""
+    <(?:
+        (?P<raw>(?:script|pre|style|textarea)(?=[ \t>]|\r?$))
+      | (?P<comment>!--)
+      | (?P<instruction>\?)
+      | (?P<cdata>!\[CDATA\[)
+      | (?P<declaration>![A-Za-z])
+      | (?P<block>/?(?:{'|'.join(_HTML_BLOCK_TAG_NAMES)})(?=[ \t>]|/>|\r?$))
+      | (?P<tag>
+            (?:[A-Za-z][A-Za-z0-9-]*(?:{_HTML_ATTRIBUTE})*[ \t]*/?
+            |/[A-Za-z][A-Za-z0-9-]*[ \t]*)
+            >[ \t]*\r?$
+        )
+    )
+"""
+
+# The end of the types of HTML blocks that don't end at a blank line
+_HTML_BLOCK_END_SOURCES: dict[str, str] = {
+    'raw': r'</(?:script|pre|style|textarea)>',
+    'comment': r'-->',
+    'instruction': r'\?>',
+    'cdata': r'\]\]>',
+    'declaration': r'>',
+}
+
+# The content of a line of a list item or of a block quote (matched after its
+# indentation or its container marker), with the markers of nested containers
+_CONTAINER_CONTENT_SOURCE: str = r"""
+    (?:[ \t]*(?:(?:[-+*]|[0-9]{1,9}[.)])(?=[ \t]|\r?$)|>))*
+    [ \t]*
+    (?:
+        (?P<blank>\r?$)
+      | (?P<atx>\#{1,6})(?=[ \t]|\r?$)
+      | (?P<fence>`{3,}(?=[^`\n]*$)|~{3,})
+      | (?P<setext>(?:=+|-+)[ \t]*\r?$)
+      | (?P<thematicBreak>(?:\*[ \t]*){3,}|(?:_[ \t]*){3,})\r?$
+      | (?P<html><)
+      | (?P<text>)
+    )
+"""
+
+# Everything after the opening '#' characters of an ATX header that isn't its
+# text: the closing '#' characters (after a space), and trailing spaces
+_ATX_CLOSING_SEQUENCE = re.compile(r'[ \t]+#+[ \t]*$|[ \t]*$')
+
+# The lines that are handled differently after a paragraph (such as setext
+# underlines, or "1." which cannot start a list there)
+_PARAGRAPH_SENSITIVE_LINES: frozenset[str] = frozenset({
+    'setext',
+    'html',
+    'container',
+    'indented',
+})
+
+# The indentation of lines is measured in columns, with tab stops of 4
+_TAB_SIZE: int = 4
+
+# The content indentation of block quotes: their lines start with '>' (or are
+# lazy continuation lines), rather than being indented
+_BLOCK_QUOTE_INDENT: int = sys.maxsize
+
+
+class _BlockSyntax(NamedTuple):
+    blockStart: re.Pattern[Any]
+    blockStartOrBlankLines: re.Pattern[Any]
+    firstLine: re.Pattern[Any]
+    htmlBlockStart: re.Pattern[Any]
+    htmlBlockEnds: dict[str, re.Pattern[Any]]
+    blankLine: re.Pattern[Any]
+    blankRest: re.Pattern[Any]
+    containerContent: re.Pattern[Any]
+    indentation: re.Pattern[Any]
+
+
+@functools.cache
+def _blockSyntax(*, isBytes: bool) -> _BlockSyntax:
+    """Compile the patterns of the "commonmark" engine (once, on first use)"""
+
+    def compilePattern(source: str, flags: int = 0) -> re.Pattern[Any]:
+        return re.compile(source.encode() if isBytes else source, flags)
+
+    return _BlockSyntax(
+        blockStart=compilePattern(
+            _blockStartSource(blankLines=False), re.MULTILINE | re.VERBOSE
+        ),
+        blockStartOrBlankLines=compilePattern(
+            _blockStartSource(blankLines=True), re.MULTILINE | re.VERBOSE
+        ),
+        firstLine=compilePattern(
+            _blockStartSource(blankLines=True, firstLine=True),
+            re.MULTILINE | re.VERBOSE,
+        ),
+        htmlBlockStart=compilePattern(
+            _HTML_BLOCK_START_SOURCE,
+            re.MULTILINE | re.VERBOSE | re.IGNORECASE,
+        ),
+        htmlBlockEnds={
+            kind: compilePattern(source, re.IGNORECASE)
+            for kind, source in _HTML_BLOCK_END_SOURCES.items()
+        },
+        blankLine=compilePattern(r'^[ \t]*\r?$', re.MULTILINE),
+        blankRest=compilePattern(r'[ \t]*\r?$', re.MULTILINE),
+        containerContent=compilePattern(
+            _CONTAINER_CONTENT_SOURCE, re.MULTILINE | re.VERBOSE
+        ),
+        indentation=compilePattern(r'[ \t]*'),
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _closingFence(fence: str | bytes, *, nested: bool) -> re.Pattern[Any]:
+    """
+    Compile the pattern of the fence that closes the code block `fence`
+    (which may be indented as much as its list item, if it is `nested`)
+    """
+    char: str = fence[:1].decode() if isinstance(fence, bytes) else fence[:1]
+    indentation: str = r'[ \t]*' if nested else r'[ ]{0,3}'
+    source = rf'^{indentation}{re.escape(char)}{{{len(fence)},}}[ \t]*\r?$'
+    if isinstance(fence, bytes):
+        return re.compile(source.encode(), re.MULTILINE)
+
+    return re.compile(source, re.MULTILINE)
+
+
+class _BlockScanner:
+    """
+    A single-pass, linear-time state machine over the blocks of CommonMark:
+    ATX and setext headers, fenced code blocks (with backticks or tildes, and
+    of any length), indented code blocks, HTML blocks, thematic breaks, and
+    paragraphs. List items and block quotes are tracked as a single level of
+    container (the outermost one), with the indentation of its content, and
+    with lazy continuation lines. Like with the simple engine, only the
+    headers outside of containers are collected, and empty headers (such as
+    "#") are left out, because they have no anchor link.
+    """
+
+    def __init__(
+            self,
+            buffer: str | bytes | mmap.mmap,
+            *,
+            syntax: _BlockSyntax,
+            lineBreak: str | bytes,
+            decodeLine: Callable[..., str],
+    ) -> None:
+        self.buffer = buffer
+        self.syntax = syntax
+        self.lineBreak = lineBreak
+        self.decodeLine = decodeLine
+        self.result = ScanResult()
+        # The offset of the first line of the open paragraph, outside of
+        # containers
+        self.paragraphStart: int | None = None
+        # The column of the content of the open list item (or
+        # `_BLOCK_QUOTE_INDENT`), or None outside of containers
+        self.containerIndent: int | None = None
+        # Whether a paragraph is open in the container, which unindented
+        # lines of text continue (as lazy continuation lines)
+        self.containerParagraph: bool = False
+        # Whether the container is a list item that is still empty (which a
+        # blank line closes)
+        self.isEmptyListItem: bool = False
+        self.firstLineStart: int | None = None  # of the first non-blank line
+        self._lineNumber: int = 1
+        self._lineNumberOffset: int = 0
+        self._countLineBreaks: Callable[[int, int], int] = (
+            functools.partial(_countLineBreaks, buffer, lineBreak)
+            if isinstance(buffer, mmap.mmap)
+            else functools.partial(buffer.count, lineBreak)  # type: ignore[arg-type]
+        )
+
+    def scan(self, *, skip_first_n_lines: int) -> ScanResult:
+        """Scan the whole buffer"""
+        buffer = self.buffer
+        syntax = self.syntax
+        position: int = 0
+        # The line after a run of ATX headers (already found)
+        nextMatch: re.Match[Any] | None = None
+        while position < len(buffer):
+            isIdle: bool = (
+                self.paragraphStart is None and self.containerIndent is None
+            )
+            # (The matches start at the line break before the line)
+            match = nextMatch or (
+                (
+                    syntax.blockStart
+                    if isIdle
+                    else syntax.blockStartOrBlankLines
+                ).search(buffer, position - 1)
+                if position
+                else syntax.firstLine.match(buffer)
+                or syntax.blockStartOrBlankLines.search(buffer)
+            )
+            nextMatch = None
+            lineStart: int = (
+                len(buffer) if match is None else match.start('line')
+            )
+            if lineStart > position:  # (skipped lines: paragraph text)
+                if not isIdle:
+                    self._continueParagraph(position)
+                elif self.firstLineStart is None or (
+                    match is not None
+                    and match.lastgroup in _PARAGRAPH_SENSITIVE_LINES
+                ):
+                    self._skipLines(
+                        position,
+                        lineStart,
+                        nextLine=None if match is None else match.lastgroup,
+                    )
+
+            if match is None:
+                break
+
+            if match.lastgroup == 'atx' and self.containerIndent is None:
+                # (The fast path of the most common kind of lines)
+                if self.firstLineStart is None:
+                    self.firstLineStart = lineStart
+
+                self.paragraphStart = None
+                position, nextMatch = self._addAtxHeadings(
+                    match, skip_first_n_lines=skip_first_n_lines
+                )
+            else:
+                position = self._handleLine(
+                    match, skip_first_n_lines=skip_first_n_lines
+                )
+
+        self.result.titleEnd = self.result.titleEnd or 0
+        return self.result
+
+    def _skipLines(
+            self, start: int, end: int, *, nextLine: str | None
+    ) -> None:
+        """
+        Handle the lines of text and the blank lines that were skipped while
+        no paragraph was open: the last lines of text (if not followed by a
+        blank line) form an open paragraph, which only matters to some kinds
+        of `nextLine`
+        """
+        buffer = self.buffer
+        lineBreak = self.lineBreak
+        blankLine = self.syntax.blankLine
+        if self.firstLineStart is None:
+            lineStart: int = start
+            while blankLine.match(buffer, lineStart):
+                lineStart = self._nextLineStart(lineStart)
+                if lineStart >= end:
+                    return
+
+            self.firstLineStart = lineStart
+
+        if nextLine not in _PARAGRAPH_SENSITIVE_LINES:
+            return  # (the next line would close the paragraph anyway)
+
+        # (Walk back from the last skipped line to the first line of text
+        # after a blank line)
+        paragraphStart: int = end
+        while paragraphStart > start:
+            lineStart = max(
+                start,
+                buffer.rfind(lineBreak, start, paragraphStart - 1) + 1,  # type: ignore[arg-type]
+            )
+            if blankLine.match(buffer, lineStart):
+                break
+
+            paragraphStart = lineStart
+
+        if paragraphStart < end:
+            self.paragraphStart = paragraphStart
+
+    def _handleLine(
+            self, match: re.Match[Any], *, skip_first_n_lines: int
+    ) -> int:
+        """
+        Handle a line that may start or end a block, and return the offset of
+        the next line to scan
+        """
+        kind: str | None = match.lastgroup
+        lineStart: int = match.start('line')
+        lineEnd: int = min(match.end() + 1, len(self.buffer))
+        if kind == 'blank':  # (one or more blank lines)
+            self.paragraphStart = None
+            self.containerParagraph = False
+            if self.isEmptyListItem:
+                self.containerIndent = None
+                self.isEmptyListItem = False
+
+            return lineEnd
+
+        if self.firstLineStart is None:
+            self.firstLineStart = lineStart
+
+        if self.containerIndent is not None:
+            nextLineStart = self._handleContainerLine(match, lineEnd)
+            if nextLineStart is not None:
+                return nextLineStart
+
+        return self._handleBlockStart(
+            match, lineStart, lineEnd, skip_first_n_lines=skip_first_n_lines
+        )
+
+    def _handleBlockStart(
+            self,
+            match: re.Match[Any],
+            lineStart: int,
+            lineEnd: int,
+            *,
+            skip_first_n_lines: int,
+    ) -> int:
+        """
+        Handle a line outside of a container, and return the offset of the
+        next line to scan
+        """
+        kind: str | None = match.lastgroup
+        if kind == 'tag':
+            self._addPlaceholder(lineStart, lineEnd)
+        elif kind == 'atx':
+            self._addAtxHeading(match, skip_first_n_lines=skip_first_n_lines)
+            self.paragraphStart = None
+        elif kind == 'fence':
+            return self._skipFencedCodeBlock(match, lineEnd)
+        elif kind == 'setext':
+            return self._handleSetextUnderline(
+                match, lineEnd, skip_first_n_lines=skip_first_n_lines
+            )
+        elif kind == 'thematicBreak':
+            self.paragraphStart = None
+        elif kind == 'html':
+            return self._skipHtmlBlock(match, lineEnd)
+        elif kind == 'container':
+            if self.paragraphStart is None or self._canInterruptParagraph(
+                match
+            ):
+                return self._openContainer(match, lineEnd)
+
+            self._continueParagraph(lineStart)
+
+        # (Else an indented line: the continuation of a paragraph, or an
+        # indented code block, since a header or a fence is never indented
+        # this much)
+        return lineEnd
+
+    def _addPlaceholder(self, lineStart: int, lineEnd: int) -> None:
+        self.paragraphStart = None
+        self.result.numOfPlaceholders += 1
+        if len(self.result.placeholderSpans) < MIN_NUM_OF_TOC_TAGS:
+            self.result.placeholderSpans.append((lineStart, lineEnd))
+
+    def _handleContainerLine(
+            self, match: re.Match[Any], lineEnd: int
+    ) -> int | None:
+        """
+        Handle a line while in a container, and return the offset of the next
+        line to scan, or None if the line closes the container (and is to be
+        handled outside of it)
+        """
+        self.isEmptyListItem = False
+        lineStart: int = match.start('line')
+        indent: int = self._indentAt(lineStart)
+        if indent >= self.containerIndent:  # type: ignore[operator]
+            return self._handleContainerContent(
+                lineStart,
+                lineEnd,
+                isIndentedCode=indent - self.containerIndent >= _TAB_SIZE,  # type: ignore[operator]
+            )
+
+        if match.lastgroup == 'container' or match.group('setext') in {
+            '-',
+            b'-',
+        }:
+            # (A new list item or block quote, even if empty: lazy
+            # continuation lines cannot start containers)
+            return self._openContainer(match, lineEnd)
+
+        if self.containerParagraph and self._isContinuationText(match):
+            return lineEnd
+
+        self.containerIndent = None
+        self.containerParagraph = False
+        return None
+
+    def _handleContainerContent(
+            self, position: int, lineEnd: int, *, isIndentedCode: bool
+    ) -> int:
+        """
+        Handle the content of a line of a container (from `position`), and
+        return the offset of the next line to scan
+        """
+        if isIndentedCode and not self.containerParagraph:
+            return lineEnd
+
+        content = self.syntax.containerContent.match(self.buffer, position)
+        kind: str | None = content.lastgroup  # type: ignore[union-attr]
+        if kind == 'fence':
+            self.containerParagraph = False
+            end: int = self._skipNestedCodeBlock(
+                content.group('fence'),  # type: ignore[union-attr]
+                lineEnd,
+            )
+            self.result.codeBlockSpans.append((position, end))
+            return end
+
+        if kind == 'setext':  # (an underline, or text without a paragraph)
+            underline: str | bytes = content.group('setext').rstrip()  # type: ignore[union-attr]
+            self.containerParagraph = not self.containerParagraph and (
+                underline[:1] in {'=', b'='} or len(underline) == 2  # noqa: PLR2004
+            )
+        elif kind == 'html':
+            htmlStart = self.syntax.htmlBlockStart.match(
+                self.buffer,
+                content.start('html'),  # type: ignore[union-attr]
+            )
+            self.containerParagraph = htmlStart is None or (
+                htmlStart.lastgroup == 'tag' and self.containerParagraph
+            )
+        else:
+            self.containerParagraph = kind == 'text'
+
+        return lineEnd
+
+    def _skipNestedCodeBlock(self, fence: str | bytes, lineEnd: int) -> int:
+        """
+        Skip a fenced code block of a container, which ends at its closing
+        fence, or at the first line that closes the container
+        """
+        buffer = self.buffer
+        closingFence = _closingFence(fence, nested=True)
+        position: int = lineEnd
+        while position < len(buffer):
+            if self._indentAt(position) < self.containerIndent and not (  # type: ignore[operator]
+                self.syntax.blankLine.match(buffer, position)
+            ):
+                return position
+
+            if closingFence.match(buffer, position):
+                return self._nextLineStart(position)
+
+            position = self._nextLineStart(position)
+
+        return position
+
+    def _skipFencedCodeBlock(self, match: re.Match[Any], lineEnd: int) -> int:
+        self.paragraphStart = None
+        closingFence = _closingFence(
+            match.group('fence'), nested=False
+        ).search(self.buffer, lineEnd)
+        end: int
+        if closingFence is None:  # (the code block never ends)
+            self.result.endsInCodeBlock = True
+            end = len(self.buffer)
+        else:
+            end = self._nextLineStart(closingFence.end())
+
+        self.result.codeBlockSpans.append((match.start('line'), end))
+        return end
+
+    def _handleSetextUnderline(
+            self,
+            match: re.Match[Any],
+            lineEnd: int,
+            *,
+            skip_first_n_lines: int,
+    ) -> int:
+        lineStart: int = match.start('line')
+        underline: str | bytes = match.group('setext')
+        if self.paragraphStart is not None:
+            self._addSetextHeading(
+                level=1 if underline[:1] in {'=', b'='} else 2,
+                underlineStart=lineStart,
+                underlineEnd=lineEnd,
+                skip_first_n_lines=skip_first_n_lines,
+            )
+            self.paragraphStart = None
+        elif len(underline) == 1 and underline[:1] in {'-', b'-'}:
+            return self._openContainer(match, lineEnd)  # (an empty item)
+        elif len(underline) >= 3 and underline[:1] in {'-', b'-'}:  # noqa: PLR2004
+            pass  # (a thematic break)
+        else:
+            self._continueParagraph(lineStart)
+
+        return lineEnd
+
+    def _addAtxHeadings(
+            self, match: re.Match[Any], *, skip_first_n_lines: int
+    ) -> tuple[int, re.Match[Any] | None]:
+        """
+        Add an ATX header outside of containers, and the ones that follow it
+        with only text and blank lines in between (which leave no block
+        open), and return the offset of the next line to scan and the match
+        of the line that ends the run (if any)
+        """
+        position: int = self._addAtxHeading(
+            match, skip_first_n_lines=skip_first_n_lines
+        )
+        for nextMatch in self.syntax.blockStart.finditer(
+            self.buffer, position - 1
+        ):
+            if nextMatch.lastgroup != 'atx':
+                return position, nextMatch
+
+            position = self._addAtxHeading(
+                nextMatch, skip_first_n_lines=skip_first_n_lines
+            )
+
+        return position, None
+
+    def _addAtxHeading(
+            self, match: re.Match[Any], *, skip_first_n_lines: int
+    ) -> int:
+        """Add an ATX header, and return the offset of the next line"""
+        lineStart: int = match.start('line')
+        lineEnd: int = match.end()  # (the matches end at the end of the line)
+        nextLineStart: int = min(lineEnd + 1, len(self.buffer))
+        if lineStart == self.firstLineStart:
+            self.result.titleEnd = nextLineStart
+
+        lineNumber: int = self._lineNumberAt(lineStart)
+        if lineNumber <= skip_first_n_lines:
+            return nextLineStart
+
+        line: str = self.decodeLine(self.buffer[lineStart:lineEnd])
+        textStart: int = match.end('atx') - lineStart
+        textEnd: int = len(line)
+        if line.endswith(('#', ' ', '\t')):  # (else there's nothing to strip)
+            textEnd = _ATX_CLOSING_SEQUENCE.search(line, textStart).start()  # type: ignore[union-attr]
+
+        if not line[textStart:textEnd].strip():
+            return nextLineStart  # (an empty header)
+
+        self.result.headings.append(
+            Heading(
+                lineNumber=lineNumber,
+                line=line[:textEnd],
+                level=len(match.group('atx')),
+                offset=lineStart,
+            )
+        )
+        return nextLineStart
+
+    def _addSetextHeading(
+            self,
+            *,
+            level: int,
+            underlineStart: int,
+            underlineEnd: int,
+            skip_first_n_lines: int,
+    ) -> None:
+        start: int = self.paragraphStart  # type: ignore[assignment]
+        if start == self.firstLineStart:
+            self.result.titleEnd = underlineEnd
+
+        lineNumber: int = self._lineNumberAt(start)
+        if lineNumber <= skip_first_n_lines:
+            return
+
+        # The text of the header is the paragraph's (on one line)
+        lines: str | bytes = self.buffer[start:underlineStart]
+        text: str = lines if isinstance(lines, str) else lines.decode('utf-8')
+        self.result.headings.append(
+            Heading(
+                lineNumber=lineNumber,
+                line=' '.join(_.strip() for _ in text.splitlines()),
+                level=level,
+                offset=start,
+            )
+        )
+
+    def _skipHtmlBlock(self, match: re.Match[Any], lineEnd: int) -> int:
+        """Skip an HTML block (or continue a paragraph, if it isn't one)"""
+        lineStart: int = match.start('line')
+        htmlStart = self.syntax.htmlBlockStart.match(
+            self.buffer, match.start('html')
+        )
+        kind: str | None = None if htmlStart is None else htmlStart.lastgroup
+        # (An HTML block of "any other tag" cannot interrupt a paragraph)
+        if htmlStart is None or (
+            kind == 'tag' and self.paragraphStart is not None
+        ):
+            self._continueParagraph(lineStart)
+            return lineEnd
+
+        self.paragraphStart = None
+        if kind in {'block', 'tag'}:  # (they end at a blank line)
+            blankLine = self.syntax.blankLine.search(self.buffer, lineEnd)
+            return len(self.buffer) if blankLine is None else blankLine.start()
+
+        end = self.syntax.htmlBlockEnds[kind].search(  # type: ignore[index]
+            self.buffer, htmlStart.end()
+        )
+        return (
+            len(self.buffer) if end is None else self._nextLineStart(end.end())
+        )
+
+    def _continueParagraph(self, lineStart: int) -> None:
+        """Handle a line of text (which opens or continues a paragraph)"""
+        if self.firstLineStart is None:
+            self.firstLineStart = lineStart
+
+        if self.containerIndent is not None:
+            self.isEmptyListItem = False
+            if self.containerParagraph or (
+                self._indentAt(lineStart) >= self.containerIndent
+            ):
+                self.containerParagraph = True
+                return
+
+            self.containerIndent = None  # (the container has ended)
+
+        if self.paragraphStart is None:
+            self.paragraphStart = lineStart
+
+    def _isContinuationText(self, match: re.Match[Any]) -> bool:
+        """
+        Check whether a line that isn't in the container would be text that
+        continues a paragraph (rather than a block that interrupts it)
+        """
+        kind: str | None = match.lastgroup
+        if kind == 'indented':
+            return True
+
+        if kind == 'setext':  # ('=' lines, and '--', are text)
+            underline: str | bytes = match.group('setext')
+            return underline[:1] in {'=', b'='} or len(underline) == 2  # noqa: PLR2004
+
+        if kind == 'html':
+            htmlStart = self.syntax.htmlBlockStart.match(
+                self.buffer, match.start('html')
+            )
+            return htmlStart is None or htmlStart.lastgroup == 'tag'
+
+        return False
+
+    def _canInterruptParagraph(self, match: re.Match[Any]) -> bool:
+        """
+        Check whether a container marker can interrupt a paragraph: a block
+        quote can, and a list item can unless it is empty, or is numbered
+        from another number than 1
+        """
+        if match.lastgroup != 'container':  # (a '-' line: an empty item)
+            return False
+
+        marker: str | bytes = match.group('container')
+        if marker in {'>', b'>'}:
+            return True
+
+        if self.syntax.blankRest.match(self.buffer, match.end('container')):
+            return False
+
+        return len(marker) == 1 or int(marker[:-1]) == 1
+
+    def _openContainer(self, match: re.Match[Any], lineEnd: int) -> int:
+        """
+        Open a list item or a block quote (at a container marker, or at a '-'
+        line), and return the offset of the next line to scan
+        """
+        self.paragraphStart = None
+        kind: str = 'container' if match.lastgroup == 'container' else 'setext'
+        markerEnd: int = match.end(kind)
+        if match.group(kind) in {'>', b'>'}:
+            if self.containerIndent != _BLOCK_QUOTE_INDENT:
+                self.containerParagraph = False
+
+            self.containerIndent = _BLOCK_QUOTE_INDENT
+        else:
+            # (The content starts after the marker and 1 to 4 spaces, or
+            # after 1 space if it's an indented code block, or blank)
+            marker: str = self.decodeLine(
+                self.buffer[match.start('line') : markerEnd]
+            )
+            spaces: str = self.decodeLine(
+                self.syntax.indentation.match(self.buffer, markerEnd).group()  # type: ignore[union-attr]
+            )
+            width: int = len((marker + spaces).expandtabs(_TAB_SIZE)) - len(
+                marker.expandtabs(_TAB_SIZE)
+            )
+            self.isEmptyListItem = bool(
+                self.syntax.blankRest.match(self.buffer, markerEnd)
+            )
+            if width > _TAB_SIZE or self.isEmptyListItem:
+                width = 1
+
+            self.containerIndent = len(marker.expandtabs(_TAB_SIZE)) + width
+            self.containerParagraph = False
+
+        return self._handleContainerContent(
+            markerEnd, lineEnd, isIndentedCode=False
+        )
+
+    def _indentAt(self, lineStart: int) -> int:
+        """Get the indentation of a line, in columns"""
+        indentation = self.syntax.indentation.match(self.buffer, lineStart)
+        return len(indentation.group().expandtabs(_TAB_SIZE))  # type: ignore[union-attr]
+
+    def _nextLineStart(self, position: int) -> int:
+        return _findNextLineStart(self.buffer, self.lineBreak, position)
+
+    def _lineNumberAt(self, offset: int) -> int:
+        """Get the line number of an offset (which only ever increases)"""
+        self._lineNumber += self._countLineBreaks(
+            self._lineNumberOffset, offset
+        )
+        self._lineNumberOffset = offset
+        return self._lineNumber
@@ -0,0 +1,278 @@
+r"""
+A long-lived server that creates tables of contents on request, so that
+editors and build systems pay the start-up cost only once.
+
+The protocol is line-delimited JSON: each request is one JSON object per
+line, and each response is one JSON object per line, with the same "id".
+A request has either a "path" (of a markdown file to process) or a "text"
+(of in-memory markdown, optionally with a "filename" that identifies the
+document), and optionally "options" that override the server's options:
+
+    {"id": 1, "path": "docs/guide.md"}
+    {"id": 2, "text": "# Title\n\n## Section\n", "filename": "draft.md"}
+
+A successful response has "ok": true, "changed", "tocLines", and "headings"
+(as in `--format json`), plus "text" for in-memory requests. A failed one
+has "ok": false and an "error" message. Requests may be handled
+concurrently, so responses may arrive in a different order.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from markdown_toc_creator.create_toc import createToc, createTocFromString
+from markdown_toc_creator.exceptions import (
+    HeaderLevelNotContinuousError,
+    HeaderLevelOutOfBoundError,
+)
+from markdown_toc_creator.incremental import IncrementalTocCreator
+from markdown_toc_creator.outline import buildOutline
+
+if TYPE_CHECKING:
+    import socketserver
+    from concurrent.futures import Future
+    from typing import TextIO
+
+    from markdown_toc_creator.scanner import Heading
+    from markdown_toc_creator.toc_entry import TocEntry
+
+# The options that requests may override (those of `createTocFromString()`,
+# plus `in_place` for files)
+REQUEST_OPTIONS: frozenset[str] = frozenset({
+    'skip_first_n_lines',
+    'proactive',
+    'add_toc_title',
+    'add_horizontal_rules',
+    'toc_title',
+    'style',
+    'horizontal_rule_style',
+    'engine',
+    'in_place',
+})
+
+
+class RequestError(Exception):
+    """A request that cannot be handled (such as a malformed one)"""
+
+
+class TocServer:
+    """
+    Handle ToC requests (see this module's docstring). The server stays warm
+    between requests: the memoized anchor links, and the header index of each
+    in-memory document (see `IncrementalTocCreator`) are kept.
+    """
+
+    def __init__(self, tocOptions: dict[str, Any], *, jobs: int = 1) -> None:
+        self.tocOptions: dict[str, Any] = {
+            key: value
+            for key, value in tocOptions.items()
+            if key in REQUEST_OPTIONS or key == 'mmap_threshold'
+        }
+        self.jobs = jobs
+        self._creators: dict[str, IncrementalTocCreator] = {}
+        self._documentLocks: dict[tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._unixServer: socketserver.BaseServer | None = None
+
+    def handleRequest(self, request: Any) -> dict[str, Any]:
+        """
+        Handle one (decoded) request, and return the response. Every request
+        gets a response, even if handling it fails unexpectedly.
+        """
+        requestId = request.get('id') if isinstance(request, dict) else None
+        try:
+            response = self._dispatch(request)
+        except (
+            RequestError,
+            HeaderLevelNotContinuousError,
+            HeaderLevelOutOfBoundError,
+            OSError,
+            TypeError,
+            ValueError,  # (including `UnicodeDecodeError`)
+        ) as err:
+            return {'id': requestId, 'ok': False, 'error': str(err)}
+        except Exception as err:  # noqa: BLE001 (such as a bug)
+            return {
+                'id': requestId,
+                'ok': False,
+                'error': f'Internal error: {type(err).__name__}: {err}',
+            }
+
+        return {'id': requestId, 'ok': True, **response}
+
+    def handleLine(self, line: str) -> str:
+        """Handle one request line, and return the response line"""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as err:
+            response: dict[str, Any] = {
+                'id': None,
+                'ok': False,
+                'error': f'Invalid JSON: {err}',
+            }
+        else:
+            response = self.handleRequest(request)
+
+        return json.dumps(response) + '\n'
+
+    def serveStream(self, inStream: TextIO, outStream: TextIO) -> None:
+        """
+        Handle the request lines of `inStream` (until its end) with a pool of
+        `jobs` threads, and write the responses to `outStream`
+        """
+        # (Imported here, because only the server mode needs a thread pool)
+        from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+        writeLock = threading.Lock()
+
+        def respond(line: str) -> None:
+            response = self.handleLine(line)
+            with writeLock:
+                outStream.write(response)
+                outStream.flush()
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for line in inStream:
+                if line.strip():
+                    future = executor.submit(respond, line)
+                    # (Such as when the response cannot be written)
+                    future.add_done_callback(_reportFailure)
+
+    def serveUnixSocket(self, socketPath: Path) -> None:
+        """
+        Accept connections on a Unix socket (until interrupted), and handle
+        the requests of each connection like `serveStream()`
+        """
+        import socketserver  # noqa: PLC0415
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    text = line.decode('utf-8', errors='replace')
+                    if text.strip():
+                        self.wfile.write(server.handleLine(text).encode())
+
+        socketPath.unlink(missing_ok=True)
+        with socketserver.ThreadingUnixStreamServer(
+            str(socketPath), Handler
+        ) as unixServer:
+            unixServer.daemon_threads = True
+            self._unixServer = unixServer
+            try:
+                unixServer.serve_forever()
+            finally:
+                self._unixServer = None
+                socketPath.unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        """Stop serving the Unix socket (from another thread)"""
+        if self._unixServer is not None:
+            self._unixServer.shutdown()
+
+    def _dispatch(self, request: Any) -> dict[str, Any]:
+        if not isinstance(request, dict):
+            raise RequestError('A request must be a JSON object')
+
+        options = self._resolveOptions(request.get('options', {}))
+        if 'path' in request:
+            return _handlePath(request['path'], options)
+
+        if 'text' in request:
+            return self._handleText(
+                request['text'], request.get('filename'), options
+            )
+
+        raise RequestError('A request needs a "path" or a "text"')
+
+    def _resolveOptions(self, overrides: Any) -> dict[str, Any]:
+        if not isinstance(overrides, dict):
+            raise RequestError('"options" must be a JSON object')
+
+        unknown = set(overrides) - REQUEST_OPTIONS
+        if unknown:
+            raise RequestError(
+                f'Unknown options: {", ".join(sorted(unknown))}'
+            )
+
+        return {**self.tocOptions, **overrides}
+
+    def _handleText(
+            self,
+            text: Any,
+            filename: Any,
+            options: dict[str, Any],
+    ) -> dict[str, Any]:
+        if not isinstance(text, str):
+            raise RequestError('"text" must be a string')
+
+        options.pop('in_place', None)
+        options.pop('mmap_threshold', None)
+        if filename is None:
+            result = createTocFromString(text, **options)
+        elif not isinstance(filename, str):
+            raise RequestError('"filename" must be a string')
+        else:
+            # The header index of a document is not thread-safe, so each
+            # document's requests are handled one at a time
+            optionsKey = json.dumps(options, sort_keys=True)
+            creator, documentLock = self._getCreator(optionsKey, filename)
+            with documentLock:
+                result = creator.update(text, filename=Path(filename))
+
+        return {
+            'text': result.text,
+            **_describe(result.changed, result.tocEntries, result.headings),
+        }
+
+    def _getCreator(
+            self, optionsKey: str, filename: str
+    ) -> tuple[IncrementalTocCreator, threading.Lock]:
+        with self._lock:
+            creator = self._creators.get(optionsKey)
+            if creator is None:
+                creator = IncrementalTocCreator(**json.loads(optionsKey))
+                self._creators[optionsKey] = creator
+
+            documentLock = self._documentLocks.setdefault(
+                (optionsKey, filename), threading.Lock()
+            )
+
+        return creator, documentLock
+
+
+def _reportFailure(future: Future[None]) -> None:
+    """Print the error of a request that failed to get a response"""
+    error = future.exception()
+    if error is not None:
+        traceback.print_exception(error, file=sys.stderr)
+
+
+def _handlePath(path: Any, options: dict[str, Any]) -> dict[str, Any]:
+    if not isinstance(path, str):
+        raise RequestError('"path" must be a string')
+
+    tocLines = createToc(Path(path), quiet=True, **options)
+    return {
+        'path': path,
+        **_describe(tocLines.changed, tocLines.tocEntries, tocLines.headings),
+    }
+
+
+def _describe(
+        changed: bool,  # noqa: FBT001
+        tocEntries: list[TocEntry],
+        headings: list[Heading],
+) -> dict[str, Any]:
+    return {
+        'changed': changed,
+        'tocLines': [_.render() for _ in tocEntries],
+        'headings': [_._asdict() for _ in buildOutline(headings, tocEntries)],
+    }
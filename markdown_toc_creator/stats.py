@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from contextvars import Token
+    from pathlib import Path
+
+# The phases of processing markdown files, in the order they happen
+PHASES: tuple[str, ...] = (
+    'walk',  # finding the markdown files
+    'cache',  # looking up the cache records (and creating new ones)
+    'read',
+    'scan',  # finding the headings and the ToC placeholders
+    'anchorLinks',  # creating the ToC entries (stripping HTML, slugifying)
+    'deduplicate',
+    'render',  # rendering the ToC block, and comparing it with the old one
+    'write',
+    'fsync',  # flushing the written files to disk (with --fsync)
+    'links',  # checking the links (with --validate-links)
+)
+
+
+@dataclass
+class RunStats:
+    """Cumulative counters and per-phase timers of processing markdown files"""
+
+    numOfFiles: int = 0
+    numOfChangedFiles: int = 0
+    # The files skipped because the cache knows their ToCs to be up to date
+    numOfCachedFiles: int = 0
+    numOfHeadings: int = 0
+    numOfBytesRead: int = 0
+    numOfBytesWritten: int = 0
+    # The hits and misses of the memoized anchor links
+    numOfAnchorLinkHits: int = 0
+    numOfAnchorLinkMisses: int = 0
+    # Phase -> seconds (summed over the files, and over the worker processes)
+    phaseSeconds: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def numOfUnchangedFiles(self) -> int:
+        """The number of files processed but not changed"""
+        return self.numOfFiles - self.numOfChangedFiles - self.numOfCachedFiles
+
+    def addTime(self, phase: str, seconds: float) -> None:
+        """Add time to a phase"""
+        self.phaseSeconds[phase] = self.phaseSeconds.get(phase, 0.0) + seconds
+
+    def merge(self, other: RunStats) -> None:
+        """Add the counters and the timers of other stats to these ones"""
+        for counter in fields(self):
+            if counter.name != 'phaseSeconds':
+                setattr(
+                    self,
+                    counter.name,
+                    getattr(self, counter.name) + getattr(other, counter.name),
+                )
+
+        for phase, seconds in other.phaseSeconds.items():
+            self.addTime(phase, seconds)
+
+    def format(self, wallSeconds: float | None = None) -> str:
+        """Format the stats as a human-readable report"""
+        lines: list[str] = [
+            'Statistics:',
+            (
+                f'  Files:    {self.numOfFiles}'
+                f' ({self.numOfChangedFiles} changed,'
+                f' {self.numOfUnchangedFiles} unchanged,'
+                f' {self.numOfCachedFiles} skipped thanks to the cache)'
+            ),
+            f'  Headings: {self.numOfHeadings}',
+            f'  Read:     {_formatSize(self.numOfBytesRead)}',
+            f'  Written:  {_formatSize(self.numOfBytesWritten)}',
+            (
+                f'  Memoized anchor links: {self.numOfAnchorLinkHits} hits,'
+                f' {self.numOfAnchorLinkMisses} misses'
+            ),
+            '  Time per phase (summed over the files and the workers):',
+        ]
+        otherPhases = sorted(set(self.phaseSeconds) - set(PHASES))
+        for phase in [*PHASES, *otherPhases]:
+            if phase in self.phaseSeconds:
+                milliseconds = self.phaseSeconds[phase] * 1000
+                lines.append(f'    {phase:<12} {milliseconds:10.1f} ms')
+
+        if wallSeconds is not None:
+            lines.append(f'  Wall time: {wallSeconds * 1000:.1f} ms')
+
+        return '\n'.join(lines)
+
+
+class _Scope(NamedTuple):
+    stats: RunStats
+    onFile: Callable[[Path, RunStats], None] | None
+    filename: Path | None  # (only for the scope of a file)
+
+
+# The stats are collected per context: each thread (such as those of the
+# server mode) and each asyncio task has its own stack of scopes, so that the
+# files processed concurrently don't mix their stats up
+_scopes: ContextVar[tuple[_Scope, ...]] = ContextVar('_scopes', default=())
+
+
+def currentStats() -> RunStats | None:
+    """Get the stats being collected in the current context (if any)"""
+    scopes = _scopes.get()
+    return scopes[-1].stats if scopes else None
+
+
+def collectStats(
+        onFile: Callable[[Path, RunStats], None] | None = None,
+) -> _Collection:
+    """
+    Collect the stats of the markdown files processed (in the current thread
+    or asyncio task) within a `with` block. `onFile` is called with the name
+    and the stats of each file once it is processed.
+
+        with collectStats(onFile=callback) as stats:
+            createToc(Path('README.md'))
+    """
+    return _Collection(onFile)
+
+
+def timePhase(phase: str) -> _PhaseTimer | _NullContext:
+    """Time a phase within a `with` block (if stats are being collected)"""
+    stats = currentStats()
+    return _NULL_CONTEXT if stats is None else _PhaseTimer(stats, phase)
+
+
+def trackFile(filename: Path) -> _FileTracker | _NullContext:
+    """
+    Collect the stats of one file within a `with` block (if stats are being
+    collected), and add them to the enclosing stats once done
+    """
+    scopes = _scopes.get()
+    if not scopes or scopes[-1].filename == filename:  # (already tracked)
+        return _NULL_CONTEXT
+
+    return _FileTracker(filename)
+
+
+def iterTimed(
+        iterator: Iterator[Path],
+        stats: RunStats,
+        phase: str,
+) -> Iterator[Path]:
+    """Add the time spent producing each item to a phase of the stats"""
+    while True:
+        with _PhaseTimer(stats, phase):
+            item = next(iterator, None)
+
+        if item is None:
+            return
+
+        yield item
+
+
+class _Collection:
+    def __init__(
+            self, onFile: Callable[[Path, RunStats], None] | None
+    ) -> None:
+        self._scope = _Scope(RunStats(), onFile, None)
+        self._token: Token[tuple[_Scope, ...]] | None = None
+
+    def __enter__(self) -> RunStats:
+        self._token = _scopes.set((*_scopes.get(), self._scope))
+        return self._scope.stats
+
+    def __exit__(self, *excInfo: object) -> None:
+        if self._token is not None:
+            _scopes.reset(self._token)
+
+
+class _FileTracker:
+    def __init__(self, filename: Path) -> None:
+        self._filename = filename
+        self._scope = _Scope(RunStats(numOfFiles=1), None, filename)
+        self._token: Token[tuple[_Scope, ...]] | None = None
+
+    def __enter__(self) -> None:
+        self._token = _scopes.set((*_scopes.get(), self._scope))
+
+    def __exit__(self, *excInfo: object) -> None:
+        if self._token is not None:
+            _scopes.reset(self._token)
+
+        scopes = _scopes.get()
+        stats = self._scope.stats
+        scopes[-1].stats.merge(stats)
+        onFile = next((_.onFile for _ in reversed(scopes) if _.onFile), None)
+        if onFile is not None:
+            onFile(self._filename, stats)
+
+
+class _PhaseTimer:
+    __slots__ = ('_phase', '_start', '_stats')
+
+    def __init__(self, stats: RunStats, phase: str) -> None:
+        self._stats = stats
+        self._phase = phase
+        self._start: float = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *excInfo: object) -> None:
+        self._stats.addTime(self._phase, time.perf_counter() - self._start)
+
+
+class _NullContext:
+    """A do-nothing context manager, used when no stats are collected"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *excInfo: object) -> None:
+        pass
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+def _formatSize(numOfBytes: int) -> str:
+    size: float = numOfBytes
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:  # noqa: PLR2004
+            return f'{size:.1f} {unit}' if unit != 'B' else f'{numOfBytes} B'
+
+        size /= 1024
+
+    return f'{size:.1f} GiB'
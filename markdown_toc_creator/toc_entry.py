@@ -1,51 +1,104 @@
 from __future__ import annotations
 
+import functools
 import re
 import unicodedata
-import warnings
-from collections import defaultdict
 from dataclasses import dataclass
+from string import ascii_letters, digits
+from typing import TYPE_CHECKING, NamedTuple
 
-import bs4
+if TYPE_CHECKING:
+    from collections.abc import Set as AbstractSet
+
+# The max number of entries in each of the memoization caches below. Large
+# documentation sets repeat many headers ("Usage", "Parameters", ...), so
+# their anchor links are computed only once. (The cached values are strings,
+# which are immutable, so de-duplicating anchor links never alters them.)
+MEMO_CACHE_SIZE: int = 8192
+
+# The number of spaces per nesting level of the ToC's bullet points
+INDENT_WIDTH: int = 2
+
+# The whitespace characters of HTML
+ASCII_SPACES: str = ' \n\t\x0c\r'
+
+# The patterns of the anchor link computation, compiled once (instead of being
+# looked up in `re`'s cache on every call)
+_LEADING_POUND_CHARS = re.compile(r'^#+\s')
+_MD_LINK = re.compile(r'\[(.*?)]\(.*?\)')
+_GITLAB_EMOJI = re.compile(r':[\w\d_]+:')
+_DASH_RUNS = re.compile(r'-+')
+_NON_ANCHOR_CHARS = re.compile(r'[^\w\s-]+')
+_DOUBLE_UNDERSCORE_EMPHASIS = re.compile(
+    r'(?<!\w)__(?=\S)(.+?)(?<=\S)__(?!\w)'
+)
+_SINGLE_UNDERSCORE_EMPHASIS = re.compile(r'(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)')
+
+# The ASCII characters that `_isWordChar()` accepts (the others are looked up
+# in the Unicode database, and cached)
+_ASCII_WORD_CHARS: frozenset[str] = frozenset(ascii_letters + digits)
 
 
 class TocEntry:
-    """One entry of the table of contents"""
+    """
+    One entry of the table of contents. `indent` is the entry's nesting
+    depth (0 at the top level), or its indentation (2 spaces per level).
+    """
+
+    # (Large documentation sets have millions of entries, so they have no
+    # per-instance `__dict__`, and their indentation is rendered on demand)
+    __slots__ = ('anchorLinkText', 'depth', 'displayText', 'style')
 
     def __init__(
             self,
             displayText: str,
-            indent: str,
+            indent: str | int,
             style: str,
+            *,
+            anchorLinkText: str | None = None,
     ) -> None:
         self.displayText = displayText
-        self.indent = indent
+        self.depth: int = (
+            indent if isinstance(indent, int) else len(indent) // INDENT_WIDTH
+        )
         self.style = style
-        self.anchorLinkText: str = self._calcAnchorLinkText()
+        # (A known anchor link, such as from a previous run, is not computed)
+        self.anchorLinkText: str = (
+            self._calcAnchorLinkText()
+            if anchorLinkText is None
+            else anchorLinkText
+        )
+
+    @property
+    def indent(self) -> str:
+        """The indentation of the entry's bullet point"""
+        return ' ' * (INDENT_WIDTH * self.depth)
+
+    @indent.setter
+    def indent(self, indent: str) -> None:
+        self.depth = len(indent) // INDENT_WIDTH
+
+    @property
+    def linkText(self) -> str:
+        """The text of the entry's link (without markdown links)"""
+        return self.mdLinkToText(self.removePoundChar(self.displayText))
 
     def render(self) -> str:
         """Render the current entry as a bullet point"""
-        text = self.removePoundChar(self.displayText)
-        text = self.mdLinkToText(text)
-        return self.indent + f'- [{text}]({self.anchorLinkText})'
+        return self.indent + f'- [{self.linkText}]({self.anchorLinkText})'
 
     def _calcAnchorLinkText(self) -> str:
         text = self.removePoundChar(self.displayText)
-
-        # remove HTML tags
-        with warnings.catch_warnings():
-            warnings.filterwarnings(
-                action='ignore', category=bs4.MarkupResemblesLocatorWarning
-            )
-            soup = bs4.BeautifulSoup(text, 'html.parser')
-            text = soup.get_text()
-
+        text = stripHtmlTags(text)
         return self.convertToAnchorLink(text=text, style=self.style)
 
     @classmethod
     def removePoundChar(cls, string: str) -> str:
         """Remove '#' characters from the start of the header"""
-        return re.sub(r'^#+\s', '', string)
+        if not string.startswith('#'):
+            return string
+
+        return _LEADING_POUND_CHARS.sub('', string)
 
     @classmethod
     def mdLinkToText(cls, string: str) -> str:
@@ -53,7 +106,10 @@ class TocEntry:
         Replace markdown links with their display text. E.g., [my
         site](mysite.com) -> my site
         """
-        return re.sub(r'\[(.*?)]\(.*?\)', '\\1', string)
+        if '](' not in string:  # (fast path: no link)
+            return string
+
+        return _MD_LINK.sub(r'\1', string)
 
     @classmethod
     def convertToAnchorLink(
@@ -61,91 +117,164 @@ class TocEntry:
             text: str,
             style: str,
     ) -> str:
-        """Convert the given text to a markdown anchor link"""
-        if style == 'gitlab':
-            # remove emojis represented as :emoji_name:
-            text = re.sub(r':[\w\d_]+:', '', text)
+        """
+        Convert the given text to a markdown anchor link. The results are
+        memoized (see `getMemoCacheStats()`).
+        """
+        return _convertToAnchorLink(text, style)
+
+
+class MemoCacheStats(NamedTuple):
+    """Statistics of a memoization cache"""
+
+    hits: int
+    misses: int
+    maxSize: int | None
+    currentSize: int
+
+
+def getMemoCacheStats() -> dict[str, MemoCacheStats]:
+    """Get the hit/miss statistics of the memoized anchor link computations"""
+    return {
+        'stripHtmlTags': MemoCacheStats(*stripHtmlTags.cache_info()),
+        'convertToAnchorLink': MemoCacheStats(
+            *_convertToAnchorLink.cache_info()
+        ),
+    }
+
 
-        text = text.lower()
-        text = cls.mdLinkToText(text)
+def clearMemoCaches() -> None:
+    """Clear the memoized anchor link computations"""
+    stripHtmlTags.cache_clear()
+    _convertToAnchorLink.cache_clear()
+
+
+@functools.lru_cache(maxsize=MEMO_CACHE_SIZE)
+def _convertToAnchorLink(text: str, style: str) -> str:
+    if style == 'gitlab':
+        # remove emojis represented as :emoji_name:
+        text = _GITLAB_EMOJI.sub('', text)
+
+    text = text.lower()
+    text = TocEntry.mdLinkToText(text)
+    if '_' in text:  # (fast path: no emphasis)
         text = _strip_markdown_underscore_emphasis(text)
 
-        listOfCharGroups: list[_CharGroup] = _buildListOfCharGroups(text)
-        anchorLink: str = _constructAnchorLink(listOfCharGroups)
+    listOfCharGroups: list[_CharGroup] = _buildListOfCharGroups(text)
+    anchorLink: str = _constructAnchorLink(listOfCharGroups)
 
-        if style == 'gitlab':
-            anchorLink = re.sub(r'-+', '-', anchorLink)
+    if style == 'gitlab':
+        anchorLink = _DASH_RUNS.sub('-', anchorLink)
 
-        # check last character
-        anchorLink = anchorLink[:-1] if anchorLink[-1] == '-' else anchorLink
+    # check last character
+    anchorLink = anchorLink[:-1] if anchorLink[-1] == '-' else anchorLink
 
-        # prepend '#' to create a URL anchor
-        return '#' + anchorLink
+    # prepend '#' to create a URL anchor
+    return '#' + anchorLink
 
 
-def deduplicateAnchorLinkText(tocEntries: list[TocEntry]) -> None:
-    """Duplicate the text in the anchor link, for each ToC entry"""
-    allAnchorLinkTexts: list[str] = [_.anchorLinkText for _ in tocEntries]
+@functools.lru_cache(maxsize=MEMO_CACHE_SIZE)
+def stripHtmlTags(text: str) -> str:
+    """
+    Remove HTML tags (and decode character references) from the text, with
+    the same result as BeautifulSoup's `get_text()`.
+    """
+    if '<' not in text and '&' not in text and text.strip(ASCII_SPACES):
+        return text  # fast path: nothing to parse
 
-    seen: set[str] = set()
-    duplicated: set[str] = set()
+    # Most headers contain no HTML, so the parser is only imported if needed
+    from markdown_toc_creator.html_text import (  # noqa: PLC0415
+        HtmlTextExtractor,
+    )
 
-    for text in allAnchorLinkTexts:
-        if text not in seen:
-            seen.add(text)
-        else:
-            duplicated.add(text)
+    parser = HtmlTextExtractor()
+    parser.feed(text)
+    parser.close()
+    return parser.getText()
 
-    if len(duplicated) == 0:
-        return
 
-    counter: defaultdict[str, int] = defaultdict(int)
+class AnchorLinkDeduplicator:
+    """
+    Make the anchor links of one document unique, in a single pass and in
+    the order of the headers, the way the hosting platform does:
 
-    which_occurrence_to_start_fixing_anchor_link: int = 2
+    - "github": the n-th repetition of "#foo" becomes "#foo-n", skipping the
+      suffixes already taken (e.g., by a header "Foo 1"), like GitHub's
+      github-slugger
+    - "gitlab": the n-th repetition of "#foo" becomes "#foo-n", even if that
+      collides with another header's anchor link, like GitLab does
 
-    for entry in tocEntries:
-        if entry.anchorLinkText in duplicated:
-            counter[entry.anchorLinkText] += 1
-            count: int = counter[entry.anchorLinkText]
-            if count >= which_occurrence_to_start_fixing_anchor_link:
-                entry.anchorLinkText += f'-{count - 1}'
+    The anchor links handed out so far are in `anchorLinks` (e.g., so that
+    link checkers can look them up).
+    """
 
+    __slots__ = ('_counts', '_issued', 'style')
 
-@dataclass
-class _CharGroup:
-    chars: list[str]
-    insideBacktickPairs: bool
+    def __init__(self, style: str = 'github') -> None:
+        self.style = style
+        # Anchor link -> the number of its repetitions so far
+        self._counts: dict[str, int] = {}
+        # The handed-out anchor links (only with the "gitlab" style: with the
+        # "github" style, they are all keys of `_counts`)
+        self._issued: set[str] = set()
+
+    @property
+    def anchorLinks(self) -> AbstractSet[str]:
+        """The (unique) anchor links handed out so far"""
+        return self._issued if self.style == 'gitlab' else self._counts.keys()
+
+    def deduplicate(self, anchorLink: str) -> str:
+        """Get the unique anchor link of the next header"""
+        counts = self._counts
+        count: int | None = counts.get(anchorLink)
+        if self.style == 'gitlab':
+            counts[anchorLink] = 1 if count is None else count + 1
+            unique = anchorLink if count is None else f'{anchorLink}-{count}'
+            self._issued.add(unique)
+            return unique
+
+        if count is None:
+            counts[anchorLink] = 0
+            return anchorLink
+
+        unique = anchorLink
+        while unique in counts:
+            count += 1
+            unique = f'{anchorLink}-{count}'
+
+        counts[anchorLink] = count
+        counts[unique] = 0
+        return unique
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, _CharGroup):
-            return False
 
-        return (
-            self.chars == other.chars
-            and self.insideBacktickPairs == other.insideBacktickPairs
-        )
+def deduplicateAnchorLinkText(tocEntries: list[TocEntry]) -> None:
+    """
+    De-duplicate the anchor links of the ToC entries (of one document), in
+    place. See `AnchorLinkDeduplicator`.
+    """
+    if not tocEntries:
+        return
 
-    def __hash__(self) -> int:
-        return hash((tuple(self.chars), self.insideBacktickPairs))
+    deduplicator = AnchorLinkDeduplicator(tocEntries[0].style)
+    for entry in tocEntries:
+        entry.anchorLinkText = deduplicator.deduplicate(entry.anchorLinkText)
 
-    def reduceToOnlyOneLeadingNonAlphaNumericChars(self) -> None:
-        """Reduce to only 1 leading non-alphanumeric characters"""
-        flag: bool = False
-        leadingNonAlphaNumericChars: list[str] = []
-        otherChars: list[str] = []
 
-        for i, char in enumerate(self.chars):
-            if flag:
-                break
+@dataclass(slots=True)
+class _CharGroup:
+    text: str  # (a slice of the header, not a list of characters)
+    insideBacktickPairs: bool
 
+    def reduceToOnlyOneLeadingNonAlphaNumericChars(self) -> None:
+        """Reduce to only 1 leading non-alphanumeric characters"""
+        for i, char in enumerate(self.text):
             if _isWordChar(char):
-                flag = True
-                otherChars.extend(self.chars[i:])
-                continue
+                if i > 1:
+                    self.text = self.text[i - 1 :]
 
-            leadingNonAlphaNumericChars.append(char)
+                return
 
-        self.chars = leadingNonAlphaNumericChars[-1:] + otherChars
+        self.text = self.text[-1:]  # (no word character at all)
 
 
 def _isWordChar(char: str) -> bool:
@@ -153,33 +282,38 @@ def _isWordChar(char: str) -> bool:
     Check if a char is a word character (alphanumeric, emoji, characters of
     other languages).
     """
-    if char.isalnum():
-        return True
+    if char < '\x80':
+        return char in _ASCII_WORD_CHARS
+
+    return _isNonAsciiWordChar(char)
 
-    if unicodedata.category(char) == 'So':  # "Symbol, other", i.e., emoji
+
+@functools.lru_cache(maxsize=MEMO_CACHE_SIZE)
+def _isNonAsciiWordChar(char: str) -> bool:
+    if char.isalnum():
         return True
 
-    return unicodedata.category(char).startswith('L')  # letters of any script
+    category: str = unicodedata.category(char)
+    # "Symbol, other" (i.e., emoji), or letters of any script
+    return category == 'So' or category.startswith('L')
 
 
 def _buildListOfCharGroups(string: str) -> list[_CharGroup]:
-    result: list[_CharGroup]
-    if string[0] == '`':
-        result = [_CharGroup(chars=[], insideBacktickPairs=True)]
-    else:
-        result = [_CharGroup(chars=[string[0]], insideBacktickPairs=False)]
-
-    isWithinBacktickPair: bool = False
-    for char in string[1:]:
-        if char == '`':
-            isWithinBacktickPair = not isWithinBacktickPair
-            result.append(
-                _CharGroup(chars=[], insideBacktickPairs=isWithinBacktickPair)
-            )
-        else:
-            result[-1].chars.append(char)
-
-    if result[-1].chars == []:
+    # A leading backtick opens the first group, but does not toggle the state
+    # of the following backticks
+    startsWithBacktick: bool = string[0] == '`'
+    parts: list[str] = (string[1:] if startsWithBacktick else string).split(
+        '`'
+    )
+    result: list[_CharGroup] = [
+        _CharGroup(
+            text=part,
+            insideBacktickPairs=i % 2 == 1 or (i == 0 and startsWithBacktick),
+        )
+        for i, part in enumerate(parts)
+    ]
+
+    if result[-1].text == '':
         return result[:-1]
 
     return result
@@ -192,37 +326,26 @@ def _constructAnchorLink(listOfCharGroups: list[_CharGroup]) -> str:
             # This is fine for both GitHub and Gitlab styles
             charGroup.reduceToOnlyOneLeadingNonAlphaNumericChars()
 
-            # We put `strip()` before replacing " " to "-" to prevent
-            # double dashes
-            temp.append(''.join(charGroup.chars).strip().replace(' ', '-'))
-        else:
-            temp.append(''.join(charGroup.chars).strip().replace(' ', '-'))
+        # We put `strip()` before replacing " " to "-" to prevent double
+        # dashes
+        temp.append(charGroup.text.strip().replace(' ', '-'))
 
-    return re.sub(
-        r'[^\w\s-]+',
-        '',
-        '-'.join(temp),
-    )
+    return _NON_ANCHOR_CHARS.sub('', '-'.join(temp))
 
 
 def _strip_markdown_underscore_emphasis(text: str) -> str:
     """Remove underscore emphasis markers while keeping literal underscores."""
-
-    def _strip(pattern: re.Pattern[str], source: str) -> str:
-        previous = None
-        result = source
-        while previous != result:
-            previous = result
-            result = pattern.sub(r'\1', result)
-
-        return result
-
     # Remove double underscores first to handle bold markers, then single.
-    patterns = [
-        re.compile(r'(?<!\w)__(?=\S)(.+?)(?<=\S)__(?!\w)'),
-        re.compile(r'(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)'),
-    ]
-    for pattern in patterns:
-        text = _strip(pattern, text)
+    # Removing markers can create new matches (e.g., "___._" -> "_._" -> "."),
+    # so each pattern is applied until it no longer matches, but only while
+    # enough underscores are left for another match.
+    for pattern, numOfMarkers in (
+        (_DOUBLE_UNDERSCORE_EMPHASIS, 4),
+        (_SINGLE_UNDERSCORE_EMPHASIS, 2),
+    ):
+        while text.count('_') >= numOfMarkers:
+            text, numOfMatches = pattern.subn(r'\1', text)
+            if numOfMatches == 0:
+                break
 
     return text
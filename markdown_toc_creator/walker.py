@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+# The same extensions as the `files` pattern in `.pre-commit-hooks.yaml`
+MARKDOWN_EXTENSIONS: tuple[str, ...] = ('.md', '.mdown', '.markdown')
+
+GITIGNORE_FILENAME: str = '.gitignore'
+
+
+class _GitignoreRule(NamedTuple):
+    pattern: re.Pattern[str]
+    negated: bool
+    dirOnly: bool
+
+
+class GitignoreRules:
+    """
+    The rules of one `.gitignore` file, which apply to the paths under the
+    directory that contains it. Most of the gitignore syntax is supported:
+    comments, negation (`!`), directory-only rules (trailing `/`), anchored
+    rules (with a `/` other than a trailing one), and the `*`, `?`, `[...]`
+    and `**` wildcards.
+    """
+
+    def __init__(self, baseDir: str, lines: list[str]) -> None:
+        # An absolute POSIX path, without a trailing slash
+        self.baseDir = baseDir.rstrip('/')
+        self.rules: list[_GitignoreRule] = [
+            rule
+            for line in lines
+            if (rule := _parseGitignoreLine(line)) is not None
+        ]
+
+    @classmethod
+    def fromDirectory(cls, directory: Path) -> GitignoreRules | None:
+        """Load the `.gitignore` of the directory, if there is one"""
+        try:
+            text = (directory / GITIGNORE_FILENAME).read_text(
+                encoding='utf-8', errors='replace'
+            )
+        except OSError:
+            return None
+
+        rules = cls(Path(directory.resolve()).as_posix(), text.splitlines())
+        return rules if rules.rules else None
+
+    def match(self, absolutePath: str, *, isDir: bool) -> bool | None:
+        """
+        Return True if the path is ignored by these rules, False if it is
+        explicitly re-included (by a negated rule), or None if no rule applies.
+        """
+        if not absolutePath.startswith(self.baseDir + '/'):
+            return None
+
+        relativePath = absolutePath[len(self.baseDir) + 1 :]
+        result: bool | None = None
+        for rule in self.rules:
+            if rule.dirOnly and not isDir:
+                continue
+
+            if rule.pattern.fullmatch(relativePath):
+                result = not rule.negated
+
+        return result
+
+
+def iterMarkdownFiles(
+        root: Path,
+        *,
+        excludePattern: re.Pattern[str] | None = None,
+        respectGitignore: bool = False,
+) -> Iterator[Path]:
+    """
+    Yield the markdown files under `root`, in the same order as
+    `sorted(root.rglob(...))`. Directories whose paths match `excludePattern`
+    (or that are ignored by `.gitignore` files, if `respectGitignore` is True)
+    are not walked at all. Like `rglob()`, symlinks to directories are not
+    followed.
+    """
+    if excludePattern is not None and excludePattern.search(root.as_posix()):
+        return
+
+    yield from _walk(
+        root,
+        root.resolve().as_posix(),
+        excludePattern=excludePattern,
+        respectGitignore=respectGitignore,
+        gitignoreStack=_loadParentGitignores(root) if respectGitignore else [],
+        foldersOnly=False,
+    )
+
+
+def iterFolders(
+        root: Path,
+        *,
+        excludePattern: re.Pattern[str] | None = None,
+        respectGitignore: bool = False,
+) -> Iterator[Path]:
+    """
+    Yield `root` and the folders under it that `iterMarkdownFiles()` walks
+    (i.e., except for the excluded or ignored ones)
+    """
+    if excludePattern is not None and excludePattern.search(root.as_posix()):
+        return
+
+    yield root
+    yield from _walk(
+        root,
+        root.resolve().as_posix(),
+        excludePattern=excludePattern,
+        respectGitignore=respectGitignore,
+        gitignoreStack=_loadParentGitignores(root) if respectGitignore else [],
+        foldersOnly=True,
+    )
+
+
+def iterMarkdownPaths(
+        paths: Iterable[str | Path],
+        *,
+        excludePattern: re.Pattern[str],
+        respectGitignore: bool = False,
+) -> Iterator[Path]:
+    """
+    Yield the files among `paths` that don't match `excludePattern`, and the
+    markdown files under the folders among `paths`
+    """
+    for path_ in paths:
+        path = Path(path_)
+        if path.is_file():
+            if not excludePattern.search(path.as_posix()):
+                yield path
+        elif path.is_dir():
+            yield from iterMarkdownFiles(
+                path,
+                excludePattern=excludePattern,
+                respectGitignore=respectGitignore,
+            )
+
+
+def isIgnoredByGitignore(filename: Path) -> bool:
+    """
+    Check whether a file is ignored by the `.gitignore` files of its folder
+    and of the parent folders (up to the root of its git repository). The
+    folders themselves are assumed not to be ignored.
+    """
+    gitignoreStack = _loadParentGitignores(filename)
+    return bool(gitignoreStack) and _isIgnored(
+        gitignoreStack, filename.resolve().as_posix(), isDir=False
+    )
+
+
+def _walk(
+        directory: Path,
+        absoluteDir: str,
+        *,
+        excludePattern: re.Pattern[str] | None,
+        respectGitignore: bool,
+        gitignoreStack: list[GitignoreRules],
+        foldersOnly: bool,
+) -> Iterator[Path]:
+    try:
+        with os.scandir(directory) as scanner:
+            # Sorting each directory's entries by name yields the same order
+            # as sorting the full paths, without holding all of them at once
+            entries = sorted(scanner, key=lambda _: os.path.normcase(_.name))
+    except OSError:
+        return
+
+    rules = (
+        GitignoreRules.fromDirectory(directory) if respectGitignore else None
+    )
+    if rules is not None:
+        gitignoreStack = [*gitignoreStack, rules]
+
+    for entry in entries:
+        path = directory / entry.name
+        if excludePattern is not None and excludePattern.search(
+            path.as_posix()
+        ):
+            continue
+
+        try:
+            isDir = entry.is_dir() and not entry.is_symlink()
+        except OSError:
+            continue
+
+        absolutePath = f'{absoluteDir}/{entry.name}'
+        if gitignoreStack and _isIgnored(
+            gitignoreStack, absolutePath, isDir=isDir
+        ):
+            continue
+
+        if isDir:
+            if foldersOnly:
+                yield path
+
+            yield from _walk(
+                path,
+                absolutePath,
+                excludePattern=excludePattern,
+                respectGitignore=respectGitignore,
+                gitignoreStack=gitignoreStack,
+                foldersOnly=foldersOnly,
+            )
+        elif (
+            not foldersOnly
+            and entry.name.endswith(MARKDOWN_EXTENSIONS)
+            and entry.is_file()
+        ):
+            yield path
+
+
+def _isIgnored(
+        gitignoreStack: list[GitignoreRules],
+        absolutePath: str,
+        *,
+        isDir: bool,
+) -> bool:
+    # The rules of deeper `.gitignore` files take precedence
+    ignored: bool | None = None
+    for rules in gitignoreStack:
+        result = rules.match(absolutePath, isDir=isDir)
+        if result is not None:
+            ignored = result
+
+    return bool(ignored)
+
+
+def _loadParentGitignores(root: Path) -> list[GitignoreRules]:
+    """
+    Load the `.gitignore` files of the parent directories of `root`, up to
+    the root of its git repository (or of the file system)
+    """
+    stack: list[GitignoreRules] = []
+    for parent in root.resolve().parents:
+        rules = GitignoreRules.fromDirectory(parent)
+        if rules is not None:
+            stack.append(rules)
+
+        if (parent / '.git').exists():
+            break
+
+    return stack[::-1]
+
+
+def _parseGitignoreLine(line: str) -> _GitignoreRule | None:
+    # Trailing spaces are ignored, unless escaped
+    pattern = line.rstrip(' ')
+    if line.endswith('\\ '):
+        pattern += ' '
+
+    if not pattern or pattern.startswith('#'):
+        return None
+
+    negated = pattern.startswith('!')
+    if negated or pattern.startswith(('\\!', '\\#')):
+        pattern = pattern[1:]
+
+    dirOnly = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    if not pattern:
+        return None
+
+    # A pattern with a slash (other than a trailing one) is relative to the
+    # directory of the `.gitignore` file; otherwise, it matches at any level
+    anchored = '/' in pattern
+    regex = _translateGlob(pattern.lstrip('/'))
+    if not anchored:
+        regex = f'(?:.*/)?{regex}'
+
+    return _GitignoreRule(re.compile(regex), negated, dirOnly)
+
+
+def _translateGlob(glob: str) -> str:
+    parts: list[str] = []
+    i = 0
+    while i < len(glob):
+        if glob.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif glob.startswith('/**', i) and i + 3 == len(glob):
+            parts.append('/.*')
+            i += 3
+        elif glob.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif glob[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif glob[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif glob[i] == '[' and (end := glob.find(']', i + 2)) != -1:
+            chars = glob[i + 1 : end]
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+
+            parts.append('[' + chars.replace('\\', '\\\\') + ']')
+            i = end + 1
+        elif glob[i] == '\\' and i + 1 < len(glob):
+            parts.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(glob[i]))
+            i += 1
+
+    return ''.join(parts)
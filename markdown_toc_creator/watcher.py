@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from markdown_toc_creator.walker import (
+    MARKDOWN_EXTENSIONS,
+    isIgnoredByGitignore,
+    iterFolders,
+    iterMarkdownFiles,
+    iterMarkdownPaths,
+)
+
+if TYPE_CHECKING:
+    import re
+    from collections.abc import Iterator
+
+# Editors often save a file in several steps (or save several files at once),
+# so changes are collected until there has been none for this long
+DEFAULT_DEBOUNCE_SECONDS: float = 0.2
+
+# How often the folders are re-walked when inotify is not available
+DEFAULT_POLL_INTERVAL_SECONDS: float = 1.0
+
+# The constants of `<sys/inotify.h>`
+_IN_CLOSE_WRITE: int = 0x00000008
+_IN_MOVED_TO: int = 0x00000080
+_IN_CREATE: int = 0x00000100
+_IN_DELETE_SELF: int = 0x00000400
+_IN_Q_OVERFLOW: int = 0x00004000
+_IN_IGNORED: int = 0x00008000
+_IN_ONLYDIR: int = 0x01000000
+_IN_ISDIR: int = 0x40000000
+_IN_CLOEXEC: int = 0o2000000
+
+_WATCH_MASK: int = (
+    _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE_SELF | _IN_ONLYDIR
+)
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE: int = 64 * 1024
+
+
+class _Signature(NamedTuple):
+    mtimeNs: int
+    size: int
+
+
+class Watcher:
+    """
+    Watch markdown files (and the folders that contain them) for changes,
+    with inotify on Linux, or by polling elsewhere. The same files as the
+    ones found by `iterMarkdownPaths()` are watched, including new ones.
+
+    Each file's last known signature (modification time and size) is kept,
+    and only the files whose signatures differ are reported. After updating
+    the reported files, pass them to `acknowledge()` again, so that the
+    tool's own writes are not reported as changes.
+    """
+
+    def __init__(
+            self,
+            paths: tuple[str, ...] | list[Path],
+            *,
+            excludePattern: re.Pattern[str],
+            respectGitignore: bool = False,
+            debounceSeconds: float = DEFAULT_DEBOUNCE_SECONDS,
+            pollIntervalSeconds: float = DEFAULT_POLL_INTERVAL_SECONDS,
+            usePolling: bool = False,
+    ) -> None:
+        self.paths: list[Path] = [Path(_) for _ in paths]
+        self.excludePattern = excludePattern
+        self.respectGitignore = respectGitignore
+        self.debounceSeconds = debounceSeconds
+        self.pollIntervalSeconds = pollIntervalSeconds
+        self._signatures: dict[Path, _Signature] = {}
+        self.acknowledge(self._listFiles())
+
+        self._inotify: _Inotify | None = None
+        if not usePolling and sys.platform.startswith('linux'):
+            try:
+                self._inotify = _Inotify()
+                self._watchFolders()
+            except OSError:  # such as too many watches: poll instead
+                self.close()
+
+    @property
+    def backend(self) -> str:
+        """The name of the mechanism used to detect changes"""
+        return 'polling' if self._inotify is None else 'inotify'
+
+    @property
+    def numOfWatchedFiles(self) -> int:
+        """The number of markdown files currently watched"""
+        return len(self._signatures)
+
+    def close(self) -> None:
+        """Stop watching"""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def iterChanges(self) -> Iterator[list[Path]]:
+        """
+        Yield the changed files, batch by batch, forever. Each batch is
+        acknowledged when the next one is requested.
+        """
+        while True:
+            batch = self.waitForChanges()
+            yield batch
+            self.acknowledge(batch)
+
+    def waitForChanges(self, timeout: float | None = None) -> list[Path]:
+        """
+        Wait for files to change, and return them once no more changes come
+        within the debounce period. Returns an empty list if nothing changed
+        within `timeout` seconds (or waits forever if `timeout` is None).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed: dict[Path, None] = {}  # (an ordered set)
+        while True:
+            if changed:
+                waitSeconds: float | None = self.debounceSeconds
+            elif deadline is None:
+                waitSeconds = None
+            else:
+                waitSeconds = max(0.0, deadline - time.monotonic())
+
+            candidates = self._waitForCandidates(waitSeconds)
+            newlyChanged = [
+                _
+                for _ in candidates
+                if _ not in changed and self._hasChanged(_)
+            ]
+            if newlyChanged:
+                changed.update(dict.fromkeys(newlyChanged))
+            elif changed or (
+                deadline is not None and time.monotonic() >= deadline
+            ):
+                # (So that they are only reported again if changed again)
+                self.acknowledge(list(changed))
+                return list(changed)
+
+    def acknowledge(self, filenames: list[Path] | Iterator[Path]) -> None:
+        """Record the current signatures of the files (as being up to date)"""
+        for filename in filenames:
+            signature = _getSignature(filename)
+            if signature is None:
+                self._signatures.pop(filename, None)
+            else:
+                self._signatures[filename] = signature
+
+    def _listFiles(self) -> Iterator[Path]:
+        return iterMarkdownPaths(
+            self.paths,
+            excludePattern=self.excludePattern,
+            respectGitignore=self.respectGitignore,
+        )
+
+    def _hasChanged(self, filename: Path) -> bool:
+        signature = _getSignature(filename)
+        if signature is None:  # deleted (or not a file)
+            self._signatures.pop(filename, None)
+            return False
+
+        return self._signatures.get(filename) != signature
+
+    def _waitForCandidates(self, timeout: float | None) -> list[Path]:
+        """Wait for the files that may have changed"""
+        if self._inotify is None:
+            interval = self.pollIntervalSeconds
+            time.sleep(interval if timeout is None else min(interval, timeout))
+            return list(self._listFiles())
+
+        events = self._inotify.read(timeout)
+        if events is None:  # the kernel's event queue overflowed
+            self._watchFolders()
+            return list(self._listFiles())
+
+        candidates: list[Path] = []
+        for folder, name, mask in events:
+            path = folder / name
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    candidates.extend(self._watchNewFolder(path))
+            elif name.endswith(MARKDOWN_EXTENSIONS) and self._isWatched(path):
+                candidates.append(path)
+
+        return candidates
+
+    def _watchFolders(self) -> None:
+        assert self._inotify is not None
+        for path in self.paths:
+            if path.is_dir():
+                for folder in iterFolders(
+                    path,
+                    excludePattern=self.excludePattern,
+                    respectGitignore=self.respectGitignore,
+                ):
+                    self._inotify.addWatch(folder, walked=True)
+            elif path.is_file() and self._isWatched(path):
+                self._inotify.addWatch(path.parent, walked=False)
+
+    def _watchNewFolder(self, folder: Path) -> list[Path]:
+        """Watch a folder created in a watched folder, and list its files"""
+        assert self._inotify is not None
+        if not self._inotify.isWalked(folder.parent):
+            return []
+
+        for subfolder in iterFolders(
+            folder,
+            excludePattern=self.excludePattern,
+            respectGitignore=self.respectGitignore,
+        ):
+            self._inotify.addWatch(subfolder, walked=True)
+
+        # (Files may have been created before the folder was watched)
+        return list(
+            iterMarkdownFiles(
+                folder,
+                excludePattern=self.excludePattern,
+                respectGitignore=self.respectGitignore,
+            )
+        )
+
+    def _isWatched(self, filename: Path) -> bool:
+        if self.excludePattern.search(filename.as_posix()):
+            return False
+
+        if filename in self.paths:
+            return True
+
+        if self._inotify is None or not self._inotify.isWalked(
+            filename.parent
+        ):
+            return False
+
+        return not (self.respectGitignore and isIgnoredByGitignore(filename))
+
+
+def _getSignature(filename: Path) -> _Signature | None:
+    try:
+        stat = filename.stat()
+    except OSError:
+        return None
+
+    return _Signature(stat.st_mtime_ns, stat.st_size)
+
+
+class _Inotify:
+    """A minimal binding of Linux's inotify API (via ctypes)"""
+
+    def __init__(self) -> None:
+        import ctypes  # noqa: PLC0415 (only imported in the watch mode)
+        import ctypes.util  # noqa: PLC0415
+
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True
+        )
+        self._getErrno = ctypes.get_errno
+        self.fd: int = self._libc.inotify_init1(_IN_CLOEXEC)
+        if self.fd < 0:
+            self._raiseOSError('inotify_init1')
+
+        # The watch descriptors, and their folders (and whether the folders
+        # are walked, as opposed to only containing explicitly passed files)
+        self._folders: dict[int, tuple[Path, bool]] = {}
+        self._walkedFolders: set[Path] = set()
+
+    def close(self) -> None:
+        """Release the inotify instance (and all of its watches)"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def addWatch(self, folder: Path, *, walked: bool) -> None:
+        """Watch a folder (watching it again is harmless)"""
+        wd: int = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(folder), _WATCH_MASK
+        )
+        if wd < 0:
+            self._raiseOSError(f'inotify_add_watch({folder})')
+
+        walked = walked or self._folders.get(wd, (folder, False))[1]
+        self._folders[wd] = (folder, walked)
+        if walked:
+            self._walkedFolders.add(folder)
+
+    def isWalked(self, folder: Path) -> bool:
+        """Check whether all of the markdown files in a folder are watched"""
+        return folder in self._walkedFolders
+
+    def read(
+            self, timeout: float | None
+    ) -> list[tuple[Path, str, int]] | None:
+        """
+        Wait for events, and return their (folder, name, mask). Returns None
+        if some events were lost.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        data = os.read(self.fd, _READ_SIZE)
+        events: list[tuple[Path, str, int]] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, nameLength = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(
+                data[offset : offset + nameLength].rstrip(b'\0')
+            )
+            offset += nameLength
+            if mask & _IN_Q_OVERFLOW:
+                return None
+
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF):
+                watched = self._folders.pop(wd, None)
+                if watched is not None:
+                    self._walkedFolders.discard(watched[0])
+            elif wd in self._folders:
+                events.append((self._folders[wd][0], name, mask))
+
+        return events
+
+    def _raiseOSError(self, functionName: str) -> None:
+        errno = self._getErrno()
+        raise OSError(errno, f'{functionName}: {os.strerror(errno)}')
@@ -0,0 +1,151 @@
+"""
+Rewrite markdown files atomically: the new content is written into a
+temporary file in the same folder (with the permissions of the original
+file), which is then renamed over the original. Readers, and a run that is
+interrupted (by a crash or Ctrl+C), only ever see the old or the new content.
+Symlinks are resolved first, so that the file they point to is rewritten
+(rather than the link being replaced by a regular file).
+
+Flushing to disk is optional, and can be batched with `FsyncBatch`.
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+def writeAtomically(
+        filename: Path,
+        chunks: Iterable[bytes | memoryview],
+        *,
+        fsync: bool = False,
+) -> None:
+    """
+    Replace the content of a file with the chunks, atomically. If `fsync` is
+    True, the file (and the rename) are flushed to disk before returning.
+    """
+    tempFile = writeTempFile(filename, chunks, fsync=fsync)
+    replaceFile(tempFile, filename, fsync=fsync)
+
+
+def writeTempFile(
+        filename: Path,
+        chunks: Iterable[bytes | memoryview],
+        *,
+        fsync: bool = False,
+) -> Path:
+    """
+    Write the chunks into a new temporary file next to `filename` (or next to
+    the file it links to), with the same permissions as `filename`, and
+    return the temporary file's path. It should then be moved over `filename`
+    with `replaceFile()`.
+    """
+    # (Imported here, because it's slow to import and only needed to write)
+    import tempfile  # noqa: PLC0415
+
+    filename = _resolveSymlinks(filename)
+    fd, tempName = tempfile.mkstemp(
+        dir=filename.parent, prefix=f'.{filename.name}.', suffix='.tmp'
+    )
+    tempFile = Path(tempName)
+    try:
+        _writeChunks(fd, chunks, fsync=fsync)
+        # (`mkstemp()` creates the file with the 0o600 permissions)
+        tempFile.chmod(stat.S_IMODE(filename.stat().st_mode))
+    except BaseException:
+        tempFile.unlink(missing_ok=True)
+        raise
+
+    return tempFile
+
+
+def replaceFile(
+        tempFile: Path, filename: Path, *, fsync: bool = False
+) -> None:
+    """
+    Rename the temporary file over `filename` (or over the file it links to),
+    atomically. If `fsync` is True, the folder is flushed to disk, so that
+    the rename is durable.
+    """
+    filename = _resolveSymlinks(filename)
+    try:
+        Path(tempFile).replace(filename)
+    except BaseException:
+        Path(tempFile).unlink(missing_ok=True)
+        raise
+
+    if fsync:
+        _fsyncFolder(filename.parent)
+
+
+class FsyncBatch:
+    """
+    Flush many rewritten files to disk at once, rather than one by one: `add()`
+    each file once it's written, and `sync()` at the end flushes the files,
+    then each of their folders only once (so that the renames are durable).
+    Until `sync()`, a power loss (but not a crash of this tool) may lose the
+    new contents.
+    """
+
+    def __init__(self) -> None:
+        self._filenames: list[Path] = []
+
+    def __len__(self) -> int:
+        return len(self._filenames)
+
+    def add(self, filename: Path) -> None:
+        """Add a written file, to be flushed by `sync()`"""
+        # (The folder to flush is the one of the file that was replaced)
+        self._filenames.append(_resolveSymlinks(filename))
+
+    def sync(self) -> None:
+        """Flush the added files and their folders to disk"""
+        folders: dict[Path, None] = {}  # (a set, in the order of the files)
+        for filename in self._filenames:
+            _fsyncFile(filename)
+            folders[filename.parent] = None
+
+        for folder in folders:
+            _fsyncFolder(folder)
+
+        self._filenames.clear()
+
+
+def _resolveSymlinks(filename: Path) -> Path:
+    return Path(os.path.realpath(filename))
+
+
+def _writeChunks(
+        fd: int,
+        chunks: Iterable[bytes | memoryview],
+        *,
+        fsync: bool,
+) -> None:
+    with os.fdopen(fd, 'wb') as fp:
+        for chunk in chunks:
+            fp.write(chunk)
+
+        if fsync:
+            fp.flush()
+            os.fsync(fp.fileno())
+
+
+def _fsyncFile(filename: Path) -> None:
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsyncFolder(folder: Path) -> None:
+    # (Folders cannot be opened, and thus not flushed, on Windows)
+    if sys.platform != 'win32':
+        _fsyncFile(folder)
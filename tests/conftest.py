@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from markdown_toc_creator.main import main
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+DOCUMENT: str = '# Title\n\n## Usage\n\n## API\n\n### Usage\n'
+
+
+@pytest.fixture(autouse=True)
+def _cacheInTmpPath(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Point the default `--cache-dir` of the CLI into the test's temporary
+    folder, so that the tests never create a cache in the repository
+    """
+    cacheDir = next(_ for _ in main.params if _.name == 'cache_dir')
+    monkeypatch.setattr(cacheDir, 'default', str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def writeDocuments() -> Callable[[Path, int], list[Path]]:
+    """
+    Get a function that writes `count` small markdown documents into a
+    folder (created if needed), each with 4 headers, the last of which
+    ("## Part {i}") is the document's own
+    """
+
+    def write(folder: Path, count: int) -> list[Path]:
+        folder.mkdir(parents=True, exist_ok=True)
+        filenames = [folder / f'doc{i}.md' for i in range(count)]
+        for i, filename in enumerate(filenames):
+            filename.write_text(
+                DOCUMENT + f'\n## Part {i}\n', encoding='utf-8'
+            )
+
+        return filenames
+
+    return write
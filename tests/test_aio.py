@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+from shutil import copytree
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator import aio
+from markdown_toc_creator.aio import acreateToc, acreateTocs
+from markdown_toc_creator.cache import TocCache
+from markdown_toc_creator.create_toc import createToc
+from markdown_toc_creator.exceptions import HeaderLevelNotContinuousError
+from markdown_toc_creator.main import main
+from markdown_toc_creator.stats import RunStats, collectStats
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+DATA_DIR = Path(__file__).parent / 'test_data'
+FAILURE_MIXED_DATA = DATA_DIR / '2_failures_and_1_success'
+
+
+def testAcreateTocMatchesCreateToc(
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture[str],
+        writeDocuments: Callable[[Path, int], list[Path]],
+) -> None:
+    (syncFile,) = writeDocuments(tmp_path / 'sync', 1)
+    (asyncFile,) = writeDocuments(tmp_path / 'async', 1)
+
+    expected = createToc(syncFile, diff=True)
+    expectedOutput = capsys.readouterr().out
+    tocLines = asyncio.run(acreateToc(asyncFile, diff=True))
+    output = capsys.readouterr().out
+
+    assert tocLines == expected
+    assert output == expectedOutput.replace(str(syncFile), str(asyncFile))
+    assert asyncFile.read_text(encoding='utf-8') == syncFile.read_text(
+        encoding='utf-8'
+    )
+
+    # (Memory-mapped files are processed too)
+    assert asyncio.run(acreateToc(asyncFile, mmap_threshold=1)) == (
+        createToc(syncFile, mmap_threshold=1)
+    )
+
+
+def testAcreateTocProcessesMappedFilesOffTheEventLoop(
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture[str],
+        monkeypatch: pytest.MonkeyPatch,
+        writeDocuments: Callable[[Path, int], list[Path]],
+) -> None:
+    (syncFile,) = writeDocuments(tmp_path / 'sync', 1)
+    (asyncFile,) = writeDocuments(tmp_path / 'async', 1)
+    threadIds: set[int] = set()
+    createTocInMappedFile = aio._createTocInMappedFile
+
+    def recordingCreateTocInMappedFile(*args: Any, **kwargs: Any) -> Any:
+        threadIds.add(threading.get_ident())
+        return createTocInMappedFile(*args, **kwargs)
+
+    monkeypatch.setattr(
+        aio, '_createTocInMappedFile', recordingCreateTocInMappedFile
+    )
+    expected = createToc(syncFile, diff=True, mmap_threshold=1)
+    expectedOutput = capsys.readouterr().out
+    tocLines = asyncio.run(acreateToc(asyncFile, diff=True, mmap_threshold=1))
+    output = capsys.readouterr().out
+
+    # (The event loop runs in this thread)
+    assert threadIds
+    assert threading.get_ident() not in threadIds
+    assert tocLines == expected
+    assert output == expectedOutput.replace(str(syncFile), str(asyncFile))
+    assert asyncFile.read_text(encoding='utf-8') == syncFile.read_text(
+        encoding='utf-8'
+    )
+
+
+def testAcreateTocsOverlapsFileReads(
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        writeDocuments: Callable[[Path, int], list[Path]],
+) -> None:
+    filenames = writeDocuments(tmp_path, 12)
+    lock = threading.Lock()
+    inFlight: list[int] = [0, 0]  # (current, maximum)
+    readMarkdown = aio._readMarkdown
+
+    def slowReadMarkdown(*args: Any) -> str | None:
+        with lock:
+            inFlight[0] += 1
+            inFlight[1] = max(inFlight)
+
+        time.sleep(0.02)  # (like a slow network share)
+        with lock:
+            inFlight[0] -= 1
+
+        return readMarkdown(*args)
+
+    monkeypatch.setattr(aio, '_readMarkdown', slowReadMarkdown)
+    perFile: list[tuple[Path, RunStats]] = []
+    with collectStats(onFile=lambda *_: perFile.append(_)) as stats:
+        results = asyncio.run(
+            acreateTocs(filenames, concurrency=4, quiet=True)
+        )
+
+    assert inFlight[1] == 4
+    assert [_.tocEntries[-1].displayText for _ in results] == [
+        f'## Part {i}' for i in range(12)
+    ]
+    assert all(_.changed for _ in results)
+
+    # The stats of the files processed concurrently are kept apart
+    assert (stats.numOfFiles, stats.numOfChangedFiles) == (12, 12)
+    assert sorted(_[0] for _ in perFile) == sorted(filenames)
+    assert all(_[1].numOfHeadings == 4 for _ in perFile)
+
+
+def testAcreateTocsRaisesErrors(
+        tmp_path: Path, writeDocuments: Callable[[Path, int], list[Path]]
+) -> None:
+    (filename,) = writeDocuments(tmp_path, 1)
+    broken = tmp_path / 'broken.md'
+    broken.write_text(
+        '# Title\n\n## Usage\n\n#### Too deep\n', encoding='utf-8'
+    )
+
+    with pytest.raises(HeaderLevelNotContinuousError):
+        asyncio.run(acreateTocs([filename, broken], quiet=True))
+
+    with pytest.raises(ValueError, match='at least 1'):
+        asyncio.run(acreateTocs([filename], concurrency=0))
+
+
+@pytest.mark.parametrize('ioConcurrency', ['1', '4'])
+def testCliIoConcurrencyMatchesSerial(
+        tmp_path: Path, ioConcurrency: str
+) -> None:
+    runner = CliRunner()
+    serialDataset = tmp_path / 'serial'
+    asyncDataset = tmp_path / 'async'
+    copytree(FAILURE_MIXED_DATA / 'before', serialDataset)
+    copytree(FAILURE_MIXED_DATA / 'before', asyncDataset)
+
+    serial = runner.invoke(main, [str(serialDataset)])
+    concurrent = runner.invoke(
+        main, ['--io-concurrency', ioConcurrency, str(asyncDataset)]
+    )
+
+    assert concurrent.exit_code == serial.exit_code == 1
+    assert concurrent.output == serial.output.replace(
+        str(serialDataset), str(asyncDataset)
+    )
+    for source in sorted(serialDataset.iterdir()):
+        assert (asyncDataset / source.name).read_text(
+            encoding='utf-8'
+        ) == source.read_text(encoding='utf-8')
+
+
+def testCliIoConcurrencyWithCacheAndStats(
+        tmp_path: Path, writeDocuments: Callable[[Path, int], list[Path]]
+) -> None:
+    writeDocuments(tmp_path / 'docs', 5)
+    arguments = [
+        '-q',
+        '--stats',
+        '--io-concurrency',
+        '3',
+        '--cache-dir',
+        str(tmp_path / 'cache'),
+        str(tmp_path / 'docs'),
+    ]
+    first = CliRunner().invoke(main, arguments)
+    assert first.exit_code == 0
+    assert 'Files:    5 (5 changed, 0 unchanged' in first.output
+    assert 'Headings: 20' in first.output
+
+    second = CliRunner().invoke(main, arguments)
+    assert second.exit_code == 0
+    assert '5 skipped thanks to the cache' in second.output
+
+
+def testCliIoConcurrencyUsesTheCacheOffTheEventLoop(
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        writeDocuments: Callable[[Path, int], list[Path]],
+) -> None:
+    writeDocuments(tmp_path / 'docs', 4)
+    threadIds: dict[str, set[int]] = {'lookup': set(), 'store': set()}
+    lookup, store = TocCache.lookup, TocCache.store
+
+    def recordingLookup(self: TocCache, filename: Path) -> Any:
+        threadIds['lookup'].add(threading.get_ident())
+        return lookup(self, filename)
+
+    def recordingStore(self: TocCache, record: Any) -> None:
+        threadIds['store'].add(threading.get_ident())
+        store(self, record)
+
+    monkeypatch.setattr(TocCache, 'lookup', recordingLookup)
+    monkeypatch.setattr(TocCache, 'store', recordingStore)
+    arguments = [
+        '--io-concurrency',
+        '2',
+        '--cache-dir',
+        str(tmp_path / 'cache'),
+        str(tmp_path / 'docs'),
+    ]
+    first = CliRunner().invoke(main, arguments)
+    second = CliRunner().invoke(main, arguments)
+
+    assert first.exit_code == second.exit_code == 0
+    assert second.output.count('per the cache') == 4
+    # (The event loop runs in this thread)
+    assert threadIds['lookup']
+    assert threadIds['store']
+    assert (
+        threading.get_ident() not in threadIds['lookup'] | threadIds['store']
+    )
+
+
+def testCliIoConcurrencyCannotBeUsedWithJobs(
+        tmp_path: Path, writeDocuments: Callable[[Path, int], list[Path]]
+) -> None:
+    (filename,) = writeDocuments(tmp_path, 1)
+    result = CliRunner().invoke(
+        main, ['--io-concurrency', '4', '--jobs', '2', str(filename)]
+    )
+    assert result.exit_code == 1
+    assert "'--io-concurrency' cannot be used with '--jobs'" in result.output
@@ -0,0 +1,180 @@
+"""
+Property-based tests: the anchor links computed by `toc_entry` must be
+identical to those of the original (unoptimized) implementation below.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+hypothesis = pytest.importorskip('hypothesis')
+st = pytest.importorskip('hypothesis.strategies')
+
+from markdown_toc_creator.toc_entry import (  # noqa: E402
+    TocEntry,
+    _convertToAnchorLink,
+    _isWordChar,
+    _strip_markdown_underscore_emphasis,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# The characters that the anchor link computation treats specially, so that
+# the generated headers exercise its corner cases (and not only letters)
+SPECIAL_CHARS: str = '#_`[]():*- .!?&<>\t\'"'
+MIXED_CHARS: str = SPECIAL_CHARS + 'aZ09éß中文🚀™©́'
+
+headerTexts = st.one_of(
+    st.text(alphabet=MIXED_CHARS, max_size=30),
+    st.text(max_size=30),
+)
+
+
+def _referenceRemovePoundChar(string: str) -> str:
+    return re.sub(r'^#+\s', '', string)
+
+
+def _referenceMdLinkToText(string: str) -> str:
+    return re.sub(r'\[(.*?)]\(.*?\)', '\\1', string)
+
+
+def _referenceIsWordChar(char: str) -> bool:
+    if char.isalnum():
+        return True
+
+    if unicodedata.category(char) == 'So':
+        return True
+
+    return unicodedata.category(char).startswith('L')
+
+
+def _referenceStripEmphasis(text: str) -> str:
+    def _strip(pattern: re.Pattern[str], source: str) -> str:
+        previous = None
+        result = source
+        while previous != result:
+            previous = result
+            result = pattern.sub(r'\1', result)
+
+        return result
+
+    patterns = [
+        re.compile(r'(?<!\w)__(?=\S)(.+?)(?<=\S)__(?!\w)'),
+        re.compile(r'(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)'),
+    ]
+    for pattern in patterns:
+        text = _strip(pattern, text)
+
+    return text
+
+
+def _referenceBuildCharGroups(string: str) -> list[tuple[list[str], bool]]:
+    result: list[tuple[list[str], bool]] = (
+        [([], True)] if string[0] == '`' else [([string[0]], False)]
+    )
+
+    isWithinBacktickPair: bool = False
+    for char in string[1:]:
+        if char == '`':
+            isWithinBacktickPair = not isWithinBacktickPair
+            result.append(([], isWithinBacktickPair))
+        else:
+            result[-1][0].append(char)
+
+    if result[-1][0] == []:
+        return result[:-1]
+
+    return result
+
+
+def _referenceReduceLeadingChars(chars: list[str]) -> list[str]:
+    flag: bool = False
+    leadingNonAlphaNumericChars: list[str] = []
+    otherChars: list[str] = []
+
+    for i, char in enumerate(chars):
+        if flag:
+            break
+
+        if _referenceIsWordChar(char):
+            flag = True
+            otherChars.extend(chars[i:])
+            continue
+
+        leadingNonAlphaNumericChars.append(char)
+
+    return leadingNonAlphaNumericChars[-1:] + otherChars
+
+
+def _referenceConvertToAnchorLink(text: str, style: str) -> str:
+    if style == 'gitlab':
+        text = re.sub(r':[\w\d_]+:', '', text)
+
+    text = text.lower()
+    text = _referenceMdLinkToText(text)
+    text = _referenceStripEmphasis(text)
+
+    temp: list[str] = []
+    for chars, insideBacktickPairs in _referenceBuildCharGroups(text):
+        if not insideBacktickPairs:
+            chars = _referenceReduceLeadingChars(chars)  # noqa: PLW2901
+
+        temp.append(''.join(chars).strip().replace(' ', '-'))
+
+    anchorLink: str = re.sub(r'[^\w\s-]+', '', '-'.join(temp))
+
+    if style == 'gitlab':
+        anchorLink = re.sub(r'-+', '-', anchorLink)
+
+    anchorLink = anchorLink[:-1] if anchorLink[-1] == '-' else anchorLink
+    return '#' + anchorLink
+
+
+def _outcome(function: Callable[..., str], *args: Any) -> str | type:
+    """Call the function, and return its result (or its exception's type)"""
+    try:
+        return function(*args)
+    except Exception as err:  # noqa: BLE001
+        return type(err)
+
+
+@hypothesis.settings(max_examples=500, deadline=None)
+@hypothesis.given(
+    text=headerTexts, style=st.sampled_from(['github', 'gitlab'])
+)
+def testConvertToAnchorLinkMatchesReference(text: str, style: str) -> None:
+    assert _outcome(_convertToAnchorLink.__wrapped__, text, style) == (
+        _outcome(_referenceConvertToAnchorLink, text, style)
+    )
+
+
+@hypothesis.settings(max_examples=500, deadline=None)
+@hypothesis.given(text=st.text(alphabet='_a -é.*`', max_size=20))
+def testStripEmphasisMatchesReference(text: str) -> None:
+    assert _strip_markdown_underscore_emphasis(text) == (
+        _referenceStripEmphasis(text)
+    )
+
+
+@hypothesis.settings(max_examples=500, deadline=None)
+@hypothesis.given(text=headerTexts)
+def testTextHelpersMatchReference(text: str) -> None:
+    assert TocEntry.removePoundChar(text) == _referenceRemovePoundChar(text)
+    assert TocEntry.mdLinkToText(text) == _referenceMdLinkToText(text)
+
+
+@hypothesis.settings(max_examples=1000, deadline=None)
+@hypothesis.given(char=st.characters())
+def testIsWordCharMatchesReference(char: str) -> None:
+    assert _isWordChar(char) == _referenceIsWordChar(char)
+
+
+def testIsWordCharMatchesReferenceForAllAsciiChars() -> None:
+    for codePoint in range(128):
+        char = chr(codePoint)
+        assert _isWordChar(char) == _referenceIsWordChar(char), repr(char)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from benchmarks.corpus import generateCorpus
+from benchmarks.run import Thresholds, compareWithBaseline
+from benchmarks.scanners import measureScannerEngines
+from benchmarks.writes import WRITE_STRATEGIES, measureWriteStrategies
+from markdown_toc_creator.create_toc import createToc
+from markdown_toc_creator.scanner import SCANNER_ENGINES
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def testGenerateCorpusIsDeterministic(tmp_path: Path) -> None:
+    first = generateCorpus(tmp_path / 'first', scale=0.02, seed=1)
+    second = generateCorpus(tmp_path / 'second', scale=0.02, seed=1)
+    assert first == second
+
+    for info in first:
+        for filename in sorted((tmp_path / 'first' / info.name).iterdir()):
+            twin = tmp_path / 'second' / info.name / filename.name
+            assert filename.read_bytes() == twin.read_bytes()
+
+    other = generateCorpus(tmp_path / 'other', scale=0.02, seed=2)
+    assert [_.numOfBytes for _ in other] != [_.numOfBytes for _ in first]
+
+
+def testGeneratedCorpusIsValid(tmp_path: Path) -> None:
+    infos = generateCorpus(tmp_path, scale=0.02)
+    for info in infos:
+        numOfEntries = 0
+        for filename in (tmp_path / info.name).iterdir():
+            numOfEntries += len(createToc(filename, quiet=True))
+
+        assert numOfEntries == info.numOfHeadings
+
+
+def testMeasureWriteStrategies(tmp_path: Path) -> None:
+    generateCorpus(tmp_path / 'corpus', scale=0.01)
+    scenarios = measureWriteStrategies(
+        tmp_path / 'corpus' / 'many_small', tmp_path / 'work', repeat=1
+    )
+    assert list(scenarios) == [f'write/{_}' for _ in WRITE_STRATEGIES]
+    assert all(_['filesPerSec'] > 0 for _ in scenarios.values())
+    assert list((tmp_path / 'work').iterdir()) == []
+
+
+def testMeasureScannerEngines(tmp_path: Path) -> None:
+    infos = generateCorpus(tmp_path, scale=0.01)[:2]
+    scenarios = measureScannerEngines(tmp_path, infos, repeat=1)
+    assert list(scenarios) == [
+        f'scan/{engine}/{info.name}'
+        for info in infos
+        for engine in SCANNER_ENGINES
+    ]
+    assert all(_['filesPerSec'] > 0 for _ in scenarios.values())
+
+
+def testCompareWithBaseline() -> None:
+    baseline = {
+        'scenarios': {
+            'cli/small': {'filesPerSec': 100.0, 'peakRssMiB': 40.0},
+            'import/cli': {'importMs': 100.0},
+        }
+    }
+    results = {
+        'scenarios': {
+            'cli/small': {'filesPerSec': 70.0, 'peakRssMiB': 45.0},
+            'import/cli': {'importMs': 160.0},
+            'cli/new': {'filesPerSec': 1.0},
+        }
+    }
+    regressions = compareWithBaseline(results, baseline, Thresholds())
+    assert len(regressions) == 2
+    assert regressions[0].startswith('cli/small: filesPerSec')
+    assert regressions[1].startswith('import/cli: importMs')
+
+    lenient = Thresholds(maxThroughputDrop=0.5, maxImportTimeGrowth=1)
+    assert compareWithBaseline(results, baseline, lenient) == []
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import itertools
+import os
+import sqlite3
+from pathlib import Path
+from shutil import copyfile
+from typing import TYPE_CHECKING
+
+from click.testing import CliRunner
+
+from markdown_toc_creator.cache import (
+    _CACHE_FORMAT_VERSION,
+    CACHE_DB_NAME,
+    FLUSH_EVERY_N_UPDATES,
+    CacheRecord,
+    TocCache,
+    fingerprintOptions,
+)
+from markdown_toc_creator.main import main
+from markdown_toc_creator.parallel import CACHED_FILE_NOTE
+
+if TYPE_CHECKING:
+    import pytest
+
+THIS_DIR = Path(__file__).parent
+PROACTIVE_DATA = THIS_DIR / 'test_data' / 'proactive'
+
+
+def _numOfEntries(cacheDir: Path) -> int:
+    with sqlite3.connect(cacheDir / CACHE_DB_NAME) as conn:
+        return conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+def testFingerprintOptions(monkeypatch: pytest.MonkeyPatch) -> None:
+    options = {'style': 'github', 'skip_first_n_lines': 1, 'quiet': False}
+    assert fingerprintOptions(options) == fingerprintOptions({
+        **options,
+        'quiet': True,
+    })
+    assert fingerprintOptions(options) != fingerprintOptions({
+        **options,
+        'style': 'gitlab',
+    })
+
+    # (The records of older ToC formats are not trusted)
+    fingerprint = fingerprintOptions(options)
+    monkeypatch.setattr(
+        'markdown_toc_creator.cache._CACHE_FORMAT_VERSION',
+        _CACHE_FORMAT_VERSION + 1,
+    )
+    assert fingerprintOptions(options) != fingerprint
+
+
+def testLookupAndStore(tmp_path: Path) -> None:
+    markdown = tmp_path / 'a.md'
+    markdown.write_text('# Title\n', encoding='utf-8')
+
+    cache = TocCache(tmp_path / 'cache', 'fingerprint')
+    assert cache.lookup(markdown) is None
+
+    cache.store(CacheRecord.fromFile(markdown))
+    cache.flush()
+    assert cache.lookup(markdown) is not None
+
+    otherOptions = TocCache(tmp_path / 'cache', 'other fingerprint')
+    assert otherOptions.lookup(markdown) is None
+
+    # Same content, different modification time: the hash still matches
+    stat = markdown.stat()
+    os.utime(markdown, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.lookup(markdown) is not None
+
+    markdown.write_text('# Changed title\n', encoding='utf-8')
+    assert cache.lookup(markdown) is None
+
+    cache.close()
+    otherOptions.close()
+
+
+def testLeastRecentlyUsedEviction(tmp_path: Path) -> None:
+    cacheDir = tmp_path / 'cache'
+    cache = TocCache(cacheDir, 'fingerprint', maxEntries=2)
+    files: list[Path] = []
+    for i in range(3):
+        markdown = tmp_path / f'{i}.md'
+        markdown.write_text(f'# Title {i}\n', encoding='utf-8')
+        files.append(markdown)
+        cache.store(CacheRecord.fromFile(markdown))
+        cache.flush()
+
+    cache.close()
+    assert _numOfEntries(cacheDir) == 2
+
+    cache = TocCache(cacheDir, 'fingerprint', maxEntries=2)
+    assert cache.lookup(files[0]) is None
+    assert cache.lookup(files[1]) is not None
+    assert cache.lookup(files[2]) is not None
+    cache.close()
+
+
+def testLookupsCountAsUses(
+        tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    clock = itertools.count(1000)
+    monkeypatch.setattr(
+        'markdown_toc_creator.cache.time.time', lambda: float(next(clock))
+    )
+    cacheDir = tmp_path / 'cache'
+    cache = TocCache(cacheDir, 'fingerprint', maxEntries=2)
+    files: list[Path] = []
+    for i in range(2):
+        markdown = tmp_path / f'{i}.md'
+        markdown.write_text(f'# Title {i}\n', encoding='utf-8')
+        files.append(markdown)
+        cache.store(CacheRecord.fromFile(markdown))
+
+    cache.flush()
+    # (The oldest record was used last, so the other one is evicted)
+    assert cache.lookup(files[0]) is not None
+    markdown = tmp_path / '2.md'
+    markdown.write_text('# Title 2\n', encoding='utf-8')
+    cache.store(CacheRecord.fromFile(markdown))
+    cache.close()
+
+    cache = TocCache(cacheDir, 'fingerprint', maxEntries=2)
+    assert cache.lookup(files[0]) is not None
+    assert cache.lookup(files[1]) is None
+    assert cache.lookup(markdown) is not None
+    cache.close()
+
+
+def testReadOnlyCacheNeverWrites(tmp_path: Path) -> None:
+    cacheDir = tmp_path / 'cache'
+    markdown = tmp_path / 'a.md'
+    markdown.write_text('# Title\n', encoding='utf-8')
+    cache = TocCache(cacheDir, 'fingerprint')
+    cache.store(CacheRecord.fromFile(markdown))
+    cache.close()
+    databaseBefore = (cacheDir / CACHE_DB_NAME).read_bytes()
+
+    readOnly = TocCache(cacheDir, 'fingerprint', readOnly=True)
+    for _ in range(FLUSH_EVERY_N_UPDATES):
+        assert readOnly.lookup(markdown) is not None
+
+    readOnly.close()
+    assert (cacheDir / CACHE_DB_NAME).read_bytes() == databaseBefore
+
+
+def _countStores(monkeypatch: pytest.MonkeyPatch) -> list[CacheRecord]:
+    stored: list[CacheRecord] = []
+    store = TocCache.store
+
+    def countingStore(self: TocCache, record: CacheRecord) -> None:
+        stored.append(record)
+        store(self, record)
+
+    monkeypatch.setattr(TocCache, 'store', countingStore)
+    return stored
+
+
+def test_cli_cache_hits_are_refreshed_once(
+        tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    runner = CliRunner()
+    cacheDir = tmp_path / 'cache'
+    dataset = tmp_path / 'docs'
+    dataset.mkdir()
+    for name in ('a.md', 'b.md'):
+        copyfile(
+            PROACTIVE_DATA / 'after' / 'with_heading_default.md',
+            dataset / name,
+        )
+
+    first = runner.invoke(main, ['--cache-dir', str(cacheDir), str(dataset)])
+    assert first.exit_code == 0
+    stored = _countStores(monkeypatch)
+
+    # The hits either count as uses when they're looked up (serially), or
+    # are stored again by the main process (from read-only worker caches)
+    for extraArgs, numOfStores in (
+        ([], 0),
+        (['--io-concurrency', '2'], 0),
+        (['--jobs', '2'], 2),
+    ):
+        stored.clear()
+        result = runner.invoke(
+            main, ['--cache-dir', str(cacheDir), *extraArgs, str(dataset)]
+        )
+        assert result.output.count(CACHED_FILE_NOTE) == 2
+        assert len(stored) == numOfStores
+
+
+def test_cli_skips_cached_files(tmp_path: Path) -> None:
+    runner = CliRunner()
+    cacheDir = tmp_path / 'cache'
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+
+    first = runner.invoke(main, ['--cache-dir', str(cacheDir), str(target)])
+    assert first.exit_code == 0
+    assert str(target) in first.output
+    assert _numOfEntries(cacheDir) == 1
+
+    # (The cached files are still reported, with a note instead of the ToC)
+    for extraArgs in ([], ['--io-concurrency', '2'], ['--jobs', '2']):
+        second = runner.invoke(
+            main, ['--cache-dir', str(cacheDir), *extraArgs, str(target)]
+        )
+        assert second.exit_code == 0
+        assert f'{target}\n\n{CACHED_FILE_NOTE}\n' in second.output
+        assert '- [' not in second.output
+        assert '0 file(s) changed, 1 unchanged' in second.output
+
+    quiet = runner.invoke(
+        main, ['--cache-dir', str(cacheDir), '-q', str(target)]
+    )
+    assert quiet.output == ''
+
+    expected = PROACTIVE_DATA / 'after' / 'with_heading_default.md'
+    assert target.read_text(encoding='utf-8') == expected.read_text(
+        encoding='utf-8'
+    )
+
+
+def test_cli_no_cache(tmp_path: Path) -> None:
+    cacheDir = tmp_path / 'cache'
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+
+    result = CliRunner().invoke(
+        main, ['--no-cache', '--cache-dir', str(cacheDir), str(target)]
+    )
+    assert result.exit_code == 0
+    assert not cacheDir.exists()
+
+
+def test_cli_parallel_jobs_share_cache(tmp_path: Path) -> None:
+    runner = CliRunner()
+    cacheDir = tmp_path / 'cache'
+    dataset = tmp_path / 'docs'
+    dataset.mkdir()
+    for name in ('with_heading.md', 'with_placeholder.md', 'no_heading.md'):
+        copyfile(PROACTIVE_DATA / 'before' / name, dataset / name)
+
+    args = ['--jobs', '2', '--cache-dir', str(cacheDir), str(dataset)]
+    assert runner.invoke(main, args).exit_code == 0
+    assert _numOfEntries(cacheDir) == 3
+
+    second = runner.invoke(main, args)
+    assert second.exit_code == 0
+    assert '0 file(s) changed, 3 unchanged' in second.output
+
+
+def test_cli_check_only_caches_up_to_date_files(tmp_path: Path) -> None:
+    runner = CliRunner()
+    cacheDir = tmp_path / 'cache'
+    dataset = tmp_path / 'docs'
+    dataset.mkdir()
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', dataset / 'a.md')
+    copyfile(
+        PROACTIVE_DATA / 'after' / 'with_heading_default.md', dataset / 'b.md'
+    )
+
+    args = ['--cache-dir', str(cacheDir), str(dataset)]
+    assert runner.invoke(main, ['--check', *args]).exit_code == 1
+    assert _numOfEntries(cacheDir) == 1
+
+    # The cache is shared with the runs that write the files
+    assert runner.invoke(main, args).exit_code == 0
+    assert _numOfEntries(cacheDir) == 2
+    assert runner.invoke(main, ['--check', *args]).exit_code == 0
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from pathlib import Path
+from shutil import copyfile
+
+import pytest
+
+from markdown_toc_creator.create_toc import (
+    createToc,
+    createTocFromLines,
+    createTocFromString,
+)
+from markdown_toc_creator.exceptions import (
+    HeaderLevelNotContinuousError,
+    HeaderLevelOutOfBoundError,
+)
+
+THIS_DIR = Path(__file__).parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+@pytest.mark.parametrize(
+    'source',
+    sorted(DATA_DIR.rglob('*.md')),
+    ids=lambda _: _.relative_to(DATA_DIR).as_posix(),
+)
+def testCreateTocFromStringMatchesCreateToc(
+        tmp_path: Path, source: Path
+) -> None:
+    target = tmp_path / source.name
+    copyfile(source, target)
+    original = source.read_text(encoding='utf-8')
+
+    try:
+        tocLines = createToc(target, quiet=True)
+    except (HeaderLevelNotContinuousError, HeaderLevelOutOfBoundError) as err:
+        with pytest.raises(type(err)):
+            createTocFromString(original)
+
+        return
+
+    result = createTocFromString(original)
+    assert result.text == target.read_text(encoding='utf-8')
+    assert result.tocLines == tocLines
+    assert result.changed == tocLines.changed
+
+
+def testCreateTocFromStringHasNoSideEffects(
+        capsys: pytest.CaptureFixture[str],
+) -> None:
+    text = '# Title\n\n## Section 1\n\n## Section 1\n'
+    result = createTocFromString(
+        text, add_toc_title=False, add_horizontal_rules=False
+    )
+    assert capsys.readouterr().out == ''
+    assert result.changed
+    assert result.text == (
+        '# Title\n\n<!--TOC-->\n\n- [Section 1](#section-1)\n'
+        '- [Section 1](#section-1-1)\n\n<!--TOC-->\n\n'
+        '## Section 1\n\n## Section 1\n'
+    )
+    assert [_.anchorLinkText for _ in result.tocEntries] == [
+        '#section-1',
+        '#section-1-1',
+    ]
+    # (The headings of the new text, below the new ToC)
+    assert [_.lineNumber for _ in result.headings] == [10, 12]
+    assert [_.lineNumber for _ in result.originalHeadings] == [3, 5]
+
+    again = createTocFromString(
+        result.text, add_toc_title=False, add_horizontal_rules=False
+    )
+    assert not again.changed
+    assert again.text == result.text
+
+
+@pytest.mark.parametrize('mmapThreshold', [None, 0])
+@pytest.mark.parametrize(
+    ('inPlace', 'expectedLineNumbers'), [(True, [16, 18]), (False, [3, 5])]
+)
+def testCreateTocHeadingsAreTheOnesOnDisk(
+        tmp_path: Path,
+        mmapThreshold: int | None,
+        inPlace: bool,  # noqa: FBT001
+        expectedLineNumbers: list[int],
+) -> None:
+    target = tmp_path / 'a.md'
+    target.write_text('# Title\n\n## A\n\n## B\n', encoding='utf-8')
+    tocLines = createToc(
+        target, quiet=True, in_place=inPlace, mmap_threshold=mmapThreshold
+    )
+    assert tocLines.changed
+    assert [_.lineNumber for _ in tocLines.headings] == expectedLineNumbers
+    lines = target.read_text(encoding='utf-8').splitlines()
+    assert [lines[_ - 1] for _ in expectedLineNumbers] == ['## A', '## B']
+
+
+def testCreateTocFromStringWithoutToc() -> None:
+    text = 'No headers here\n'
+    result = createTocFromString(text)
+    assert result.text == text
+    assert not result.changed
+    assert result.tocEntries == []
+
+    assert not createTocFromString('# Title\n', proactive=False).changed
+
+
+def testCreateTocFromLines() -> None:
+    lines = ['# Title\n', '\n', '## Section\n']
+    result = createTocFromLines(lines)
+    expected = createTocFromString(''.join(lines))
+    assert result.text == expected.text
+    assert result.tocLines == expected.tocLines
+    assert result.lines[:3] == ['# Title\n', '\n', '<!--TOC-->\n']
+
+
+def testCreateTocFromStringCommonMarkEngine() -> None:
+    text = (
+        'Title\n=====\n\nIntro\n\nUsage\n-----\n\n'
+        '~~~\n## Not a header\n~~~\n\n## API\n'
+    )
+    result = createTocFromString(
+        text, add_horizontal_rules=False, engine='commonmark'
+    )
+    assert result.text.startswith(
+        'Title\n=====\n\n<!--TOC-->\n\n**Table of Contents**\n\n'
+        '- [Usage](#usage)\n- [API](#api)\n\n<!--TOC-->\n\nIntro\n'
+    )
+
+    # (The simple engine doesn't know about setext headers and ~~~ fences)
+    result = createTocFromString(text, add_horizontal_rules=False)
+    assert [_.displayText for _ in result.tocEntries] == [
+        '## Not a header',
+        '## API',
+    ]
+
+
+def testCreateTocFromStringErrorMessage() -> None:
+    text = '# Title\n\n## Section\n\n#### Too deep\n'
+    with pytest.raises(HeaderLevelNotContinuousError, match=r'^<string>:5:'):
+        createTocFromString(text)
+
+    with pytest.raises(HeaderLevelNotContinuousError, match=r'^docs/a\.md:5:'):
+        createTocFromString(text, filename=Path('docs/a.md'))
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import re
+import shutil
+import subprocess  # noqa: S404
+from typing import TYPE_CHECKING
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator import gitdiff
+from markdown_toc_creator.gitdiff import GitError, selectChangedFiles
+from markdown_toc_creator.main import main
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+pytestmark = pytest.mark.skipif(
+    shutil.which('git') is None, reason='git is not installed'
+)
+
+DOCUMENT: str = '# Title\n\n## Usage\n\n## API\n'
+NO_EXCLUDE = re.compile(r'\.git')
+
+
+def _git(repo: Path, *args: str) -> None:
+    subprocess.run(  # noqa: S603
+        ['git', '-C', str(repo), *args],  # noqa: S607
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    """Create a git repository with a few committed markdown files"""
+    repo = tmp_path / 'repo'
+    for name in ('README.md', 'docs/a.md', 'docs/b.md', 'docs/c.md'):
+        (repo / name).parent.mkdir(parents=True, exist_ok=True)
+        (repo / name).write_text(DOCUMENT, encoding='utf-8')
+
+    _git(repo.parent, 'init', '-q', str(repo))
+    _commit(repo, 'Initial commit')
+    return repo
+
+
+def _commit(repo: Path, message: str) -> None:
+    _git(repo, 'add', '-A')
+    _git(
+        repo,
+        '-c',
+        'user.name=Test',
+        '-c',
+        'user.email=test@example.com',
+        'commit',
+        '-q',
+        '-m',
+        message,
+    )
+
+
+def testSelectChangedFiles(repo: Path) -> None:
+    (repo / 'docs' / 'b.md').write_text(DOCUMENT + '\n', encoding='utf-8')
+    (repo / 'README.md').write_text(DOCUMENT + '\n', encoding='utf-8')
+    (repo / 'docs' / 'c.md').unlink()  # (deleted files are left out)
+    (repo / 'docs' / 'notes.txt').write_text('', encoding='utf-8')
+    _git(repo, 'add', '-A')
+    (repo / 'docs' / 'a.md').write_text(DOCUMENT + '\n', encoding='utf-8')
+
+    def select(*paths: Path, **options: object) -> list[Path]:
+        selection = selectChangedFiles(
+            paths, excludePattern=NO_EXCLUDE, **options
+        )
+        assert selection.outsideGit == []
+        return selection.filenames
+
+    docs = repo / 'docs'
+    assert select(docs, since='HEAD') == [docs / 'a.md', docs / 'b.md']
+    assert select(docs, staged=True) == [docs / 'b.md']
+    assert select(repo, since='HEAD', staged=True) == [
+        repo / 'README.md',
+        docs / 'b.md',
+    ]
+    # (Intersected with the paths, and with the exclude pattern)
+    assert select(docs / 'a.md', repo / 'README.md', since='HEAD') == [
+        docs / 'a.md',
+        repo / 'README.md',
+    ]
+    assert selectChangedFiles(
+        [repo], since='HEAD', excludePattern=re.compile(r'docs')
+    ).filenames == [repo / 'README.md']
+
+
+def testSelectChangedFilesSinceTheMergeBase(repo: Path) -> None:
+    docs = repo / 'docs'
+    # The base branch moves on after the branch was created: its changes are
+    # not the branch's
+    _git(repo, 'checkout', '-q', '-b', 'base')
+    (docs / 'c.md').write_text(DOCUMENT + '\n', encoding='utf-8')
+    _commit(repo, 'Change on the base branch')
+    _git(repo, 'checkout', '-q', '-')
+    (docs / 'b.md').write_text(DOCUMENT + '\n', encoding='utf-8')
+    _commit(repo, 'Change on the branch')
+    # New files are changes too (unless they're ignored)
+    (docs / '.gitignore').write_text('ignored.md\n', encoding='utf-8')
+    (docs / 'ignored.md').write_text(DOCUMENT, encoding='utf-8')
+    (docs / 'new.md').write_text(DOCUMENT, encoding='utf-8')
+
+    def select(**options: object) -> list[Path]:
+        return selectChangedFiles(
+            [docs], excludePattern=NO_EXCLUDE, **options
+        ).filenames
+
+    assert select(since='base') == [docs / 'b.md', docs / 'new.md']
+    # (Untracked files are not staged)
+    assert select(since='base', staged=True) == [docs / 'b.md']
+    _git(repo, 'add', 'docs/new.md')
+    assert select(since='base', staged=True) == [
+        docs / 'b.md',
+        docs / 'new.md',
+    ]
+
+
+def testSelectChangedFilesOutsideGit(
+        tmp_path: Path, repo: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Without git, the paths are processed in full (even in a repository)
+    monkeypatch.setenv('PATH', '')
+    selection = selectChangedFiles(
+        [repo], since='HEAD', excludePattern=NO_EXCLUDE
+    )
+    assert selection == ([], [repo])
+
+    monkeypatch.setattr(gitdiff, '_findRepoRoot', lambda *_: None)
+    selection = selectChangedFiles(
+        [tmp_path], since='HEAD', excludePattern=NO_EXCLUDE
+    )
+    assert selection == ([], [tmp_path])
+
+
+def testSelectChangedFilesWithUnknownRevision(repo: Path) -> None:
+    with pytest.raises(GitError, match='nope'):
+        selectChangedFiles([repo], since='nope', excludePattern=NO_EXCLUDE)
+
+    with pytest.raises(GitError, match='Invalid git revision'):
+        selectChangedFiles(
+            [repo], since='--output=x', excludePattern=NO_EXCLUDE
+        )
+
+
+def testCliChangedSince(repo: Path) -> None:
+    (repo / 'docs' / 'b.md').write_text(DOCUMENT + '\n', encoding='utf-8')
+    result = CliRunner().invoke(
+        main, ['--no-cache', '--changed-since', 'HEAD', str(repo)]
+    )
+    assert result.exit_code == 0
+    assert '1 file(s) changed, 0 unchanged' in result.output
+    assert '- [Usage](#usage)' in (repo / 'docs' / 'b.md').read_text(
+        encoding='utf-8'
+    )
+    assert '- [Usage]' not in (repo / 'docs' / 'a.md').read_text(
+        encoding='utf-8'
+    )
+
+    result = CliRunner().invoke(
+        main, ['--changed-since', 'nope', '--check', str(repo)]
+    )
+    assert result.exit_code == 1
+    assert 'Cannot list the changed files with git' in result.output
+
+
+def testCliStagedFallsBackOutsideGit(
+        tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / 'a.md').write_text(DOCUMENT, encoding='utf-8')
+    monkeypatch.setattr(gitdiff, '_findRepoRoot', lambda *_: None)
+    result = CliRunner().invoke(
+        main, ['--no-cache', '--staged', '--check', str(tmp_path)]
+    )
+    assert result.exit_code == 1
+    assert 'Not in a git repository' in result.output
+    assert 'Out-of-date ToC:' in result.output
+
+
+def testCliGitSelectionCannotBeUsedWithWatch(repo: Path) -> None:
+    result = CliRunner().invoke(main, ['--staged', '--watch', str(repo)])
+    assert result.exit_code == 1
+    assert "cannot be used with '--watch'" in result.output
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import subprocess  # noqa: S404
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator import __version__
+from markdown_toc_creator.main import main
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# Modules that are slow to import, and that are only needed by some options.
+# (The import time itself is measured by the benchmark suite, against its
+# baseline, because wall-clock budgets are flaky on shared CI machines.)
+LAZILY_IMPORTED_MODULES: tuple[str, ...] = (
+    'asyncio',
+    'click_config_file_injection_utils',
+    'cProfile',
+    'concurrent.futures',
+    'difflib',
+    'html.parser',
+    'ctypes',
+    'importlib.metadata',
+    'markdown_toc_creator.aio',
+    'markdown_toc_creator.gitdiff',
+    'markdown_toc_creator.links',
+    'markdown_toc_creator.server',
+    'markdown_toc_creator.watcher',
+    'sqlite3',
+    'subprocess',
+)
+
+
+def testHeavyModulesAreImportedLazily(tmp_path: Path) -> None:
+    proc = subprocess.run(
+        [
+            sys.executable,
+            '-c',
+            (
+                'import sys, markdown_toc_creator.main;'
+                ' print("\\n".join(sorted(sys.modules)))'
+            ),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=tmp_path,
+    )
+    importedModules = set(proc.stdout.splitlines())
+    assert importedModules.isdisjoint(LAZILY_IMPORTED_MODULES)
+
+
+def testVersion() -> None:
+    result = CliRunner().invoke(main, ['--version'])
+    assert result.exit_code == 0
+    assert __version__ in result.output
+
+
+@pytest.mark.parametrize(
+    ('pyproject', 'expectedTitle'),
+    [
+        ('[tool.markdown_toc_creator]\ntoc-title = "Contents"\n', 'Contents'),
+        ('[tool]\nmarkdown_toc_creator = {toc-title = "C"}\n', 'C'),
+        ('[project]\nname = "markdown_toc_creator"\n', 'Table of Contents'),
+        ('not valid TOML', 'Table of Contents'),
+    ],
+)
+def test_cli_default_config_file(
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        pyproject: str,
+        expectedTitle: str,
+) -> None:
+    (tmp_path / 'pyproject.toml').write_text(pyproject, encoding='utf-8')
+    target = tmp_path / 'doc.md'
+    target.write_text('# Title\n\n## Section\n', encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+
+    result = CliRunner().invoke(main, ['--no-cache', str(target)])
+    assert result.exit_code == 0
+    assert f'**{expectedTitle}**' in target.read_text(encoding='utf-8')
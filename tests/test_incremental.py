@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import random
+import string
+from pathlib import Path
+
+import pytest
+
+from markdown_toc_creator.create_toc import createTocFromString
+from markdown_toc_creator.exceptions import (
+    HeaderLevelNotContinuousError,
+    HeaderLevelOutOfBoundError,
+)
+from markdown_toc_creator.incremental import IncrementalTocCreator
+
+THIS_DIR = Path(__file__).parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+DOCUMENT: str = (
+    '# Title\n\n'
+    '## Usage\n\n### Example\n\n'
+    '## API\n\n### Example\n\n### Parameters\n\n'
+    '## FAQ\n\n### Example\n'
+)
+
+
+@pytest.mark.parametrize(
+    'source',
+    sorted(DATA_DIR.rglob('*.md')),
+    ids=lambda _: _.relative_to(DATA_DIR).as_posix(),
+)
+@pytest.mark.parametrize('style', ['github', 'gitlab'])
+def testIncrementalMatchesFullRun(source: Path, style: str) -> None:
+    text = source.read_text(encoding='utf-8')
+    creator = IncrementalTocCreator(style=style)
+    try:
+        expected = createTocFromString(text, style=style)
+    except (HeaderLevelNotContinuousError, HeaderLevelOutOfBoundError) as err:
+        with pytest.raises(type(err)):
+            creator.update(text, filename=source)
+
+        return
+
+    for _ in range(2):  # the 2nd run reuses the anchor links of the 1st one
+        result = creator.update(text, filename=source)
+        assert result.text == expected.text
+        assert result.tocLines == expected.tocLines
+
+    index = creator.getHeadingIndex(source)
+    assert index.numOfReusedAnchorLinks == len(expected.tocEntries)
+
+
+def testIncrementalReusesUnchangedHeadings() -> None:
+    creator = IncrementalTocCreator()
+    creator.update(DOCUMENT)
+    index = creator.getHeadingIndex()
+    assert index.numOfComputedAnchorLinks == 5  # (one per distinct header)
+
+    # (The old text, the new text, and how many anchor links are computed)
+    edits: list[tuple[str, str, int]] = [
+        ('## API', '## Reference', 1),
+        ('## FAQ\n', '## FAQ\n\n### Example\n\n### Usage\n', 1),
+        ('### Parameters\n\n', '', 0),
+    ]
+    text = DOCUMENT
+    for old, new, numOfComputed in edits:
+        text = text.replace(old, new)
+        computedBefore = index.numOfComputedAnchorLinks
+        result = creator.update(text)
+        assert result.tocLines == createTocFromString(text).tocLines
+        assert index.numOfComputedAnchorLinks == computedBefore + numOfComputed
+        text = result.text
+
+    assert result.tocLines == [
+        '- [Usage](#usage)',
+        '  - [Example](#example)',
+        '- [Reference](#reference)',
+        '  - [Example](#example-1)',
+        '- [FAQ](#faq)',
+        '  - [Example](#example-2)',
+        '  - [Usage](#usage-1)',
+        '  - [Example](#example-3)',
+    ]
+
+
+def testIncrementalKeepsDocumentsApart() -> None:
+    creator = IncrementalTocCreator(add_toc_title=False)
+    first = creator.update(DOCUMENT, filename=Path('a.md'))
+    second = creator.update('# Other\n\n## Usage\n', filename=Path('b.md'))
+    assert len(first.tocEntries) == 7
+    assert second.tocLines == ['- [Usage](#usage)']
+
+    creator.forget(Path('a.md'))
+    with pytest.raises(KeyError):
+        creator.getHeadingIndex(Path('a.md'))
+
+
+@pytest.mark.parametrize(
+    ('style', 'expected'),
+    [
+        ('github', ['#foo', '#foo-1', '#foo-1-1']),
+        ('gitlab', ['#foo', '#foo-1', '#foo-1']),
+    ],
+)
+def testIncrementalAnchorLinkCollisions(
+        style: str, expected: list[str]
+) -> None:
+    text = '# Title\n\n## Foo\n\n## Foo\n\n## Foo 1\n'
+    full = createTocFromString(text, style=style)
+    assert [_.anchorLinkText for _ in full.tocEntries] == expected
+
+    creator = IncrementalTocCreator(style=style)
+    for _ in range(2):
+        result = creator.update(text)
+        assert [_.anchorLinkText for _ in result.tocEntries] == expected
+
+
+def testIncrementalOnlyDeduplicatesChangedGroups() -> None:
+    sections: list[str] = [
+        f'## Section {letter}\n\n### Example\n'
+        for letter in string.ascii_lowercase
+    ]
+    text = '# Title\n\n' + '\n'.join([*sections, '## Notes\n\n## Notes\n'])
+    creator = IncrementalTocCreator()
+    creator.update(text)
+    index = creator.getHeadingIndex()
+    # (Only the repeated headers are de-duplicated: 26 "Example", 2 "Notes")
+    assert index.numOfDeduplicatedAnchorLinks == 28
+
+    # Editing a unique header leaves all the groups unchanged
+    text = text.replace('## Section g\n', '## Section Seven\n')
+    result = creator.update(text)
+    assert index.numOfDeduplicatedAnchorLinks == 28
+
+    # Only the group of "Notes" (with "Notes 1", which may collide with its
+    # anchor links) is de-duplicated again
+    text = text.replace('## Section h\n', '## Notes 1\n')
+    result = creator.update(text)
+    assert index.numOfDeduplicatedAnchorLinks == 28 + 3
+    assert result.tocLines == createTocFromString(text).tocLines
+    assert result.tocLines[-2:] == ['- [Notes](#notes)', '- [Notes](#notes-2)']
+
+
+@pytest.mark.parametrize('style', ['github', 'gitlab'])
+def testIncrementalDeduplicationMatchesFullRun(style: str) -> None:
+    rng = random.Random(0)  # noqa: S311
+    names: list[str] = ['Foo', 'Foo 1', 'Foo 1 1', 'Foo 2', 'Bar', 'Bar 1']
+    headers: list[str] = []
+    creator = IncrementalTocCreator(style=style)
+    for _ in range(200):
+        if headers and rng.random() < 0.3:
+            del headers[rng.randrange(len(headers))]
+        else:
+            headers.insert(rng.randint(0, len(headers)), rng.choice(names))
+
+        text = '# Title\n\n' + ''.join(f'## {_}\n\n' for _ in headers)
+        result = creator.update(text)
+        expected = createTocFromString(text, style=style)
+        assert result.tocLines == expected.tocLines
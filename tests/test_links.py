@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from pathlib import Path
+from shutil import copyfile
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator.create_toc import createToc
+from markdown_toc_creator.links import (
+    AnchorIndex,
+    collectAnchorLinks,
+    extractLinks,
+    findBrokenLinks,
+)
+from markdown_toc_creator.main import main
+
+DATA_DIR = Path(__file__).parent / 'test_data'
+
+GUIDE: str = """# Guide
+
+## Usage
+
+## Usage
+
+See [the API](api.md#api), [again](./api.md), and [usage](#usage-1).
+
+```
+[in a code block](missing.md)
+```
+
+Not `[in a code span](missing.md)`, nor [the web](https://example.com/#x).
+
+![A picture](missing.png) and [a bad anchor](api.md#nope "Title")
+
+[reference]: <docs/missing file.md>
+"""
+
+API: str = '# API\n\nBack to the [guide](guide.md#guide) (or [up](../x.md)).\n'
+
+
+def testCollectAnchorLinks() -> None:
+    text = '# Title\n\n## Foo\n\n## Foo\n\n#\n\n```\n## Not a header\n```\n'
+    assert collectAnchorLinks(text) == {'#title', '#foo', '#foo-1'}
+    assert collectAnchorLinks('## A\n## A 1\n## A\n', style='github') == {
+        '#a',
+        '#a-1',
+        '#a-2',
+    }
+    assert collectAnchorLinks('## A\n## A 1\n## A\n', style='gitlab') == {
+        '#a',
+        '#a-1',
+    }
+
+
+def testExtractLinks() -> None:
+    assert extractLinks(GUIDE) == [
+        (7, 'api.md#api'),
+        (7, './api.md'),
+        (7, '#usage-1'),
+        (13, 'https://example.com/#x'),
+        (15, 'missing.png'),
+        (15, 'api.md#nope'),
+        (17, 'docs/missing file.md'),
+    ]
+    assert extractLinks('[a](<>) and [b]() and [c](x_(y).md)') == [
+        (1, 'x_(y).md')
+    ]
+
+
+CODE_BLOCKS: str = """[before](a.md)
+
+~~~
+[in a tilde fence](missing.md)
+~~~
+
+- A list item:
+
+  ```
+  [in a fence of a list item](missing.md)
+  ```
+
+[after](b.md)
+"""
+
+
+@pytest.mark.parametrize(
+    ('engine', 'expected'),
+    [
+        # (The simple engine only knows about ``` fences, like for the headers)
+        ('simple', [(1, 'a.md'), (4, 'missing.md'), (13, 'b.md')]),
+        ('commonmark', [(1, 'a.md'), (13, 'b.md')]),
+    ],
+)
+def testExtractLinksSkipsTheScannersCodeBlocks(
+        engine: str, expected: list[tuple[int, str]]
+) -> None:
+    assert extractLinks(CODE_BLOCKS, engine=engine) == expected
+
+
+def testFindBrokenLinksWithTheCommonMarkEngine(tmp_path: Path) -> None:
+    (tmp_path / 'guide.md').write_text(
+        CODE_BLOCKS.replace('a.md', 'guide.md').replace('b.md', '#nope'),
+        encoding='utf-8',
+    )
+    brokenLinks = findBrokenLinks([tmp_path / 'guide.md'], engine='commonmark')
+    assert [(_.lineNumber, _.target) for _ in brokenLinks] == [(13, '#nope')]
+
+
+def testFindBrokenLinks(tmp_path: Path) -> None:
+    (tmp_path / 'guide.md').write_text(GUIDE, encoding='utf-8')
+    (tmp_path / 'api.md').write_text(API, encoding='utf-8')
+
+    brokenLinks = findBrokenLinks([tmp_path / 'guide.md', tmp_path / 'api.md'])
+    assert [
+        _.format().removeprefix(tmp_path.as_posix()) for _ in brokenLinks
+    ] == [
+        '/guide.md:15: "missing.png": file not found',
+        (
+            '/guide.md:15: "api.md#nope": no header of api.md has the anchor'
+            ' link "#nope"'
+        ),
+        '/guide.md:17: "docs/missing file.md": file not found',
+        '/api.md:3: "../x.md": file not found',
+    ]
+
+
+def testFindBrokenLinksReadsLinkedFilesOnce(
+        tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / 'guide.md').write_text(GUIDE, encoding='utf-8')
+    (tmp_path / 'api.md').write_text(API, encoding='utf-8')
+    numOfReads: list[Path] = []
+    readText = Path.read_text
+
+    def countingReadText(self: Path, *args: object, **kwargs: object) -> str:
+        numOfReads.append(self)
+        return readText(self, *args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(Path, 'read_text', countingReadText)
+
+    # (api.md is not among the checked files, so it's read when first linked
+    # to, and missing files are only looked up once too)
+    brokenLinks = findBrokenLinks([tmp_path / 'guide.md'])
+    assert len(brokenLinks) == 3
+    assert sorted(_.name for _ in numOfReads) == [
+        'api.md',
+        'guide.md',
+        'missing file.md',
+    ]
+
+    index = AnchorIndex()
+    index.add(tmp_path / 'api.md', API)
+    assert index.get(str(tmp_path / '.' / 'api.md')) == {'#api'}
+    assert index.get(tmp_path / 'nope.md') is None
+    assert len(index) == 2
+
+
+@pytest.mark.parametrize('style', ['github', 'gitlab'])
+def testTheLinksOfCreatedTocsAreValid(tmp_path: Path, style: str) -> None:
+    filename = tmp_path / 'test1.md'
+    copyfile(DATA_DIR / 'test1.md', filename)
+    createToc(filename, skip_first_n_lines=3, quiet=True, style=style)
+
+    assert findBrokenLinks([filename], style=style) == []
+
+
+def testCliValidateLinks(tmp_path: Path) -> None:
+    (tmp_path / 'guide.md').write_text(GUIDE, encoding='utf-8')
+    (tmp_path / 'api.md').write_text(API, encoding='utf-8')
+
+    result = CliRunner().invoke(
+        main, ['--validate-links', '--no-cache', '--stats', str(tmp_path)]
+    )
+    assert result.exit_code == 1
+    assert 'guide.md:15: "api.md#nope": no header of api.md' in result.output
+    assert '4 broken link(s) in 2 file(s), 2 file(s) checked' in result.output
+    assert '    links ' in result.output
+    # (The files are not changed)
+    assert (tmp_path / 'guide.md').read_text(encoding='utf-8') == GUIDE
+
+    (tmp_path / 'guide.md').write_text('# Guide\n', encoding='utf-8')
+    (tmp_path / 'api.md').write_text('# API\n', encoding='utf-8')
+    result = CliRunner().invoke(
+        main, ['--validate-links', '-q', '--no-cache', str(tmp_path)]
+    )
+    assert result.exit_code == 0
+    assert result.output == ''
+
+    result = CliRunner().invoke(
+        main, ['--validate-links', '--watch', str(tmp_path)]
+    )
+    assert result.exit_code == 1
+    assert "'--validate-links' cannot be used with" in result.output
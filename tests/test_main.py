@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 from shutil import copyfile, copytree
 
@@ -661,3 +662,334 @@ Mathematical expression.
         ],
     }
     assert tocLines == expected[style]
+
+
+@pytest.mark.parametrize('jobs', ['2', 'auto'])
+def test_cli_parallel_jobs_match_serial(tmp_path: Path, jobs: str) -> None:
+    runner = CliRunner()
+    serialDataset = tmp_path / 'serial'
+    parallelDataset = tmp_path / 'parallel'
+    copytree(FAILURE_MIXED_DATA / 'before', serialDataset)
+    copytree(FAILURE_MIXED_DATA / 'before', parallelDataset)
+
+    serial = runner.invoke(main, [str(serialDataset)])
+    parallel = runner.invoke(main, ['--jobs', jobs, str(parallelDataset)])
+
+    assert parallel.exit_code == serial.exit_code == 1
+    assert parallel.output == serial.output.replace(
+        serialDataset.as_posix(), parallelDataset.as_posix()
+    ).replace(str(serialDataset), str(parallelDataset))
+
+    for source in sorted(serialDataset.iterdir()):
+        assert (parallelDataset / source.name).read_text(
+            encoding='utf-8'
+        ) == source.read_text(encoding='utf-8')
+
+
+@pytest.mark.parametrize('jobs', ['0', '-1', 'many'])
+def test_cli_invalid_jobs(tmp_path: Path, jobs: str) -> None:
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+
+    result = CliRunner().invoke(main, ['--jobs', jobs, str(target)])
+    assert result.exit_code == 2
+    assert '"--jobs" must be a positive integer or "auto"' in result.output
+
+
+def test_createToc_skips_writing_unchanged_files(tmp_path: Path) -> None:
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+
+    first = createToc(target, quiet=True)
+    assert first.changed
+
+    modifiedTime = target.stat().st_mtime_ns
+    second = createToc(target, quiet=True)
+    assert not second.changed
+    assert second == first
+    assert target.stat().st_mtime_ns == modifiedTime
+
+
+def test_cli_reports_number_of_changed_files(tmp_path: Path) -> None:
+    runner = CliRunner()
+    for name in ('with_heading.md', 'with_placeholder.md'):
+        copyfile(PROACTIVE_DATA / 'before' / name, tmp_path / name)
+
+    copyfile(
+        PROACTIVE_DATA / 'after' / 'with_heading_default.md',
+        tmp_path / 'already_done.md',
+    )
+
+    result = runner.invoke(main, [str(tmp_path)])
+    assert result.exit_code == 0
+    assert '2 file(s) changed, 1 unchanged' in result.output
+
+
+@pytest.mark.parametrize(
+    ('content', 'expected'),
+    [
+        (
+            '# Title\n\n<!--TOC-->\n<!--TOC-->\n\n## Last header',
+            (
+                '# Title\n\n<!--TOC-->\n\n- [Last header](#last-header)\n\n'
+                '<!--TOC-->\n\n## Last header'
+            ),
+        ),
+        (
+            '# Title\n\n## Header\n\n<!--TOC-->\n<!--TOC-->',
+            (
+                '# Title\n\n## Header\n\n<!--TOC-->\n\n- [Header](#header)\n\n'
+                '<!--TOC-->\n'
+            ),
+        ),
+        (
+            '## Only header',
+            (
+                '## Only header\n\n<!--TOC-->\n\n'
+                '- [Only header](#only-header)\n\n<!--TOC-->\n'
+            ),
+        ),
+    ],
+)
+def test_createToc_file_without_trailing_line_break(
+        tmp_path: Path, content: str, expected: str
+) -> None:
+    target = tmp_path / 'no_trailing_line_break.md'
+    target.write_text(content, encoding='utf-8')
+    createToc(
+        target,
+        quiet=True,
+        skip_first_n_lines=0 if content.startswith('##') else 1,
+        add_toc_title=False,
+        add_horizontal_rules=False,
+    )
+    assert target.read_text(encoding='utf-8') == expected
+
+
+@pytest.mark.parametrize(
+    'source',
+    sorted((PROACTIVE_DATA / 'before').glob('*.md')),
+    ids=lambda _: _.name,
+)
+@pytest.mark.parametrize('proactive', [True, False])
+def test_createToc_memory_mapped_matches_in_memory(
+        tmp_path: Path,
+        source: Path,
+        proactive: bool,  # noqa: FBT001
+) -> None:
+    inMemory = tmp_path / 'in_memory.md'
+    memoryMapped = tmp_path / 'memory_mapped.md'
+    copyfile(source, inMemory)
+    copyfile(source, memoryMapped)
+
+    expected = createToc(
+        inMemory, quiet=True, proactive=proactive, mmap_threshold=None
+    )
+    actual = createToc(
+        memoryMapped, quiet=True, proactive=proactive, mmap_threshold=0
+    )
+    assert actual == expected
+    assert actual.changed == expected.changed
+    assert memoryMapped.read_bytes() == inMemory.read_bytes()
+    # (The offsets are the same too, because the test files are ASCII)
+    assert actual.headings == expected.headings
+
+
+def test_createToc_memory_mapped_preserves_line_breaks(tmp_path: Path) -> None:
+    target = tmp_path / 'crlf.md'
+    target.write_bytes(b'# Title\r\n\r\n## Header 1\r\n\r\ntext\r\n')
+    options = {'quiet': True, 'add_horizontal_rules': False}
+    createToc(target, mmap_threshold=0, **options)
+    assert target.read_bytes() == (
+        b'# Title\r\n\r\n<!--TOC-->\r\n\r\n**Table of Contents**\r\n\r\n'
+        b'- [Header 1](#header-1)\r\n\r\n<!--TOC-->\r\n\r\n'
+        b'## Header 1\r\n\r\ntext\r\n'
+    )
+
+    modifiedTime = target.stat().st_mtime_ns
+    assert not createToc(target, mmap_threshold=0, **options).changed
+    assert target.stat().st_mtime_ns == modifiedTime
+
+
+def test_cli_mmap_threshold_option(tmp_path: Path) -> None:
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+
+    runner = CliRunner()
+    result = runner.invoke(main, ['--mmap-threshold', '-1', str(target)])
+    assert result.exit_code == 2
+
+    result = runner.invoke(main, ['--mmap-threshold', '0', str(target)])
+    assert result.exit_code == 0
+    expected = PROACTIVE_DATA / 'after' / 'with_heading_default.md'
+    assert target.read_text(encoding='utf-8') == expected.read_text(
+        encoding='utf-8'
+    )
+
+
+def test_cli_engine_option(tmp_path: Path) -> None:
+    target = tmp_path / 'setext.md'
+    target.write_text(
+        'Title\n=====\n\nSection\n-------\n\n    ## Code\n',
+        encoding='utf-8',
+    )
+    runner = CliRunner()
+    result = runner.invoke(main, ['--engine', 'markdown-it', str(target)])
+    assert result.exit_code == 2
+
+    result = runner.invoke(
+        main,
+        [
+            '--engine',
+            'commonmark',
+            '--mmap-threshold',
+            '0',
+            '--add-horizontal-rules',
+            'False',
+            '--no-cache',
+            '-q',
+            str(target),
+        ],
+    )
+    assert result.exit_code == 0
+    assert target.read_text(encoding='utf-8') == (
+        'Title\n=====\n\n<!--TOC-->\n\n**Table of Contents**\n\n'
+        '- [Section](#section)\n\n<!--TOC-->\n\nSection\n-------\n\n'
+        '    ## Code\n'
+    )
+
+
+def test_cli_check_option(tmp_path: Path) -> None:
+    runner = CliRunner()
+    stale = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', stale)
+    upToDate = tmp_path / 'already_done.md'
+    copyfile(PROACTIVE_DATA / 'after' / 'with_heading_default.md', upToDate)
+    original = stale.read_text(encoding='utf-8')
+
+    result = runner.invoke(main, ['--check', '--no-cache', str(tmp_path)])
+    assert result.exit_code == 1
+    assert f'Out-of-date ToC: {stale}' in result.output
+    assert f'Out-of-date ToC: {upToDate}' not in result.output
+    assert '1 file(s) would change, 1 unchanged' in result.output
+    assert stale.read_text(encoding='utf-8') == original
+
+    result = runner.invoke(main, ['--check', '--no-cache', str(upToDate)])
+    assert result.exit_code == 0
+    assert '0 file(s) would change, 1 unchanged' in result.output
+
+
+def test_cli_diff_option(tmp_path: Path) -> None:
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+    original = target.read_text(encoding='utf-8')
+
+    result = CliRunner().invoke(main, ['--diff', '--no-cache', str(target)])
+    assert result.exit_code == 0
+    assert target.read_text(encoding='utf-8') == original
+    assert f'--- {target}\n+++ {target}\n' in result.output
+    assert '\n+<!--TOC-->\n' in result.output
+
+    # The diff turns the original file into the expected one
+    expected = PROACTIVE_DATA / 'after' / 'with_heading_default.md'
+    expectedLines = expected.read_text(encoding='utf-8').splitlines()
+    diffLines = result.output.splitlines()
+    addedLines = [_[1:] for _ in diffLines if _.startswith('+')][1:]
+    assert set(addedLines) <= set(expectedLines)
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_cli_format_ndjson(tmp_path: Path, jobs: str) -> None:
+    copytree(FAILURE_MIXED_DATA / 'before', tmp_path, dirs_exist_ok=True)
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', tmp_path / 'z.md')
+
+    result = CliRunner().invoke(
+        main,
+        [
+            '--format',
+            'ndjson',
+            '-q',
+            '--no-cache',
+            '--jobs',
+            jobs,
+            str(tmp_path),
+        ],
+    )
+    # The files with header level errors are reported, and left out
+    assert result.exit_code == 1
+    jsonLines = [_ for _ in result.output.splitlines() if _.startswith('{')]
+    records = [json.loads(_) for _ in jsonLines]
+    assert [Path(_['path']).name for _ in records] == ['success.md', 'z.md']
+
+    tocLines = createToc(tmp_path / 'z.md', quiet=True)
+    headings = records[1]['headings']
+    assert ['#' + _['anchor'] for _ in headings] == [
+        _.anchorLinkText for _ in tocLines.tocEntries
+    ]
+    assert [_['line'] for _ in headings] == [
+        _.lineNumber for _ in tocLines.headings
+    ]
+    assert all(
+        _['parent'] is None or headings[_['parent']]['level'] < _['level']
+        for _ in headings
+    )
+
+
+@pytest.mark.parametrize('reportOnly', [['--in-place', 'False'], ['--check']])
+@pytest.mark.parametrize(
+    'pipeline', [[], ['--jobs', '2'], ['--io-concurrency', '2']]
+)
+def test_cli_format_ndjson_without_writing(
+        tmp_path: Path, reportOnly: list[str], pipeline: list[str]
+) -> None:
+    target = tmp_path / 'a.md'
+    target.write_text('# Title\n\n## A\n\n## B\n', encoding='utf-8')
+
+    result = CliRunner().invoke(
+        main,
+        [
+            *reportOnly,
+            *pipeline,
+            '--format',
+            'ndjson',
+            '--no-cache',
+            str(target),
+        ],
+    )
+    # The lines are the ones of the file, which is left unchanged
+    records = [
+        json.loads(_) for _ in result.output.splitlines() if _.startswith('{')
+    ]
+    assert [_['line'] for _ in records[0]['headings']] == [3, 5]
+    assert target.read_text(encoding='utf-8') == '# Title\n\n## A\n\n## B\n'
+
+
+def test_cli_format_json(tmp_path: Path) -> None:
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+
+    result = CliRunner().invoke(
+        main, ['--format', 'JSON', '-q', '--no-cache', str(target)]
+    )
+    assert result.exit_code == 0
+    records = json.loads(result.output)
+    assert len(records) == 1
+    assert records[0]['path'] == target.as_posix()
+    assert records[0]['headings']
+
+    # The files are still updated (unless --in-place is False)
+    expected = PROACTIVE_DATA / 'after' / 'with_heading_default.md'
+    assert target.read_text(encoding='utf-8') == expected.read_text(
+        encoding='utf-8'
+    )
+
+
+def test_cli_format_with_diff(tmp_path: Path) -> None:
+    target = tmp_path / 'with_heading.md'
+    copyfile(PROACTIVE_DATA / 'before' / 'with_heading.md', target)
+
+    result = CliRunner().invoke(
+        main, ['--format', 'ndjson', '--diff', str(target)]
+    )
+    assert result.exit_code == 1
+    assert "'--diff' can only be used with '--format text'." in result.output
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from markdown_toc_creator.create_toc import createTocFromString
+from markdown_toc_creator.outline import (
+    OutlineEntry,
+    OutlineWriter,
+    buildOutline,
+)
+
+MARKDOWN: str = (
+    '# Title\n\n'
+    '## Install\n\n'
+    '### From [PyPI](https://pypi.org)\n\n'
+    '#### Notes\n\n'
+    '### From source\n\n'
+    '## Usage\n\n'
+    '### Notes\n'
+)
+
+
+def testBuildOutline() -> None:
+    result = createTocFromString(
+        MARKDOWN, add_toc_title=False, add_horizontal_rules=False
+    )
+    outline = buildOutline(result.headings, result.tocEntries)
+    # The line numbers are the ones in the markdown with the new ToC (which
+    # takes up 11 lines, including the empty lines around it)
+    assert outline == [
+        OutlineEntry(2, 'Install', 'install', 14, None),
+        OutlineEntry(3, 'From PyPI', 'from-pypi', 16, 0),
+        OutlineEntry(4, 'Notes', 'notes', 18, 1),
+        OutlineEntry(3, 'From source', 'from-source', 20, 0),
+        OutlineEntry(2, 'Usage', 'usage', 22, None),
+        OutlineEntry(3, 'Notes', 'notes-1', 24, 4),
+    ]
+    lines = result.text.splitlines()
+    assert [lines[_.line - 1] for _ in outline[:2]] == [
+        '## Install',
+        '### From [PyPI](https://pypi.org)',
+    ]
+
+
+def testBuildOutlineWithoutToc() -> None:
+    result = createTocFromString(MARKDOWN, proactive=False)
+    assert result.headings
+    assert buildOutline(result.headings, result.tocEntries) == []
+
+
+@pytest.mark.parametrize('numOfFiles', [0, 1, 3])
+def testOutlineWriterJson(numOfFiles: int) -> None:
+    result = createTocFromString(MARKDOWN)
+    outline = buildOutline(result.headings, result.tocEntries)
+    stream = io.StringIO()
+    writer = OutlineWriter(stream, 'json')
+    for i in range(numOfFiles):
+        writer.write(Path(f'docs/{i}.md'), outline)
+
+    writer.close()
+    records = json.loads(stream.getvalue())
+    assert [_['path'] for _ in records] == [
+        f'docs/{i}.md' for i in range(numOfFiles)
+    ]
+    for record in records:
+        assert record['headings'] == [_._asdict() for _ in outline]
+
+
+def testOutlineWriterNdjson() -> None:
+    stream = io.StringIO()
+    writer = OutlineWriter(stream, 'ndjson')
+    writer.write(Path('a.md'), [OutlineEntry(2, 'A', 'a', 3, None)])
+    writer.write(Path('b.md'), [])
+    writer.close()
+    assert stream.getvalue().splitlines() == [
+        (
+            '{"path": "a.md", "headings": [{"level": 2, "text": "A",'
+            ' "anchor": "a", "line": 3, "parent": null}]}'
+        ),
+        '{"path": "b.md", "headings": []}',
+    ]
+
+
+def testOutlineWriterUnsupportedFormat() -> None:
+    with pytest.raises(ValueError, match='Unsupported output format: text'):
+        OutlineWriter(io.StringIO(), 'text')
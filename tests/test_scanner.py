@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import pytest
+
+from markdown_toc_creator.scanner import (
+    Heading,
+    findFirstNonEmptyLine,
+    scanMarkdown,
+    scanMarkdownBytes,
+)
+
+SAMPLE = """# Title
+
+<!--TOC-->
+<!--TOC-->
+
+## Section 1
+  ### Indented
+```python
+# comment, not a header
+```
+<!--TOC-->
+## Section 2"""
+
+COMMONMARK_SAMPLE = """Title
+=====
+
+~~~~
+## Not a header (in a fence)
+```
+~~~~
+
+    ## Not a header (indented code)
+
+<div>
+## Not a header (in an HTML block)
+</div>
+
+#hashtag, not a header
+
+Section 1
+---------
+
+## Section 2 ##
+
+- ## In a list
+> ## In a quote
+
+### Section 3 ###  #
+<!--TOC-->
+"""
+
+
+def testScanMarkdown() -> None:
+    result = scanMarkdown(SAMPLE, skip_first_n_lines=1)
+    assert result.headings == [
+        Heading(lineNumber=6, line='## Section 1', level=2, offset=32),
+        Heading(lineNumber=7, line='  ### Indented', level=0, offset=45),
+        Heading(lineNumber=12, line='## Section 2', level=2, offset=109),
+    ]
+    for heading in result.headings:
+        assert SAMPLE[heading.offset :].startswith(heading.line)
+
+    assert result.numOfPlaceholders == 3
+    assert result.hasInsertionPoint
+    assert [SAMPLE[start:end] for start, end in result.placeholderSpans] == [
+        '<!--TOC-->\n',
+        '<!--TOC-->\n',
+    ]
+    assert not result.endsInCodeBlock
+
+
+@pytest.mark.parametrize(
+    ('skip', 'expectedLineNumbers'),
+    [(0, [1, 6, 7, 12]), (6, [7, 12]), (100, [])],
+)
+def testScanMarkdownSkipLines(
+        skip: int, expectedLineNumbers: list[int]
+) -> None:
+    result = scanMarkdown(SAMPLE, skip_first_n_lines=skip)
+    assert [_.lineNumber for _ in result.headings] == expectedLineNumbers
+
+
+@pytest.mark.parametrize('lineBreak', ['\n', '\r\n'])
+def testScanMarkdownBytes(lineBreak: str) -> None:
+    buffer = SAMPLE.replace('\n', lineBreak).encode('utf-8')
+    result = scanMarkdownBytes(buffer, skip_first_n_lines=1)
+    assert [(_.lineNumber, _.line, _.level) for _ in result.headings] == [
+        (_.lineNumber, _.line, _.level) for _ in scanMarkdown(SAMPLE).headings
+    ]
+    for heading in result.headings:
+        assert buffer[heading.offset :].startswith(heading.line.encode())
+    assert result.numOfPlaceholders == 3
+    assert [buffer[start:end] for start, end in result.placeholderSpans] == [
+        f'<!--TOC-->{lineBreak}'.encode(),
+    ] * 2
+
+
+def testScanMarkdownUnclosedFence() -> None:
+    result = scanMarkdown('# Title\n```\n## Not a header\n<!--TOC-->')
+    assert result.headings == []
+    assert result.endsInCodeBlock
+    assert result.numOfPlaceholders == 1
+    assert not result.hasInsertionPoint
+
+
+@pytest.mark.parametrize(
+    ('engine', 'expectedBlocks'),
+    [
+        ('simple', ['```\nx\n```\n', '  ```\n  c\n  ```\n', '```\nopen']),
+        (
+            'commonmark',
+            [
+                '```\nx\n```\n',
+                '~~~\n[l](x)\n~~~\n',
+                '  ```\n  c\n  ```\n',
+                '```\nopen',
+            ],
+        ),
+    ],
+)
+def testScanMarkdownCodeBlockSpans(
+        engine: str, expectedBlocks: list[str]
+) -> None:
+    text = 'a\n```\nx\n```\n~~~\n[l](x)\n~~~\n- item\n\n  ```\n  c\n  ```\n'
+    text += 'd\n```\nopen'
+    result = scanMarkdown(text, engine=engine)
+    assert [text[start:end] for start, end in result.codeBlockSpans] == (
+        expectedBlocks
+    )
+
+
+@pytest.mark.parametrize(
+    ('text', 'expected'),
+    [
+        ('', None),
+        (' \n\t\n', None),
+        ('# Title\nbody', (0, 8)),
+        ('\n\n  text\n', (2, 9)),
+        ('\n\nlast line', (2, 11)),
+    ],
+)
+def testFindFirstNonEmptyLine(
+        text: str, expected: tuple[int, int] | None
+) -> None:
+    assert findFirstNonEmptyLine(text) == expected
+
+
+def testCommonMarkEngine() -> None:
+    result = scanMarkdown(
+        COMMONMARK_SAMPLE, skip_first_n_lines=0, engine='commonmark'
+    )
+    assert result.headings == [
+        Heading(lineNumber=1, line='Title', level=1, offset=0),
+        Heading(lineNumber=17, line='Section 1', level=2, offset=167),
+        Heading(lineNumber=20, line='## Section 2', level=2, offset=188),
+        Heading(lineNumber=25, line='### Section 3 ###', level=3, offset=237),
+    ]
+    for heading in result.headings:
+        assert COMMONMARK_SAMPLE[heading.offset :].startswith(heading.line)
+
+    assert result.titleEnd == len('Title\n=====\n')
+    assert result.numOfPlaceholders == 1
+    assert not result.endsInCodeBlock
+
+    # (The simple engine only knows about ``` fences, and the one of the
+    # sample is never closed)
+    result = scanMarkdown(COMMONMARK_SAMPLE, skip_first_n_lines=0)
+    assert result.headings == [
+        Heading(
+            lineNumber=5,
+            line='## Not a header (in a fence)',
+            level=2,
+            offset=18,
+        )
+    ]
+    assert result.endsInCodeBlock
+
+
+@pytest.mark.parametrize(
+    ('text', 'expectedLines'),
+    [
+        ('Some\ntext\n---\n', ['Some text']),
+        ('text\n\n---\n', []),  # (a thematic break)
+        ('- item\n---\n', []),
+        ('> quote\n===\n', []),  # (a lazy continuation line)
+        ('```\ncode\n````\n## A\n', ['## A']),
+        ('~~~\n```\n~~~~ \n## A\n', ['## A']),
+        ('text\n    ## B\n## A\n', ['## A']),
+        ('<!-- a\n## B\n-->\n## A\n', ['## A']),
+        ('- item\n\n  ## B\n\n## A\n', ['## A']),
+        ('#5\n# #\n## A ##\n', ['## A']),  # (no empty headers)
+    ],
+)
+def testCommonMarkEngineBlocks(text: str, expectedLines: list[str]) -> None:
+    result = scanMarkdown(text, skip_first_n_lines=0, engine='commonmark')
+    assert [_.line for _ in result.headings] == expectedLines
+
+
+@pytest.mark.parametrize('lineBreak', ['\n', '\r\n'])
+def testCommonMarkEngineBytes(lineBreak: str) -> None:
+    text = COMMONMARK_SAMPLE.replace('\n', lineBreak)
+    result = scanMarkdownBytes(
+        text.encode('utf-8'), skip_first_n_lines=0, engine='commonmark'
+    )
+    assert result.titleEnd == len(f'Title{lineBreak}====={lineBreak}')
+    assert [(_.lineNumber, _.line, _.level) for _ in result.headings] == [
+        (_.lineNumber, _.line, _.level)
+        for _ in scanMarkdown(
+            COMMONMARK_SAMPLE, skip_first_n_lines=0, engine='commonmark'
+        ).headings
+    ]
+
+
+def testUnknownEngine() -> None:
+    with pytest.raises(ValueError, match='"--engine" must be one of'):
+        scanMarkdown('# Title', engine='markdown-it')
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import io
+import json
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator.create_toc import createTocFromString
+from markdown_toc_creator.main import main
+from markdown_toc_creator.server import TocServer
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+OPTIONS: dict[str, bool] = {
+    'add_toc_title': False,
+    'add_horizontal_rules': False,
+}
+
+
+def testHandleTextRequest() -> None:
+    server = TocServer(OPTIONS)
+    text = '# Title\n\n## Usage\n\n## Usage\n'
+    for _ in range(2):  # (the 2nd time, with the document's header index)
+        response = server.handleRequest({
+            'id': 'a',
+            'text': text,
+            'filename': 'doc.md',
+        })
+        assert response['id'] == 'a'
+        assert response['ok']
+        assert response['changed']
+        assert response['text'] == createTocFromString(text, **OPTIONS).text
+        assert response['tocLines'] == [
+            '- [Usage](#usage)',
+            '- [Usage](#usage-1)',
+        ]
+        assert [_['anchor'] for _ in response['headings']] == [
+            'usage',
+            'usage-1',
+        ]
+
+    response = server.handleRequest({
+        'id': 2,
+        'text': text,
+        'options': {'add_toc_title': True, 'toc_title': 'Contents'},
+    })
+    assert '**Contents**' in response['text']
+
+
+def testHandlePathRequest(tmp_path: Path) -> None:
+    target = tmp_path / 'doc.md'
+    original = '# Title\n\n## Section\n'
+    target.write_text(original, encoding='utf-8')
+    server = TocServer({**OPTIONS, 'in_place': True})
+
+    response = server.handleRequest({
+        'id': 1,
+        'path': str(target),
+        'options': {'in_place': False},
+    })
+    assert response['ok']
+    assert response['changed']
+    assert response['tocLines'] == ['- [Section](#section)']
+    assert target.read_text(encoding='utf-8') == original
+    # (The line numbers of the unchanged file)
+    assert [_['line'] for _ in response['headings']] == [3]
+
+    assert server.handleRequest({'id': 2, 'path': str(target)})['changed']
+    assert not server.handleRequest({'id': 3, 'path': str(target)})['changed']
+    assert target.read_text(encoding='utf-8') != original
+
+
+@pytest.mark.parametrize(
+    ('request_', 'error'),
+    [
+        ([1, 2], 'A request must be a JSON object'),
+        ({'id': 1}, 'A request needs a "path" or a "text"'),
+        ({'id': 1, 'text': 3}, '"text" must be a string'),
+        ({'id': 1, 'text': '', 'options': {'x': 1}}, 'Unknown options: x'),
+        ({'id': 1, 'path': 'no/such/file.md'}, 'No such file'),
+        ({'id': 1, 'text': '# A\n\n## B\n\n#### C\n'}, 'Header level'),
+    ],
+)
+def testHandleInvalidRequest(request_: object, error: str) -> None:
+    response = TocServer(OPTIONS).handleRequest(request_)
+    assert not response['ok']
+    assert error in response['error']
+
+
+def testServeStream() -> None:
+    requests = [
+        json.dumps({'id': i, 'text': f'# T\n\n## Section {i}\n'})
+        for i in range(50)
+    ]
+    inStream = io.StringIO('\n'.join([*requests, '', 'not JSON']) + '\n')
+    outStream = io.StringIO()
+    TocServer(OPTIONS, jobs=4).serveStream(inStream, outStream)
+
+    responses = [json.loads(_) for _ in outStream.getvalue().splitlines()]
+    assert len(responses) == 51
+    byId = {_['id']: _ for _ in responses}
+    assert not byId[None]['ok']
+    for i in range(50):
+        assert byId[i]['tocLines'] == [f'- [Section {i}](#section-{i})']
+
+
+def testFailingRequestsGetAResponse(
+        monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    def failOnBugs(text: str, **options: object) -> object:
+        if 'bug' in text:
+            raise IndexError('string index out of range')
+
+        return createTocFromString(text, **options)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(
+        'markdown_toc_creator.server.createTocFromString', failOnBugs
+    )
+    requests = [
+        json.dumps({'id': 1, 'text': '# T\n\n## bug\n'}),
+        json.dumps({'id': 2, 'text': '# T\n\n## A\n'}),
+    ]
+    outStream = io.StringIO()
+    TocServer(OPTIONS, jobs=2).serveStream(
+        io.StringIO('\n'.join(requests) + '\n'), outStream
+    )
+
+    responses = [json.loads(_) for _ in outStream.getvalue().splitlines()]
+    byId = {_['id']: _ for _ in responses}
+    assert byId[1] == {
+        'id': 1,
+        'ok': False,
+        'error': 'Internal error: IndexError: string index out of range',
+    }
+    assert byId[2]['ok']
+
+    # (The errors of the requests that cannot get a response are printed)
+    class BrokenStream(io.StringIO):
+        def write(self, text: str) -> int:  # noqa: PLR6301
+            raise BrokenPipeError(text)
+
+    TocServer(OPTIONS).serveStream(io.StringIO(requests[1]), BrokenStream())
+    assert 'BrokenPipeError' in capsys.readouterr().err
+
+
+@pytest.mark.skipif(
+    not hasattr(socket, 'AF_UNIX'), reason='Unix sockets are not available'
+)
+def testServeUnixSocket(tmp_path: Path) -> None:
+    socketPath = tmp_path / 'toc.sock'
+    server = TocServer(OPTIONS)
+    thread = threading.Thread(
+        target=server.serveUnixSocket, args=(socketPath,), daemon=True
+    )
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not socketPath.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(socketPath))
+            with client.makefile('rw', encoding='utf-8') as stream:
+                for i in range(3):
+                    stream.write(
+                        json.dumps({'id': i, 'text': '# T\n\n## A\n'})
+                    )
+                    stream.write('\n')
+                    stream.flush()
+                    response = json.loads(stream.readline())
+                    assert response['id'] == i
+                    assert response['tocLines'] == ['- [A](#a)']
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+
+    assert not socketPath.exists()
+
+
+def test_cli_serve() -> None:
+    request = json.dumps({'id': 7, 'text': '# T\n\n## A\n'})
+    result = CliRunner().invoke(main, ['--serve'], input=request + '\n')
+    assert result.exit_code == 0
+    response = json.loads(result.output.splitlines()[-1])
+    assert response['id'] == 7
+    assert response['tocLines'] == ['- [A](#a)']
+
+
+def test_cli_serve_with_paths(tmp_path: Path) -> None:
+    result = CliRunner().invoke(main, ['--serve', str(tmp_path)])
+    assert result.exit_code == 1
+    assert "'--serve' cannot be used with 'paths' or 'src'." in result.output
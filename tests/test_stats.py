@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import pstats
+from typing import TYPE_CHECKING
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator.cache import TocCache
+from markdown_toc_creator.create_toc import createToc
+from markdown_toc_creator.main import main
+from markdown_toc_creator.parallel import processFile
+from markdown_toc_creator.stats import (
+    PHASES,
+    RunStats,
+    collectStats,
+    currentStats,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+
+def testCollectStats(
+        tmp_path: Path, writeDocuments: Callable[[Path, int], list[Path]]
+) -> None:
+    filenames = writeDocuments(tmp_path, 2)
+    originalSizes = [_.stat().st_size for _ in filenames]
+    perFile: list[tuple[Path, RunStats]] = []
+    with collectStats(onFile=lambda *_: perFile.append(_)) as stats:
+        for filename in filenames:
+            createToc(filename, quiet=True)
+
+        createToc(filenames[0], quiet=True)  # (now up to date)
+
+    assert currentStats() is None
+    assert [_[0] for _ in perFile] == [*filenames, filenames[0]]
+    assert (stats.numOfFiles, stats.numOfChangedFiles) == (3, 2)
+    assert stats.numOfUnchangedFiles == 1
+    assert stats.numOfHeadings == 3 * 4
+    assert stats.numOfBytesRead == (
+        sum(originalSizes) + filenames[0].stat().st_size
+    )
+    assert stats.numOfBytesWritten == 2 * filenames[0].stat().st_size
+    assert {'read', 'scan', 'anchorLinks', 'render', 'write'} <= set(
+        stats.phaseSeconds
+    )
+    assert set(stats.phaseSeconds) <= set(PHASES)
+
+    # The stats of each file add up to the total
+    total = RunStats()
+    for _, fileStats in perFile:
+        assert fileStats.numOfFiles == 1
+        total.merge(fileStats)
+
+    assert total == stats
+
+
+def testNoStatsAreCollectedByDefault(
+        tmp_path: Path, writeDocuments: Callable[[Path, int], list[Path]]
+) -> None:
+    (filename,) = writeDocuments(tmp_path, 1)
+    assert currentStats() is None
+    assert processFile(filename, {'quiet': True}).stats is None
+
+
+def testProcessFileStats(
+        tmp_path: Path, writeDocuments: Callable[[Path, int], list[Path]]
+) -> None:
+    (filename,) = writeDocuments(tmp_path, 1)
+    cache = TocCache(tmp_path / 'cache', 'fingerprint')
+    try:
+        result = processFile(
+            filename, {'quiet': True}, cache=cache, withStats=True
+        )
+        assert result.stats is not None
+        assert result.stats.numOfChangedFiles == 1
+        assert result.cacheRecord is not None
+        cache.store(result.cacheRecord)
+        cache.flush()
+
+        result = processFile(
+            filename, {'quiet': True}, cache=cache, withStats=True
+        )
+    finally:
+        cache.close()
+
+    assert result.stats is not None
+    assert (result.stats.numOfFiles, result.stats.numOfCachedFiles) == (1, 1)
+    assert result.stats.numOfBytesRead == 0
+    assert set(result.stats.phaseSeconds) == {'cache'}
+
+
+def testRunStatsFormat() -> None:
+    stats = RunStats(
+        numOfFiles=3,
+        numOfChangedFiles=1,
+        numOfCachedFiles=1,
+        numOfBytesRead=2048,
+        phaseSeconds={'write': 0.5, 'walk': 0.25},
+    )
+    report = stats.format(wallSeconds=1.0)
+    assert '3 (1 changed, 1 unchanged, 1 skipped thanks to the cache)' in (
+        report
+    )
+    assert 'Read:     2.0 KiB' in report
+    assert 'Written:  0 B' in report
+    # (The phases are listed in the order they happen)
+    assert report.index('walk') < report.index('write')
+    assert report.endswith('Wall time: 1000.0 ms')
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def testCliStatsOption(
+        tmp_path: Path,
+        jobs: str,
+        writeDocuments: Callable[[Path, int], list[Path]],
+) -> None:
+    writeDocuments(tmp_path, 3)
+    result = CliRunner().invoke(
+        main, ['-q', '--stats', '--no-cache', '--jobs', jobs, str(tmp_path)]
+    )
+    assert result.exit_code == 0
+    assert 'Files:    3 (3 changed, 0 unchanged' in result.output
+    assert 'Headings: 12' in result.output
+    assert '    walk ' in result.output
+    assert '    write ' in result.output
+
+
+def testCliProfileOption(
+        tmp_path: Path, writeDocuments: Callable[[Path, int], list[Path]]
+) -> None:
+    (filename,) = writeDocuments(tmp_path, 1)
+    profile = tmp_path / 'run.prof'
+    result = CliRunner().invoke(
+        main, ['-q', '--no-cache', '--profile', str(profile), str(filename)]
+    )
+    assert result.exit_code == 0
+    functionNames = {_[2] for _ in pstats.Stats(str(profile)).stats}  # type: ignore[attr-defined]
+    assert 'createToc' in functionNames
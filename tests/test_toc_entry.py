@@ -1,13 +1,61 @@
 from __future__ import annotations
 
+import warnings
+from pathlib import Path
+
 import pytest
 
 from markdown_toc_creator.toc_entry import (
+    AnchorLinkDeduplicator,
     TocEntry,
     _buildListOfCharGroups,
     _CharGroup,
+    clearMemoCaches,
+    deduplicateAnchorLinkText,
+    getMemoCacheStats,
+    stripHtmlTags,
 )
 
+DATA_DIR = Path(__file__).parent / 'test_data'
+
+HTML_HEADINGS: list[str] = [
+    'Plain heading',
+    '',
+    '   ',
+    'a < b and c > d',
+    '<3 markdown',
+    'Heading with <b>bold</b> text',
+    'Heading with <a href="https://example.com">a link</a>',
+    'Heading with <img src="logo.png"> image',
+    'Unclosed <em>tag',
+    'Unfinished <tag',
+    'Self-closing<br/>tag',
+    '<span id="anchor"></span>   <i>spaces</i>',
+    '<b>a</b>\t<i>b</i>',
+    '<pre>  </pre>preformatted',
+    'Comment <!-- hidden --> here',
+    'Script <script>alert(1)</script> and <style>p {}</style>',
+    'Entities: &amp; &lt;tag&gt; &copy; &#39;quoted&#39;',
+    'CDATA <![CDATA[kept]]>',
+    'Unknown entity &bogus; here',
+    'Unterminated entity &amp',
+    'Unterminated entities &lt &gt; &copy2',
+    'Numeric &#65;&#x42;&#X43 &#0; &#xD800; &#128; &#99999999;',
+    'Not numeric &# &#x; &#65a',
+    'Mismatched <b>tags</i>',
+    '中文 <code>代码</code> 🚀',
+]
+
+
+def _corpusHeadings() -> list[str]:
+    headings: set[str] = set(HTML_HEADINGS)
+    for filename in DATA_DIR.rglob('*.md'):
+        for line in filename.read_text(encoding='utf-8').splitlines():
+            if line.startswith('#'):
+                headings.add(TocEntry.removePoundChar(line.strip()))
+
+    return sorted(headings)
+
 
 @pytest.mark.parametrize(
     ('string', 'expected'),
@@ -16,7 +64,7 @@ from markdown_toc_creator.toc_entry import (
             'something',
             [
                 _CharGroup(
-                    chars=['s', 'o', 'm', 'e', 't', 'h', 'i', 'n', 'g'],
+                    text='something',
                     insideBacktickPairs=False,
                 )
             ],
@@ -25,15 +73,15 @@ from markdown_toc_creator.toc_entry import (
             'ab`cd`?!^',
             [
                 _CharGroup(
-                    chars=['a', 'b'],
+                    text='ab',
                     insideBacktickPairs=False,
                 ),
                 _CharGroup(
-                    chars=['c', 'd'],
+                    text='cd',
                     insideBacktickPairs=True,
                 ),
                 _CharGroup(
-                    chars=['?', '!', '^'],
+                    text='?!^',
                     insideBacktickPairs=False,
                 ),
             ],
@@ -42,11 +90,11 @@ from markdown_toc_creator.toc_entry import (
             'ab`cd`',
             [
                 _CharGroup(
-                    chars=['a', 'b'],
+                    text='ab',
                     insideBacktickPairs=False,
                 ),
                 _CharGroup(
-                    chars=['c', 'd'],
+                    text='cd',
                     insideBacktickPairs=True,
                 ),
             ],
@@ -55,11 +103,11 @@ from markdown_toc_creator.toc_entry import (
             'ab`cd',
             [
                 _CharGroup(
-                    chars=['a', 'b'],
+                    text='ab',
                     insideBacktickPairs=False,
                 ),
                 _CharGroup(
-                    chars=['c', 'd'],
+                    text='cd',
                     insideBacktickPairs=True,
                 ),
             ],
@@ -68,7 +116,7 @@ from markdown_toc_creator.toc_entry import (
             '`abcd`',
             [
                 _CharGroup(
-                    chars=['a', 'b', 'c', 'd'],
+                    text='abcd',
                     insideBacktickPairs=True,
                 ),
             ],
@@ -77,7 +125,7 @@ from markdown_toc_creator.toc_entry import (
             '`abcd',
             [
                 _CharGroup(
-                    chars=['a', 'b', 'c', 'd'],
+                    text='abcd',
                     insideBacktickPairs=True,
                 ),
             ],
@@ -86,7 +134,7 @@ from markdown_toc_creator.toc_entry import (
             'abcd`',
             [
                 _CharGroup(
-                    chars=['a', 'b', 'c', 'd'],
+                    text='abcd',
                     insideBacktickPairs=False,
                 ),
             ],
@@ -95,7 +143,7 @@ from markdown_toc_creator.toc_entry import (
             "shouldn't",
             [
                 _CharGroup(
-                    chars=['s', 'h', 'o', 'u', 'l', 'd', 'n', "'", 't'],
+                    text="shouldn't",
                     insideBacktickPairs=False,
                 ),
             ],
@@ -107,6 +155,38 @@ def testBuildListOfCharGroups(string: str, expected: list[_CharGroup]) -> None:
     assert result == expected
 
 
+@pytest.mark.parametrize(
+    ('text', 'expected'),
+    [
+        ('Plain heading', 'Plain heading'),
+        ('a < b and c > d', 'a < b and c > d'),
+        ('Heading with <b>bold</b> text', 'Heading with bold text'),
+        ('Unfinished <tag', 'Unfinished <tag'),
+        ('<span id="anchor"></span>   <i>spaces</i>', ' spaces'),
+        ('Comment <!-- hidden --> here', 'Comment  here'),
+        ('Script <script>alert(1)</script>!', 'Script !'),
+        ('Entities: &amp; &lt;tag&gt;', 'Entities: & <tag>'),
+        ('Unknown entity &bogus; here', 'Unknown entity &bogus here'),
+        ('Unterminated entity &amp', 'Unterminated entity &amp'),
+        ('&lt;&lt &#65;&#x42;&#0;&#128;&lt', '<< AB\ufffd€&lt'),
+    ],
+)
+def testStripHtmlTags(text: str, expected: str) -> None:
+    assert stripHtmlTags(text) == expected
+
+
+@pytest.mark.parametrize('text', _corpusHeadings())
+def testStripHtmlTagsMatchesBeautifulSoup(text: str) -> None:
+    bs4 = pytest.importorskip('bs4')
+    with warnings.catch_warnings():
+        warnings.filterwarnings(
+            action='ignore', category=bs4.MarkupResemblesLocatorWarning
+        )
+        expected = bs4.BeautifulSoup(text, 'html.parser').get_text()
+
+    assert stripHtmlTags(text) == expected
+
+
 def test_link_removal() -> None:
     entry = TocEntry('hello world [somelink](https://foo.bar)', '', 'github')
     assert entry.render() == '- [hello world somelink](#hello-world-somelink)'
@@ -118,6 +198,21 @@ def test_emoji_at_beginning() -> None:
     assert entry.render() == '- [🐧 hello world](#-hello-world)'
 
 
+def testTocEntryDepthAndIndent() -> None:
+    entry = TocEntry('### Usage', 2, 'github')
+    assert entry.depth == 2
+    assert entry.indent == '    '
+    assert entry.render() == '    - [Usage](#usage)'
+    assert not hasattr(entry, '__dict__')
+
+    # An indentation string is still accepted (as before)
+    assert TocEntry('### Usage', '    ', 'github').depth == 2
+
+    entry.indent = '  '
+    assert entry.depth == 1
+    assert entry.render() == '  - [Usage](#usage)'
+
+
 @pytest.mark.parametrize(
     ('heading', 'style', 'expected_anchor'),
     [
@@ -213,9 +308,84 @@ def test_markdown_emphasis_underscores(
     ],
 )
 def testReduceToOnlyOneLeadingNonAlphaNumericChars(
-        oldChars: list[str],
-        expectedChars: list[str],
+        oldChars: str,
+        expectedChars: str,
 ) -> None:
-    charGroup = _CharGroup(chars=oldChars, insideBacktickPairs=False)
+    charGroup = _CharGroup(text=oldChars, insideBacktickPairs=False)
     charGroup.reduceToOnlyOneLeadingNonAlphaNumericChars()
-    assert ''.join(charGroup.chars) == expectedChars
+    assert charGroup.text == expectedChars
+
+
+@pytest.mark.parametrize(
+    ('style', 'anchorLinks', 'expected'),
+    [
+        (
+            'github',
+            ['#foo', '#foo', '#foo', '#bar'],
+            ['#foo', '#foo-1', '#foo-2', '#bar'],
+        ),
+        # A generated suffix may not take the anchor link of another header
+        ('github', ['#foo', '#foo', '#foo-1'], ['#foo', '#foo-1', '#foo-1-1']),
+        ('github', ['#foo-1', '#foo', '#foo'], ['#foo-1', '#foo', '#foo-2']),
+        (
+            'github',
+            ['#foo', '#foo-1', '#foo', '#foo-1'],
+            ['#foo', '#foo-1', '#foo-2', '#foo-1-1'],
+        ),
+        # GitLab numbers the repetitions without checking for collisions
+        ('gitlab', ['#foo', '#foo', '#foo-1'], ['#foo', '#foo-1', '#foo-1']),
+        ('gitlab', ['#foo-1', '#foo', '#foo'], ['#foo-1', '#foo', '#foo-1']),
+    ],
+)
+def testAnchorLinkDeduplicator(
+        style: str,
+        anchorLinks: list[str],
+        expected: list[str],
+) -> None:
+    deduplicator = AnchorLinkDeduplicator(style)
+    assert [deduplicator.deduplicate(_) for _ in anchorLinks] == expected
+    assert set(deduplicator.anchorLinks) == set(expected)
+
+    entries = [TocEntry('x', 0, style, anchorLinkText=_) for _ in anchorLinks]
+    deduplicateAnchorLinkText(entries)
+    assert [_.anchorLinkText for _ in entries] == expected
+
+
+def testAnchorLinkDeduplicatorScalesLinearly() -> None:
+    # (Each suffix is only tried once, even when many are already taken)
+    deduplicator = AnchorLinkDeduplicator('github')
+    numOfHeaders = 100_000
+    taken = [
+        deduplicator.deduplicate(f'#foo-{i}') for i in range(numOfHeaders)
+    ]
+    repeated = [deduplicator.deduplicate('#foo') for _ in range(numOfHeaders)]
+    assert repeated[:3] == [
+        '#foo',
+        f'#foo-{numOfHeaders}',
+        f'#foo-{numOfHeaders + 1}',
+    ]
+    assert len(set(taken + repeated)) == 2 * numOfHeaders
+
+
+def testAnchorLinkMemoization() -> None:
+    clearMemoCaches()
+    entries = [TocEntry('## Usage', '', 'github') for _ in range(3)]
+    stats = getMemoCacheStats()['convertToAnchorLink']
+    assert (stats.hits, stats.misses, stats.currentSize) == (2, 1, 1)
+    assert getMemoCacheStats()['stripHtmlTags'].hits == 2
+
+    # Mutating the de-duplicated entries must not alter the cached values
+    deduplicateAnchorLinkText(entries)
+    assert [_.anchorLinkText for _ in entries] == [
+        '#usage',
+        '#usage-1',
+        '#usage-2',
+    ]
+    assert TocEntry('## Usage', '', 'github').anchorLinkText == '#usage'
+    assert TocEntry('## Usage', '', 'gitlab').anchorLinkText == '#usage'
+
+    stats = getMemoCacheStats()['convertToAnchorLink']
+    assert (stats.hits, stats.misses) == (3, 2)
+
+    clearMemoCaches()
+    assert getMemoCacheStats()['convertToAnchorLink'].currentSize == 0
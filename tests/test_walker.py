@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator.main import main
+from markdown_toc_creator.walker import (
+    GitignoreRules,
+    isIgnoredByGitignore,
+    iterFolders,
+    iterMarkdownFiles,
+    iterMarkdownPaths,
+)
+
+
+def _touch(root: Path, *relativePaths: str) -> None:
+    for relativePath in relativePaths:
+        path = root / relativePath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('# Title\n\n## Section\n', encoding='utf-8')
+
+
+def _relative(root: Path, paths: list[Path]) -> list[str]:
+    return [_.relative_to(root).as_posix() for _ in paths]
+
+
+def testIterMarkdownFilesMatchesSortedRglob(tmp_path: Path) -> None:
+    _touch(
+        tmp_path,
+        'b.md',
+        'a/z.md',
+        'a.md',
+        'a-b/c.md',
+        'a/b/c/d.md',
+        'A/upper.md',
+        'notes.txt',
+    )
+    assert list(iterMarkdownFiles(tmp_path)) == sorted(tmp_path.rglob('*.md'))
+
+
+def testIterMarkdownFilesExtensions(tmp_path: Path) -> None:
+    _touch(tmp_path, 'a.md', 'b.mdown', 'c.markdown', 'd.txt', 'e.md.bak')
+    (tmp_path / 'folder.md').mkdir()
+    assert _relative(tmp_path, list(iterMarkdownFiles(tmp_path))) == [
+        'a.md',
+        'b.mdown',
+        'c.markdown',
+    ]
+
+
+def testIterMarkdownFilesPrunesExcludedFolders(
+        tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _touch(tmp_path, 'README.md', '.git/a.md', 'node_modules/pkg/b.md')
+
+    scanned: list[str] = []
+    originalScandir = os.scandir
+
+    def spyScandir(path: Path) -> os.ScandirIterator[str]:
+        scanned.append(Path(path).name)
+        return originalScandir(path)
+
+    monkeypatch.setattr(os, 'scandir', spyScandir)
+    found = iterMarkdownFiles(
+        tmp_path, excludePattern=re.compile(r'\.git|node_modules')
+    )
+    assert _relative(tmp_path, list(found)) == ['README.md']
+    assert scanned == [tmp_path.name]
+
+
+def testIterMarkdownFilesRespectsGitignore(tmp_path: Path) -> None:
+    (tmp_path / '.git').mkdir()
+    (tmp_path / '.gitignore').write_text(
+        '# comment\nbuild/\n*.draft.md\n/top.md\n!keep.draft.md\n',
+        encoding='utf-8',
+    )
+    _touch(
+        tmp_path,
+        'top.md',
+        'sub/top.md',
+        'build/a.md',
+        'x.draft.md',
+        'keep.draft.md',
+        'docs/nested/ignored.md',
+        'docs/nested/kept.md',
+    )
+    (tmp_path / 'docs' / '.gitignore').write_text(
+        'nested/ignored.md\n', encoding='utf-8'
+    )
+
+    expected = ['docs/nested/kept.md', 'keep.draft.md', 'sub/top.md']
+    found = iterMarkdownFiles(tmp_path, respectGitignore=True)
+    assert _relative(tmp_path, list(found)) == expected
+
+    # The .gitignore files of parent folders also apply
+    found = iterMarkdownFiles(tmp_path / 'docs', respectGitignore=True)
+    assert _relative(tmp_path, list(found)) == ['docs/nested/kept.md']
+
+    assert len(list(iterMarkdownFiles(tmp_path))) == 7
+
+    found = iterFolders(tmp_path, respectGitignore=True)
+    assert _relative(tmp_path, list(found)) == [
+        '.',
+        '.git',
+        'docs',
+        'docs/nested',
+        'sub',
+    ]
+
+    assert isIgnoredByGitignore(tmp_path / 'docs' / 'nested' / 'ignored.md')
+    assert isIgnoredByGitignore(tmp_path / 'y.draft.md')
+    assert not isIgnoredByGitignore(tmp_path / 'keep.draft.md')
+    assert not isIgnoredByGitignore(tmp_path / 'docs' / 'top.md')
+
+
+def testIterMarkdownPaths(tmp_path: Path) -> None:
+    _touch(tmp_path, 'a.md', 'docs/b.md', 'docs/skip/c.md', 'skip.md')
+    found = iterMarkdownPaths(
+        [tmp_path / 'skip.md', tmp_path / 'docs', tmp_path / 'a.md'],
+        excludePattern=re.compile(r'skip'),
+    )
+    assert _relative(tmp_path, list(found)) == ['docs/b.md', 'a.md']
+
+
+@pytest.mark.parametrize(
+    ('line', 'path', 'isDir', 'expected'),
+    [
+        ('*.md', 'a/b.md', False, True),
+        ('/*.md', 'a/b.md', False, None),
+        ('/*.md', 'b.md', False, True),
+        ('docs/', 'docs', False, None),
+        ('docs/', 'a/docs', True, True),
+        ('a/**/b.md', 'a/b.md', False, True),
+        ('a/**/b.md', 'a/x/y/b.md', False, True),
+        ('**/tmp', 'x/tmp', True, True),
+        ('out/**', 'out/a/b.md', False, True),
+        ('file?.md', 'file1.md', False, True),
+        ('file[0-9].md', 'filea.md', False, None),
+        ('file[!0-9].md', 'filea.md', False, True),
+        ('!*.md', 'a.md', False, False),
+        ('\\#not-a-comment.md', '#not-a-comment.md', False, True),
+    ],
+)
+def testGitignoreRules(
+        line: str,
+        path: str,
+        isDir: bool,  # noqa: FBT001
+        expected: bool | None,  # noqa: FBT001
+) -> None:
+    rules = GitignoreRules('/repo', [line])
+    assert rules.match(f'/repo/{path}', isDir=isDir) is expected
+
+
+def test_cli_respect_gitignore_option(tmp_path: Path) -> None:
+    (tmp_path / '.git').mkdir()
+    (tmp_path / '.gitignore').write_text('vendor/\n', encoding='utf-8')
+    _touch(tmp_path, 'vendor/lib.md')
+    original = (tmp_path / 'vendor' / 'lib.md').read_text(encoding='utf-8')
+
+    runner = CliRunner()
+    args = ['--no-cache', str(tmp_path)]
+    result = runner.invoke(main, ['--respect-gitignore', *args])
+    assert result.exit_code == 0
+    assert '0 file(s) changed, 0 unchanged' in result.output
+    lib = tmp_path / 'vendor' / 'lib.md'
+    assert lib.read_text(encoding='utf-8') == original
+
+    result = runner.invoke(main, args)
+    assert '1 file(s) changed, 0 unchanged' in result.output
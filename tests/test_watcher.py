@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import re
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator.create_toc import createToc
+from markdown_toc_creator.main import main
+from markdown_toc_creator.watcher import Watcher
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+EXCLUDE = re.compile(r'\.git|excluded')
+TIMEOUT_SECONDS: float = 5
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def backend(request: pytest.FixtureRequest) -> str:
+    if request.param == 'inotify' and not sys.platform.startswith('linux'):
+        pytest.skip('inotify is only available on Linux')
+
+    return str(request.param)
+
+
+def _makeWatcher(tmp_path: Path, backend: str, **kwargs: bool) -> Watcher:
+    watcher = Watcher(
+        [tmp_path],
+        excludePattern=EXCLUDE,
+        debounceSeconds=0.05,
+        pollIntervalSeconds=0.02,
+        usePolling=backend == 'polling',
+        **kwargs,
+    )
+    assert watcher.backend == backend
+    return watcher
+
+
+def testWatcherReportsChangedFiles(tmp_path: Path, backend: str) -> None:
+    (tmp_path / 'a.md').write_text('# A\n', encoding='utf-8')
+    (tmp_path / 'b.md').write_text('# B\n', encoding='utf-8')
+    (tmp_path / 'excluded').mkdir()
+    watcher = _makeWatcher(tmp_path, backend)
+    try:
+        assert watcher.numOfWatchedFiles == 2
+        assert watcher.waitForChanges(timeout=0.1) == []
+
+        (tmp_path / 'a.md').write_text('# A\n\n## Section\n', encoding='utf-8')
+        (tmp_path / 'notes.txt').write_text('not markdown', encoding='utf-8')
+        (tmp_path / 'excluded' / 'c.md').write_text('# C\n', encoding='utf-8')
+        assert watcher.waitForChanges(timeout=TIMEOUT_SECONDS) == [
+            tmp_path / 'a.md'
+        ]
+
+        # New folders are watched too
+        (tmp_path / 'docs' / 'api').mkdir(parents=True)
+        (tmp_path / 'docs' / 'api' / 'd.md').write_text(
+            '# D\n', encoding='utf-8'
+        )
+        assert watcher.waitForChanges(timeout=TIMEOUT_SECONDS) == [
+            tmp_path / 'docs' / 'api' / 'd.md'
+        ]
+    finally:
+        watcher.close()
+
+
+def testWatcherIgnoresAcknowledgedWrites(tmp_path: Path, backend: str) -> None:
+    target = tmp_path / 'a.md'
+    target.write_text('# A\n', encoding='utf-8')
+    watcher = _makeWatcher(tmp_path, backend)
+    try:
+        target.write_text('# A\n\n## Section\n', encoding='utf-8')
+        batch = watcher.waitForChanges(timeout=TIMEOUT_SECONDS)
+        assert batch == [target]
+
+        # The tool's own rewrite is not reported as a change
+        assert createToc(target, quiet=True).changed
+        watcher.acknowledge(batch)
+        assert watcher.waitForChanges(timeout=0.2) == []
+    finally:
+        watcher.close()
+
+
+def testWatcherRespectsGitignore(tmp_path: Path, backend: str) -> None:
+    (tmp_path / '.git').mkdir()
+    (tmp_path / '.gitignore').write_text(
+        'build/\n*.gen.md\n', encoding='utf-8'
+    )
+    (tmp_path / 'build').mkdir()
+    watcher = _makeWatcher(tmp_path, backend, respectGitignore=True)
+    try:
+        (tmp_path / 'build' / 'a.md').write_text('# A\n', encoding='utf-8')
+        (tmp_path / 'b.gen.md').write_text('# B\n', encoding='utf-8')
+        (tmp_path / 'c.md').write_text('# C\n', encoding='utf-8')
+        assert watcher.waitForChanges(timeout=TIMEOUT_SECONDS) == [
+            tmp_path / 'c.md'
+        ]
+    finally:
+        watcher.close()
+
+
+def test_cli_watch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    target = tmp_path / 'a.md'
+    target.write_text('# A\n\n## Section 1\n', encoding='utf-8')
+
+    def iterChanges(self: Watcher) -> Iterator[list[Path]]:
+        target.write_text('# A\n\n## Section 2\n', encoding='utf-8')
+        yield self.waitForChanges(timeout=TIMEOUT_SECONDS)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(Watcher, 'iterChanges', iterChanges)
+    result = CliRunner().invoke(main, ['--watch', '--no-cache', str(tmp_path)])
+    assert result.exit_code == 0
+    assert 'Watching 1 file(s) for changes' in result.output
+    assert '- [Section 1](#section-1)' in result.output
+    assert '- [Section 2](#section-2)' in result.output
+    assert '- [Section 2](#section-2)' in target.read_text(encoding='utf-8')
+
+
+def test_cli_watch_with_json_format(tmp_path: Path) -> None:
+    result = CliRunner().invoke(
+        main, ['--watch', '--format', 'json', str(tmp_path)]
+    )
+    assert result.exit_code == 1
+    assert "'--watch' cannot be used with '--format json'" in result.output
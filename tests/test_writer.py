@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+import stat
+from typing import TYPE_CHECKING
+
+import pytest
+from click.testing import CliRunner
+
+from markdown_toc_creator.create_toc import createToc
+from markdown_toc_creator.main import main
+from markdown_toc_creator.writer import FsyncBatch, writeAtomically
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+DOCUMENT: str = '# Title\n\n## Usage\n\n## API\n'
+
+
+def _countFsyncs(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Record the calls to `os.fsync()` (and still flush)"""
+    calls: list[int] = []
+    fsync = os.fsync
+
+    def countingFsync(fd: int) -> None:
+        calls.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', countingFsync)
+    return calls
+
+
+def testWriteAtomically(tmp_path: Path) -> None:
+    filename = tmp_path / 'doc.md'
+    filename.write_text('old', encoding='utf-8')
+    filename.chmod(0o640)
+    inode = filename.stat().st_ino
+
+    writeAtomically(filename, [b'new ', memoryview(b'content')])
+
+    assert filename.read_bytes() == b'new content'
+    assert stat.S_IMODE(filename.stat().st_mode) == 0o640
+    assert filename.stat().st_ino != inode  # (replaced, not truncated)
+    assert [_.name for _ in tmp_path.iterdir()] == ['doc.md']
+
+
+def testWriteAtomicallyKeepsTheFileIfInterrupted(tmp_path: Path) -> None:
+    filename = tmp_path / 'doc.md'
+    filename.write_text('old', encoding='utf-8')
+
+    def chunks() -> Iterator[bytes]:
+        yield b'half-written'
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        writeAtomically(filename, chunks())
+
+    assert filename.read_text(encoding='utf-8') == 'old'
+    assert [_.name for _ in tmp_path.iterdir()] == ['doc.md']
+
+
+def testFsyncBatch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    filenames = [tmp_path / 'a.md', tmp_path / 'b.md', tmp_path / 'c' / 'd.md']
+    filenames[2].parent.mkdir()
+    calls = _countFsyncs(monkeypatch)
+
+    batch = FsyncBatch()
+    for filename in filenames:
+        filename.write_text('old', encoding='utf-8')
+        writeAtomically(filename, [b'new'])
+        assert calls == []
+        batch.add(filename)
+
+    assert len(batch) == 3
+    batch.sync()
+    # (Each file, then each folder once)
+    assert len(calls) == 3 + 2
+    assert len(batch) == 0
+
+    writeAtomically(filenames[0], [b'durable'], fsync=True)
+    assert len(calls) == 5 + 2  # (the file, and its folder)
+
+
+@pytest.mark.parametrize('mmapThreshold', [None, 1])
+def testCreateTocPreservesPermissions(
+        tmp_path: Path, mmapThreshold: int | None
+) -> None:
+    filename = tmp_path / 'doc.md'
+    filename.write_text(DOCUMENT, encoding='utf-8')
+    filename.chmod(0o600)
+
+    assert createToc(filename, quiet=True, mmap_threshold=mmapThreshold)
+    assert '- [Usage](#usage)' in filename.read_text(encoding='utf-8')
+    assert stat.S_IMODE(filename.stat().st_mode) == 0o600
+    assert [_.name for _ in tmp_path.iterdir()] == ['doc.md']
+
+
+@pytest.mark.skipif(
+    not hasattr(os, 'symlink') or os.name == 'nt',
+    reason='Symlinks need special privileges on Windows',
+)
+@pytest.mark.parametrize('mmapThreshold', [None, 1])
+def testCreateTocWritesThroughSymlinks(
+        tmp_path: Path, mmapThreshold: int | None
+) -> None:
+    (tmp_path / 'real').mkdir()
+    target = tmp_path / 'real' / 'doc.md'
+    target.write_text(DOCUMENT, encoding='utf-8')
+    link = tmp_path / 'link.md'
+    link.symlink_to(target)
+
+    assert createToc(link, quiet=True, mmap_threshold=mmapThreshold)
+    assert link.is_symlink()
+    assert '- [Usage](#usage)' in target.read_text(encoding='utf-8')
+    # (The temporary file was created, and renamed, next to the target)
+    assert sorted(_.name for _ in tmp_path.iterdir()) == ['link.md', 'real']
+    assert [_.name for _ in target.parent.iterdir()] == ['doc.md']
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def testCliFsyncOption(
+        tmp_path: Path, monkeypatch: pytest.MonkeyPatch, jobs: str
+) -> None:
+    for name in ('a.md', 'b.md'):
+        (tmp_path / name).write_text(DOCUMENT, encoding='utf-8')
+
+    (tmp_path / 'up_to_date.md').write_text('No headers\n', encoding='utf-8')
+    calls = _countFsyncs(monkeypatch)
+    result = CliRunner().invoke(
+        main,
+        [
+            '-q',
+            '--no-cache',
+            '--fsync',
+            '--stats',
+            '--jobs',
+            jobs,
+            str(tmp_path),
+        ],
+    )
+    assert result.exit_code == 0
+    # (The 2 changed files, then their folder once)
+    assert len(calls) == 2 + 1
+    assert '    fsync ' in result.output
+
+    # Without --fsync (or without writing the files), nothing is flushed
+    for arguments in (['--check'], []):
+        (tmp_path / 'a.md').write_text(DOCUMENT, encoding='utf-8')
+        CliRunner().invoke(
+            main, ['-q', '--no-cache', *arguments, str(tmp_path)]
+        )
+
+    assert len(calls) == 2 + 1